@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+
+from benchmarks.synthetic import generate_dataset
+
+IMPORTS = [
+    "millefeuille.module.gff2bed",
+    "millefeuille.module.bed2gff",
+    "millefeuille.module.overlaps",
+]
+
+
+def import_time(module: str, repeat: int = 3) -> float:
+    """
+    Measure the time needed to import a module in a fresh interpreter.
+
+    Parameters
+    ----------
+    module : str
+      Name of the module to import
+    repeat : int
+      Number of measures, the best one is kept, default is 3
+
+    Returns
+    -------
+    float
+      The import time in seconds, interpreter start-up excluded.
+    """
+
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        return time.perf_counter() - start
+
+    startup = min(run("pass") for i in range(repeat))
+    return max(0.0, min(run("import " + module) for i in range(repeat)) - startup)
+
+
+def measure(func, repeat: int = 3) -> dict:
+    """
+    Time a callable and measure its peak memory.
+
+    The timings are done without memory tracing, the peak memory is measured on an
+    additional traced call since tracemalloc slows down the execution.
+
+    Parameters
+    ----------
+    func
+      The callable to benchmark, called without arguments
+    repeat : int
+      Number of timed calls, default is 3
+
+    Returns
+    -------
+    dict
+      A dictionary with best and mean time in seconds and peak memory in MB.
+    """
+    times = []
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for i in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "seconds": min(times),
+        "mean_seconds": sum(times) / len(times),
+        "peak_mb": peak / 1024**2,
+    }
+
+
+def benchmarks(dataset: dict, workdir: str) -> dict:
+    """
+    Build the benchmarked callables for a synthetic dataset.
+
+    Parameters
+    ----------
+    dataset : dict
+      A dictionary with the "gff" file name and the list of "beds" file names
+    workdir : str
+      The directory where converted files are written
+
+    Returns
+    -------
+    dict
+      A dictionary with benchmark names as keys and callables as values.
+    """
+    from millefeuille.module import gff2bed as g2b
+    from millefeuille.module import bed2gff as b2g
+    from millefeuille.module import overlaps as ov
+
+    # bed2gff writes next to its input, so work on a copy
+    bed = shutil.copy(dataset["beds"][0], workdir)
+    return {
+        "gff2bed": lambda: g2b.gff2bed(dataset["gff"], path=workdir, name="gff2bed"),
+        "bed12_generator": lambda: g2b.bed12_generator(
+            bedname="bed12", file_gff=dataset["gff"], path=workdir
+        ),
+        "bed2gff": lambda: b2g.bed2gff(bed, "synthetic", "peak", is_bed12=False, make_gff3=True),
+        "all_overlaps": lambda: ov.all_overlaps(dataset["beds"], as_bp=False),
+        "all_overlaps_bp": lambda: ov.all_overlaps(dataset["beds"], as_bp=True),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare benchmark results against a baseline.
+
+    Parameters
+    ----------
+    results : dict
+      The results of the current run
+    baseline : dict
+      The results of the baseline run
+    threshold : float
+      The time ratio (current / baseline) above which a benchmark is a regression
+
+    Returns
+    -------
+    list
+      The names of the benchmarks regressing compared to the baseline.
+    """
+    reference = {(r["name"], r["scale"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        ref = reference.get((r["name"], r["scale"]))
+        if ref is None:
+            continue
+        ratio = r["seconds"] / ref["seconds"] if ref["seconds"] else float("inf")
+        mem_ratio = r["peak_mb"] / ref["peak_mb"] if ref["peak_mb"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions.append(r["name"] + "@" + str(r["scale"]))
+            flag = "  <- regression"
+        print(
+            "{:<40} {:>10} time x{:.2f}  memory x{:.2f}{}".format(
+                r["name"], r["scale"], ratio, mem_ratio, flag
+            )
+        )
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark millefeuille on synthetic genome-scale data"
+    )
+    parser.add_argument(
+        "--scale", type=int, nargs="+", default=[10000],
+        help="number of records of the synthetic files, from 10000 to 10000000",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed calls")
+    parser.add_argument(
+        "--only", nargs="+", default=None, help="only run the benchmarks with these names"
+    )
+    parser.add_argument(
+        "--data-dir", default=None,
+        help="directory where synthetic data is generated and reused, default is a temporary directory",
+    )
+    parser.add_argument("--output", default=None, help="JSON file where results are saved")
+    parser.add_argument("--baseline", default=None, help="JSON file of a previous run to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2,
+        help="time ratio above which a benchmark is reported as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": [],
+    }
+    for module in IMPORTS:
+        if args.only and "import" not in args.only:
+            break
+        seconds = import_time(module)
+        print("{:<40} {:>10} {:>10.3f}s".format("import " + module, "-", seconds))
+        results["results"].append(
+            {"name": "import " + module, "scale": 0, "seconds": seconds, "mean_seconds": None, "peak_mb": 0.0}
+        )
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            dataset = generate_dataset(args.data_dir or tmp, scale, args.seed)
+            with tempfile.TemporaryDirectory(dir=tmp) as workdir:
+                for name, func in benchmarks(dataset, workdir).items():
+                    if args.only and name not in args.only:
+                        continue
+                    result = {"name": name, "scale": scale, **measure(func, args.repeat)}
+                    print(
+                        "{:<40} {:>10} {:>10.3f}s {:>10.1f}MB".format(
+                            name, scale, result["seconds"], result["peak_mb"]
+                        )
+                    )
+                    results["results"].append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import os
+import random
+
+
+def chrom_sizes(n_records: int, n_chrom: int = 4, density: int = 1000) -> dict:
+    """
+    Size the synthetic genome so that the feature density stays constant with scale.
+
+    Parameters
+    ----------
+    n_records : int
+      Number of records that will be laid out on the genome
+    n_chrom : int
+      Number of chromosomes, default is 4
+    density : int
+      Average number of basepairs per record, default is 1000
+
+    Returns
+    -------
+    dict
+      A dictionary with chromosome names as keys and sizes as values.
+    """
+    size = max(1000000, n_records * density // n_chrom)
+    return {"chr" + str(i + 1): size for i in range(n_chrom)}
+
+
+def synthetic_gff(
+    file_gff: str,
+    n_records: int,
+    n_chrom: int = 4,
+    seed: int = 0,
+    max_exons: int = 12,
+    max_transcripts: int = 3,
+) -> None:
+    """
+    Write a deterministic synthetic GFF annotation of exons grouped in transcripts.
+
+    Genes are laid out one after the other on each chromosome. Each gene holds a
+    chain of non overlapping exons and each transcript uses an ordered subset of
+    them, so that exons shared by several transcripts list all of them as Parent.
+
+    Parameters
+    ----------
+    file_gff : str
+      Name of the GFF file to be created
+    n_records : int
+      Number of exon lines to write
+    n_chrom : int
+      Number of chromosomes, default is 4
+    seed : int
+      Seed of the random generator, default is 0
+    max_exons : int
+      Maximum number of exons per gene, default is 12
+    max_transcripts : int
+      Maximum number of transcripts per gene, default is 3
+    """
+    rng = random.Random(seed)
+    sizes = chrom_sizes(n_records, n_chrom)
+    chroms = list(sizes)
+    position = dict.fromkeys(chroms, 1)
+    written = 0
+    gene = 0
+    with open(file_gff, "w") as f:
+        while written < n_records:
+            gene += 1
+            chrom = chroms[gene % n_chrom]
+            strand = rng.choice("+-")
+            # exon chain of the gene
+            exons = []
+            start = position[chrom] + rng.randint(100, 2000)
+            for i in range(rng.randint(1, max_exons)):
+                end = start + rng.randint(50, 500)
+                exons.append((start, end))
+                start = end + rng.randint(60, 3000)
+            position[chrom] = start
+            # transcripts as ordered subsets of the exon chain
+            transcripts = ["T" + str(gene) + "." + str(t + 1) for t in range(rng.randint(1, max_transcripts))]
+            parents = [[transcripts[0]] for e in exons]
+            for t in transcripts[1:]:
+                for p in parents:
+                    if rng.random() < 0.7:
+                        p.append(t)
+            for i, ((start, end), p) in enumerate(zip(exons, parents)):
+                if written >= n_records:
+                    break
+                attributes = ";".join(
+                    [
+                        "gene_id=G" + str(gene),
+                        "parent_type=mRNA",
+                        "Name=G" + str(gene) + ":" + str(i + 1),
+                        "Parent=" + ",".join(p),
+                    ]
+                )
+                f.write(
+                    "\t".join(
+                        [chrom, "synthetic", "exon", str(start), str(end), ".", strand, ".", attributes + "\n"]
+                    )
+                )
+                written += 1
+
+
+def synthetic_bed(
+    file_bed: str,
+    n_records: int,
+    n_chrom: int = 4,
+    seed: int = 0,
+    min_length: int = 50,
+    max_length: int = 2000,
+) -> None:
+    """
+    Write a deterministic synthetic BED6 file of peaks, sorted by coordinates.
+
+    Parameters
+    ----------
+    file_bed : str
+      Name of the BED file to be created
+    n_records : int
+      Number of peaks to write
+    n_chrom : int
+      Number of chromosomes, default is 4
+    seed : int
+      Seed of the random generator, default is 0
+    min_length : int
+      Minimum length of a peak, default is 50
+    max_length : int
+      Maximum length of a peak, default is 2000
+    """
+    rng = random.Random(seed)
+    sizes = chrom_sizes(n_records, n_chrom)
+    chroms = list(sizes)
+    peaks = {chrom: [] for chrom in chroms}
+    for i in range(n_records):
+        chrom = rng.choice(chroms)
+        start = rng.randrange(0, sizes[chrom] - max_length)
+        peaks[chrom].append((start, start + rng.randint(min_length, max_length)))
+    with open(file_bed, "w") as f:
+        n = 0
+        for chrom in chroms:
+            for start, end in sorted(peaks[chrom]):
+                n += 1
+                f.write(
+                    "\t".join([chrom, str(start), str(end), "peak_" + str(n), str(rng.randint(0, 1000)), rng.choice("+-") + "\n"])
+                )
+
+
+def generate_dataset(data_dir: str, n_records: int, seed: int = 0) -> dict:
+    """
+    Create (or reuse) a GFF file and three BED files of a given scale in a directory.
+
+    Parameters
+    ----------
+    data_dir : str
+      The directory where the files are created
+    n_records : int
+      Number of records of each file
+    seed : int
+      Seed of the random generators, default is 0
+
+    Returns
+    -------
+    dict
+      A dictionary with the "gff" file name and the list of "beds" file names.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    prefix = os.path.join(data_dir, "synthetic_" + str(n_records) + "_" + str(seed))
+    dataset = {"gff": prefix + ".gff", "beds": [prefix + "_" + k + ".bed" for k in "abc"]}
+    # files are written under a temporary name so that interrupted runs are not reused
+    if not os.path.exists(dataset["gff"]):
+        synthetic_gff(dataset["gff"] + ".tmp", n_records, seed=seed)
+        os.replace(dataset["gff"] + ".tmp", dataset["gff"])
+    for i, bed in enumerate(dataset["beds"]):
+        if not os.path.exists(bed):
+            synthetic_bed(bed + ".tmp", n_records, seed=seed + i + 1)
+            os.replace(bed + ".tmp", bed)
+    return dataset
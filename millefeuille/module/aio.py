@@ -0,0 +1,267 @@
+import codecs
+import asyncio
+import inspect
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from millefeuille.module.streams import is_path, open_lines, write_lines
+
+CHUNK_SIZE = 1 << 20
+
+
+def _read_all(source) -> list:
+    with open_lines(source) as f:
+        return list(f)
+
+
+async def _chunks(source, chunk_size: int):
+    # yield the raw chunks of a file name, an asyncio stream or an async iterable
+    if is_path(source):
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, source, "rb")
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await loop.run_in_executor(None, f.close)
+    elif hasattr(source, "__aiter__") and not hasattr(source, "read"):
+        async for chunk in source:
+            yield chunk
+    else:
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def read_lines(source, chunk_size: int = CHUNK_SIZE) -> list:
+    """
+    Read an input by chunks without blocking the event loop.
+
+    Parameters
+    ----------
+    source
+      A file name (read by chunks in the default thread pool), an asyncio
+      StreamReader or any object with a `read` coroutine, or an async iterable
+      of text or bytes chunks (e.g. a request body). Other inputs (lists of lines,
+      file-like objects) are read at once in the default thread pool.
+    chunk_size : int
+      Number of bytes read at once, default is 1 MiB
+
+    Returns
+    -------
+    list
+      The lines of the input, ending with a newline.
+    """
+    if is_path(source) and source == "-":
+        raise ValueError("stdin cannot be read asynchronously, give a stream instead")
+    if not (
+        is_path(source)
+        or hasattr(source, "__aiter__")
+        or inspect.iscoroutinefunction(getattr(source, "read", None))
+    ):
+        return await asyncio.get_running_loop().run_in_executor(None, _read_all, source)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    lines, rest = [], ""
+    async for chunk in _chunks(source, chunk_size):
+        text = rest + (decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        parts = text.split("\n")
+        # the last part is incomplete, it is completed by the next chunk
+        rest = parts.pop()
+        lines.extend(l + "\n" for l in parts)
+    rest += decoder.decode(b"", final=True)
+    if rest:
+        lines.append(rest + "\n")
+    return lines
+
+
+def _overlaps_task(list_bed: list, names: list, as_bp: bool) -> dict:
+    from millefeuille.module import overlaps as ov
+
+    return ov.all_overlaps(list_bed, names, as_bp)
+
+
+def _gff2bed_task(lines: list, bed12: bool, options: dict) -> list:
+    from millefeuille.module import gff2bed as g2b
+
+    records = g2b.bed12_records if bed12 else g2b.bed6_records
+    return list(records(lines, **options))
+
+
+def _bed2gff_task(lines: list, options: dict) -> list:
+    from millefeuille.module import bed2gff as b2g
+
+    return list(b2g.gff_records(lines, **options))
+
+
+class AsyncService:
+    """
+    Run overlaps and conversions from asyncio code without stalling the event loop.
+
+    Inputs are read by chunks without blocking, the CPU-heavy stages run in a
+    managed executor (a process pool by default) and a semaphore bounds the
+    number of requests processed at once, the others waiting their turn before
+    reading their inputs, so that at most max_concurrency inputs are in memory.
+
+    Parameters
+    ----------
+    max_workers : int
+      Number of workers of the executor, default is the number of CPUs
+    max_concurrency : int
+      Number of requests processed at the same time, default is max_workers
+      (or 4 when max_workers is not given)
+    executor
+      "process" (default) or "thread" to create the executor, or an Executor
+      instance, which is then not shut down by close
+    chunk_size : int
+      Number of bytes read at once from the inputs, default is 1 MiB
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        max_concurrency: int = None,
+        executor="process",
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        if isinstance(executor, Executor):
+            self.executor = executor
+            self._own_executor = False
+        elif executor == "process":
+            # forking a process running an event loop and its threads is unsafe
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context(method)
+            )
+            self._own_executor = True
+        elif executor == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+            self._own_executor = True
+        else:
+            raise ValueError('executor must be "process", "thread" or an Executor')
+        self.max_concurrency = max_concurrency or max_workers or 4
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _write(self, lines: list, output) -> list:
+        if output is not None:
+            await asyncio.get_running_loop().run_in_executor(None, write_lines, lines, output)
+        return lines
+
+    async def all_overlaps(self, list_bed: list, names: list = ["a", "b", "c"], as_bp: bool = False) -> dict:
+        """
+        Calculate the overlaps between three sets of intervals, as overlaps.all_overlaps.
+
+        Parameters
+        ----------
+        list_bed : list
+          A list of three bed files, streams or async iterables of chunks, read without blocking
+        names : list
+          A list of names for the bed files. Must be of length 3.
+        as_bp : bool
+          If True, return the length of the intervals in base pairs instead of overlap count. Default is False.
+
+        Returns
+        -------
+        dict
+          The count (or basepairs) of each overlap.
+        """
+        async with self._semaphore:
+            beds = await asyncio.gather(*(read_lines(bed, self.chunk_size) for bed in list_bed))
+            return await self._run(_overlaps_task, list(beds), list(names), as_bp)
+
+    async def gff2bed(
+        self,
+        file_gff,
+        bed12: bool = True,
+        mol_type: str = "exon",
+        feature_type: str = "Parent",
+        id_as_features: bool = True,
+        output=None,
+    ) -> list:
+        """
+        Convert a GFF input into BED12 (or BED6) lines.
+
+        Parameters
+        ----------
+        file_gff
+          A GFF file, stream or async iterable of chunks, read without blocking
+        bed12 : bool
+          Return BED12 lines if True (default), BED6 lines otherwise
+        mol_type : str
+          The molecular type (column 3 of the GFF file) selected, default is exon
+        feature_type : str
+          The feature type (column 9 of the GFF file) used as ID, default is Parent
+        id_as_features : bool
+          Will set the ID of each element as a string containing all its features
+        output
+          Name of a BED file or writable file-like object, written in a thread, default is None
+
+        Returns
+        -------
+        list
+          The BED lines, ending with a newline.
+        """
+        options = {"mol_type": mol_type, "feature_type": feature_type, "id_as_features": id_as_features}
+        async with self._semaphore:
+            lines = await read_lines(file_gff, self.chunk_size)
+            records = await self._run(_gff2bed_task, lines, bed12, options)
+            return await self._write(records, output)
+
+    async def bed2gff(
+        self,
+        file_bed,
+        source: str = "millefeuille",
+        mol_type: str = "region",
+        is_bed12: bool = False,
+        make_gff3: bool = True,
+        output=None,
+    ) -> list:
+        """
+        Convert a BED input into GFF lines.
+
+        Parameters
+        ----------
+        file_bed
+          A BED file, stream or async iterable of chunks, read without blocking
+        source : str
+          Name of the source
+        mol_type : str
+          Name of the molecular type of elements from BED
+        is_bed12 : bool
+          Specify this argument if bed file is bed12 formated and contain blocks
+        make_gff3 : bool
+          Specify if you want to make the output a proper gff3
+        output
+          Name of a GFF file or writable file-like object, written in a thread, default is None
+
+        Returns
+        -------
+        list
+          The GFF lines, ending with a newline.
+        """
+        options = {"source": source, "mol_type": mol_type, "is_bed12": is_bed12, "make_gff3": make_gff3}
+        async with self._semaphore:
+            lines = await read_lines(file_bed, self.chunk_size)
+            records = await self._run(_bed2gff_task, lines, options)
+            return await self._write(records, output)
+
+    def close(self) -> None:
+        """
+        Shut down the executor if the service created it.
+        """
+        if self._own_executor:
+            self.executor.shutdown()
+
+    async def __aenter__(self) -> "AsyncService":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
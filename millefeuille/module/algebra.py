@@ -0,0 +1,412 @@
+import numpy as np
+
+from millefeuille.module.intervals import IntervalSet, cluster_starts, merge_sorted
+from millefeuille.module.query import IntervalIndex, expand_ranges
+from millefeuille.module.streams import open_lines
+
+
+def read_chrom_sizes(chrom_sizes) -> dict:
+    """
+    Read the sizes of the chromosomes.
+
+    Parameters
+    ----------
+    chrom_sizes
+      A dict of sizes, or a tab separated file (name, "-" for stdin, file-like object
+      or iterable of lines) with the name and size of each chromosome, as used by bedtools
+
+    Returns
+    -------
+    dict
+      The size of each chromosome.
+    """
+    if isinstance(chrom_sizes, dict):
+        return {str(chrom): int(size) for chrom, size in chrom_sizes.items()}
+    sizes = {}
+    with open_lines(chrom_sizes) as f:
+        for l in f:
+            if l.strip() and not l.startswith("#"):
+                line = l.split()
+                sizes[line[0]] = int(line[1])
+    return sizes
+
+
+def _empty() -> tuple:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+
+def _sort(starts: np.ndarray, ends: np.ndarray, rows: np.ndarray) -> tuple:
+    order = np.lexsort((ends, starts))
+    return starts[order], ends[order], rows[order]
+
+
+def _chrom_arrays(other: IntervalSet, chrom: str) -> tuple:
+    rows = other.chrom_slice(chrom)
+    return other.starts[rows], other.ends[rows]
+
+
+def subtract_sorted(starts, ends, rows, other_starts, other_ends) -> tuple:
+    """
+    Remove the parts of the intervals of one chromosome covered by other intervals.
+
+    Parameters
+    ----------
+    starts, ends, rows : np.ndarray
+      The intervals (sorted by start) and their rows in the source set
+    other_starts, other_ends : np.ndarray
+      The intervals to subtract, sorted by start
+
+    Returns
+    -------
+    tuple
+      The starts, ends and source rows of the remaining pieces, sorted by start.
+    """
+    b_starts, b_ends = merge_sorted(other_starts, other_ends)
+    if len(b_starts) == 0 or len(starts) == 0:
+        return starts, ends, rows
+    # merged intervals are disjoint: the ones overlapping [s, e) are a block of rows [lo, hi)
+    lo = np.searchsorted(b_ends, starts, side="right")
+    hi = np.searchsorted(b_starts, ends, side="left")
+    n = np.maximum(hi - lo, 0)
+    # n overlapping intervals cut an interval into n + 1 pieces (some of them empty)
+    which, k = expand_ranges(np.zeros(len(starts), dtype=np.int64), n + 1)
+    last = len(b_starts) - 1
+    piece_starts = np.where(
+        k == 0, starts[which], b_ends[np.clip(lo[which] + k - 1, 0, last)]
+    )
+    piece_ends = np.where(k == n[which], ends[which], b_starts[np.clip(lo[which] + k, 0, last)])
+    piece_starts = np.maximum(piece_starts, starts[which])
+    piece_ends = np.minimum(piece_ends, ends[which])
+    keep = piece_ends > piece_starts
+    return _sort(piece_starts[keep], piece_ends[keep], rows[which[keep]])
+
+
+def _deferred(build):
+    # build the data of a kernel on first use, so that a chain reads nothing until it runs
+    cache = []
+
+    def get():
+        if not cache:
+            cache.append(build())
+        return cache[0]
+
+    return get
+
+
+class IntervalChain:
+    """
+    A lazy chain of interval operations (merge, subtract, complement, slop, window, intersect).
+
+    Nothing is computed (or read, for the other sets of subtract, window and
+    intersect) until `collect`, which runs all the operations one
+    chromosome at a time on the sorted numpy arrays of the source, without
+    creating any intermediate IntervalSet or DataFrame. Each operation returns a
+    new chain, so chains can be extended and reused.
+
+    Parameters
+    ----------
+    source : IntervalSet
+      The intervals the operations start from
+    """
+
+    def __init__(self, source: IntervalSet, ops: list = None):
+        self.source = source
+        self.ops = list(ops) if ops is not None else []
+
+    @classmethod
+    def from_bed(cls, file_bed) -> "IntervalChain":
+        """
+        Start a chain from the intervals of a BED file (name, file-like object or iterable of lines).
+        """
+        return cls(IntervalSet.from_bed(file_bed))
+
+    def _then(self, name: str, kernel, keeps_rows: bool = True, chroms: list = None) -> "IntervalChain":
+        return IntervalChain(self.source, self.ops + [(name, kernel, keeps_rows, chroms)])
+
+    def __repr__(self) -> str:
+        return "IntervalChain(" + " -> ".join(["source"] + [op[0] for op in self.ops]) + ")"
+
+    def merge(self, distance: int = 0) -> "IntervalChain":
+        """
+        Merge the overlapping intervals, and the ones closer than distance. Names and strands are dropped.
+        """
+
+        def kernel(chrom, starts, ends, rows, source):
+            starts, ends = merge_sorted(starts, ends, distance)
+            return starts, ends, np.full(len(starts), -1, dtype=np.int64)
+
+        return self._then("merge", kernel, keeps_rows=False)
+
+    def subtract(self, other) -> "IntervalChain":
+        """
+        Remove the parts of the intervals covered by another set (IntervalSet or BED file).
+        """
+        other_set = _deferred(lambda: _as_set(other))
+
+        def kernel(chrom, starts, ends, rows, source):
+            return subtract_sorted(starts, ends, rows, *_chrom_arrays(other_set(), chrom))
+
+        return self._then("subtract", kernel)
+
+    def complement(self, chrom_sizes) -> "IntervalChain":
+        """
+        Return the parts of the chromosomes not covered by the intervals.
+
+        Parameters
+        ----------
+        chrom_sizes
+          A dict or a file with the size of each chromosome, see read_chrom_sizes.
+          Chromosomes missing from chrom_sizes are dropped.
+        """
+        sizes = read_chrom_sizes(chrom_sizes)
+
+        def kernel(chrom, starts, ends, rows, source):
+            if chrom not in sizes:
+                return _empty()
+            whole = np.array([0], dtype=np.int64), np.array([sizes[chrom]], dtype=np.int64)
+            starts, ends, rows = subtract_sorted(*whole, np.array([-1]), starts, ends)
+            return starts, ends, np.full(len(starts), -1, dtype=np.int64)
+
+        return self._then("complement", kernel, keeps_rows=False, chroms=list(sizes))
+
+    def slop(
+        self, left: int, right: int = None, chrom_sizes=None, stranded: bool = False
+    ) -> "IntervalChain":
+        """
+        Extend the intervals, as bedtools slop.
+
+        Parameters
+        ----------
+        left : int
+          Number of basepairs added before each interval (upstream if stranded)
+        right : int
+          Number of basepairs added after each interval (downstream if stranded), default is left
+        chrom_sizes
+          A dict or a file with the size of each chromosome, used to clip the ends, default is None
+        stranded : bool
+          If True, left and right follow the strand of the source intervals. Default is False.
+        """
+        right = left if right is None else right
+        sizes = read_chrom_sizes(chrom_sizes) if chrom_sizes is not None else {}
+        if stranded and not all(op[2] for op in self.ops):
+            raise ValueError("stranded slop needs the strands of the source intervals")
+
+        def kernel(chrom, starts, ends, rows, source):
+            before, after = np.full(len(starts), left), np.full(len(starts), right)
+            if stranded:
+                if source.strands is None:
+                    raise ValueError("stranded slop needs the strands of the source intervals")
+                minus = source.strands[rows] == "-"
+                before[minus], after[minus] = right, left
+            starts = np.maximum(starts - before, 0)
+            ends = ends + after
+            if chrom in sizes:
+                ends = np.minimum(ends, sizes[chrom])
+            return _sort(starts, ends, rows)
+
+        return self._then("slop", kernel)
+
+    def window(self, other, left: int, right: int = None) -> "IntervalChain":
+        """
+        Keep the intervals with at least one interval of another set within a window, as bedtools window -u.
+
+        Parameters
+        ----------
+        other
+          An IntervalSet or a BED file
+        left : int
+          Size of the window before each interval
+        right : int
+          Size of the window after each interval, default is left
+        """
+        right = left if right is None else right
+        index = _deferred(lambda: IntervalIndex(_as_set(other)))
+
+        def kernel(chrom, starts, ends, rows, source):
+            which, hits = index().overlap_chrom(chrom, np.maximum(starts - left, 0), ends + right)
+            keep = np.unique(which)
+            return starts[keep], ends[keep], rows[keep]
+
+        return self._then("window", kernel)
+
+    def intersect(self, other) -> "IntervalChain":
+        """
+        Return the overlapping parts of the intervals with another set, as bedtools intersect.
+        """
+        index = _deferred(lambda: IntervalIndex(_as_set(other)))
+
+        def kernel(chrom, starts, ends, rows, source):
+            which, hits = index().overlap_chrom(chrom, starts, ends)
+            starts = np.maximum(starts[which], index().starts[hits])
+            ends = np.minimum(ends[which], index().ends[hits])
+            return _sort(starts, ends, rows[which])
+
+        return self._then("intersect", kernel)
+
+    def iter_chroms(self):
+        """
+        Run the chain one chromosome at a time.
+
+        Returns
+        -------
+        generator
+          A tuple with the chromosome name, the starts, the ends and the source rows
+          (-1 when the operations lost them) of the resulting intervals.
+        """
+        for chrom in sorted(set(self.source.chroms) | set(self.extra_chroms())):
+            rows = self.source.chrom_slice(chrom)
+            starts, ends, rows = self.run_chrom(
+                chrom,
+                self.source.starts[rows],
+                self.source.ends[rows],
+                np.arange(rows.start, rows.stop, dtype=np.int64),
+            )
+            if len(starts):
+                yield chrom, starts, ends, rows
+
+    def extra_chroms(self) -> list:
+        """
+        Return the chromosomes the operations may create intervals on (e.g. complement).
+        """
+        chroms = []
+        for op in self.ops:
+            if op[3] is not None:
+                chroms.extend(op[3])
+        return chroms
+
+    def keeps_rows(self) -> bool:
+        """
+        Tell if the resulting intervals can be traced back to the source intervals (no merge or complement).
+        """
+        return all(op[2] for op in self.ops)
+
+    def run_chrom(self, chrom: str, starts, ends, rows, source: IntervalSet = None) -> tuple:
+        """
+        Run the operations on the intervals of one chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+          The chromosome name
+        starts, ends : np.ndarray
+          The intervals, sorted by start
+        rows : np.ndarray
+          The rows of the intervals in source
+        source : IntervalSet
+          The set the rows refer to, default is the source of the chain
+
+        Returns
+        -------
+        tuple
+          The starts, ends and source rows of the resulting intervals.
+        """
+        source = self.source if source is None else source
+        for name, kernel, keeps_rows, op_chroms in self.ops:
+            starts, ends, rows = kernel(chrom, starts, ends, rows, source)
+        return starts, ends, rows
+
+    def collect(self) -> IntervalSet:
+        """
+        Run the chain.
+
+        Returns
+        -------
+        IntervalSet
+          The resulting intervals, with the names and strands of the source when all operations keep them.
+        """
+        chroms, offsets, starts, ends, rows = [], [0], [], [], []
+        for chrom, chrom_starts, chrom_ends, chrom_rows in self.iter_chroms():
+            chroms.append(chrom)
+            offsets.append(offsets[-1] + len(chrom_starts))
+            starts.append(chrom_starts)
+            ends.append(chrom_ends)
+            rows.append(chrom_rows)
+        starts, ends, rows = (np.concatenate(a) if a else _empty()[0] for a in (starts, ends, rows))
+        names, strands = None, None
+        if self.keeps_rows():
+            if self.source.names is not None:
+                names = self.source.names[rows]
+            if self.source.strands is not None:
+                strands = self.source.strands[rows]
+        return IntervalSet(chroms, offsets, starts, ends, names, strands)
+
+
+def _as_set(intervals) -> IntervalSet:
+    if isinstance(intervals, IntervalSet):
+        return intervals
+    if isinstance(intervals, IntervalIndex):
+        return intervals.intervals
+    if isinstance(intervals, IntervalChain):
+        return intervals.collect()
+    return IntervalSet.from_bed(intervals)
+
+
+def merge(intervals: IntervalSet, distance: int = 0) -> IntervalSet:
+    """
+    Merge the overlapping intervals, and the ones closer than distance (as bedtools merge -d).
+    """
+    return IntervalChain(intervals).merge(distance).collect()
+
+
+def subtract(intervals: IntervalSet, other) -> IntervalSet:
+    """
+    Remove the parts of the intervals covered by another set (as bedtools subtract).
+    """
+    return IntervalChain(intervals).subtract(other).collect()
+
+
+def complement(intervals: IntervalSet, chrom_sizes) -> IntervalSet:
+    """
+    Return the parts of the chromosomes in chrom_sizes not covered by the intervals (as bedtools complement).
+    """
+    return IntervalChain(intervals).complement(chrom_sizes).collect()
+
+
+def slop(
+    intervals: IntervalSet, left: int, right: int = None, chrom_sizes=None, stranded: bool = False
+) -> IntervalSet:
+    """
+    Extend the intervals (as bedtools slop), see IntervalChain.slop.
+    """
+    return IntervalChain(intervals).slop(left, right, chrom_sizes, stranded).collect()
+
+
+def window(intervals: IntervalSet, other, left: int, right: int = None) -> IntervalSet:
+    """
+    Keep the intervals with an interval of another set within a window (as bedtools window -u).
+    """
+    return IntervalChain(intervals).window(other, left, right).collect()
+
+
+def intersect(intervals: IntervalSet, other) -> IntervalSet:
+    """
+    Return the overlapping parts of the intervals with another set (as bedtools intersect).
+    """
+    return IntervalChain(intervals).intersect(other).collect()
+
+
+def cluster(intervals: IntervalSet, distance: int = 0) -> np.ndarray:
+    """
+    Number the clusters of overlapping intervals (as bedtools cluster -d).
+
+    Parameters
+    ----------
+    intervals : IntervalSet
+      The intervals to cluster
+    distance : int
+      Intervals closer than this distance are in the same cluster, default is 0
+
+    Returns
+    -------
+    np.ndarray
+      The cluster of each interval (row of the IntervalSet), numbered from 1.
+    """
+    clusters = np.empty(len(intervals), dtype=np.int64)
+    n = 0
+    for k, (chrom, starts, ends) in enumerate(intervals.iter_chroms()):
+        first = cluster_starts(starts, ends, distance)
+        sizes = np.diff(np.append(first, len(starts)))
+        rows = slice(intervals.offsets[k], intervals.offsets[k + 1])
+        clusters[rows] = n + np.repeat(np.arange(1, len(first) + 1), sizes)
+        n += len(first)
+    return clusters
@@ -0,0 +1,297 @@
+import re
+import numpy as np
+import pandas as pd
+
+from millefeuille.module.gff2bed import get_Dictgff
+from millefeuille.module.intervals import IntervalSet, HEADER_PREFIXES, cluster_starts, merge_sorted
+from millefeuille.module.streams import is_path, open_lines
+
+# at most one bit per BED set in the membership masks
+MAX_SETS = 64
+# a GTF attribute: a key, a space and a quoted value
+GTF_ATTRIBUTE = re.compile(r'\s*[^\s=;"]+\s+"')
+
+
+def _data_lines(source) -> tuple:
+    # the first data line of a file name (read again later), or all the lines of a stream
+    if is_path(source) and source != "-":
+        with open_lines(source) as f:
+            for l in f:
+                if l.strip() and not l.startswith(HEADER_PREFIXES):
+                    return source, [l]
+        return source, []
+    with open_lines(source) as f:
+        lines = [l for l in f if l.strip() and not l.startswith(HEADER_PREFIXES)]
+    return lines, lines[:1]
+
+
+def _is_gff(line: str) -> bool:
+    fields = line.rstrip("\r\n").split("\t")
+    return len(fields) == 9 and not fields[1].isdigit()
+
+
+def _is_gtf(line: str) -> bool:
+    return GTF_ATTRIBUTE.match(line.rstrip("\r\n").split("\t")[8]) is not None
+
+
+class TranscriptBlocks:
+    """
+    The blocks (ie exons) of transcripts, exploded into one sorted array.
+
+    The blocks of each transcript are merged, so that overlapping exons are not
+    counted twice, then sorted by chromosome and start in an IntervalSet. The
+    transcript of each block is given by owners, a row of names, chroms, starts,
+    ends and strands.
+
+    Parameters
+    ----------
+    blocks : IntervalSet
+      The blocks of all transcripts, sorted
+    owners : np.ndarray
+      The transcript of each block
+    names : np.ndarray
+      The name of each transcript
+    chroms : np.ndarray
+      The chromosome of each transcript
+    strands : np.ndarray
+      The strand of each transcript
+    """
+
+    def __init__(self, blocks: IntervalSet, owners, names, chroms, strands):
+        self.blocks = blocks
+        self.owners = np.asarray(owners, dtype=np.int64)
+        self.names = np.asarray(names, dtype=object)
+        self.chroms = np.asarray(chroms, dtype=object)
+        self.strands = np.asarray(strands, dtype=object)
+        n = len(self.names)
+        self.starts = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        self.ends = np.zeros(n, dtype=np.int64)
+        np.minimum.at(self.starts, self.owners, blocks.starts)
+        np.maximum.at(self.ends, self.owners, blocks.ends)
+        self.sizes = np.bincount(self.owners, blocks.ends - blocks.starts, minlength=n).astype(np.int64)
+
+    @classmethod
+    def from_arrays(cls, block_chroms, block_starts, block_ends, owners, names, strands) -> "TranscriptBlocks":
+        """
+        Create TranscriptBlocks from unsorted block columns.
+
+        Parameters
+        ----------
+        block_chroms, block_starts, block_ends
+          The chromosome, start and end of each block (0-based, half-open)
+        owners
+          The transcript (row of names) of each block
+        names
+          The name of each transcript
+        strands
+          The strand of each transcript
+        """
+        block_chroms = np.asarray(block_chroms, dtype=str)
+        starts = np.asarray(block_starts, dtype=np.int64)
+        ends = np.asarray(block_ends, dtype=np.int64)
+        owners = np.asarray(owners, dtype=np.int64)
+        # the chromosome of a transcript is the one of its first block
+        chroms = np.empty(len(names), dtype=object)
+        listed, first = np.unique(owners, return_index=True)
+        chroms[listed] = block_chroms[first]
+        if len(starts):
+            # merge the blocks of each transcript and chromosome: sort them by
+            # transcript, chromosome and start, then shift the coordinates of each
+            # group past the previous one so that one sweep never joins two groups
+            _, codes = np.unique(block_chroms, return_inverse=True)
+            order = np.lexsort((starts, codes, owners))
+            starts, ends, codes, owners = starts[order], ends[order], codes[order], owners[order]
+            groups = np.cumsum(np.concatenate([[0], (np.diff(owners) != 0) | (np.diff(codes) != 0)]))
+            shift = groups * (ends.max() + 1)
+            first = cluster_starts(starts + shift, ends + shift)
+            starts, ends = starts[first], np.maximum.reduceat(ends, first)
+            block_chroms, owners = block_chroms[order[first]], owners[first]
+        blocks = IntervalSet.from_arrays(block_chroms, starts, ends, owners)
+        owners = np.asarray(blocks.names, dtype=np.int64)
+        blocks.names = None
+        return cls(blocks, owners, names, chroms, strands)
+
+    @classmethod
+    def from_gff(
+        cls, file_gff, mol_type: str = "exon", feature_type: str = "Parent", workers: int = 1
+    ) -> "TranscriptBlocks":
+        """
+        Read the blocks of a GFF or GTF file, grouped by feature_type as gff2bed.get_Dictgff.
+
+        Parameters
+        ----------
+        file_gff
+          Name of the GFF file, "-" for stdin, a file-like object or an iterable of lines
+        mol_type : str
+          The molecular type (column 3 of the GFF file) of the blocks, default is exon
+        feature_type : str
+          The feature type (column 9 of the GFF file) grouping the blocks, default is Parent
+        workers : int
+          Number of processes parsing the GFF file, default is 1 (serial)
+        """
+        myDict = get_Dictgff(file_gff, mol_type, feature_type, id_as_features=False, workers=workers)
+        chroms, starts, ends, owners, strands = [], [], [], [], []
+        for i, exons in enumerate(myDict.values()):
+            for exon in exons:
+                chroms.append(exon["chr"])
+                starts.append(int(exon["start"]) - 1)
+                ends.append(int(exon["stop"]))
+                owners.append(i)
+            strands.append(exons[0]["strand"])
+        return cls.from_arrays(chroms, starts, ends, owners, list(myDict), strands)
+
+    @classmethod
+    def from_bed12(cls, file_bed) -> "TranscriptBlocks":
+        """
+        Read the blocks of a BED12 file, one transcript per line.
+
+        Parameters
+        ----------
+        file_bed
+          Name of the BED12 file, "-" for stdin, a file-like object or an iterable of lines
+        """
+        chroms, starts, sizes, counts, names, strands = [], [], [], [], [], []
+        with open_lines(file_bed) as f:
+            for l in f:
+                if not l.strip() or l.startswith(HEADER_PREFIXES):
+                    continue
+                line = l.rstrip("\r\n").split("\t")
+                block_starts = [int(k) for k in line[11].rstrip(",").split(",")]
+                chroms.append(line[0])
+                starts.extend(int(line[1]) + k for k in block_starts)
+                sizes.extend(int(k) for k in line[10].rstrip(",").split(","))
+                counts.append(len(block_starts))
+                names.append(line[3])
+                strands.append(line[5])
+        starts = np.asarray(starts, dtype=np.int64)
+        owners = np.repeat(np.arange(len(names)), counts)
+        return cls.from_arrays(
+            np.asarray(chroms, dtype=str)[owners], starts, starts + np.asarray(sizes, dtype=np.int64),
+            owners, names, strands,
+        )
+
+    @classmethod
+    def read(cls, source, mol_type: str = "exon", feature_type: str = "Parent", workers: int = 1) -> "TranscriptBlocks":
+        """
+        Read the blocks of a GFF, GTF or BED12 source, the format being guessed from its first line.
+
+        GTF files have no Parent attribute: their blocks are grouped by transcript_id
+        when feature_type is left to Parent.
+        """
+        source, first = _data_lines(source)
+        if first and _is_gff(first[0]):
+            if feature_type == "Parent" and _is_gtf(first[0]):
+                feature_type = "transcript_id"
+            return cls.from_gff(source, mol_type, feature_type, workers)
+        return cls.from_bed12(source)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def coverage(self, intervals: IntervalSet) -> np.ndarray:
+        """
+        Count the bp of the blocks of each transcript covered by a set of intervals.
+
+        The intervals are merged, and the covered bp of all blocks are obtained from
+        the prefix sums of the merged interval sizes, with two binary searches per block.
+
+        Parameters
+        ----------
+        intervals : IntervalSet
+          The intervals, e.g. the peaks of a BED file
+
+        Returns
+        -------
+        np.ndarray
+          The covered bp of each transcript.
+        """
+        bp = np.zeros(len(self.blocks), dtype=np.int64)
+        for k, chrom in enumerate(self.blocks.chroms):
+            rows = slice(self.blocks.offsets[k], self.blocks.offsets[k + 1])
+            other = intervals.chrom_slice(chrom)
+            if other.stop == other.start:
+                continue
+            starts, ends = merge_sorted(intervals.starts[other], intervals.ends[other])
+            cum = np.concatenate([[0], np.cumsum(ends - starts)])
+            bp[rows] = _covered(self.blocks.ends[rows], starts, ends, cum) - _covered(
+                self.blocks.starts[rows], starts, ends, cum
+            )
+        return np.bincount(self.owners, bp, minlength=len(self)).astype(np.int64)
+
+
+def _covered(x: np.ndarray, starts: np.ndarray, ends: np.ndarray, cum: np.ndarray) -> np.ndarray:
+    # bp of the disjoint sorted intervals before each position of x
+    k = np.searchsorted(ends, x, side="right")
+    inside = np.clip(x - starts[np.minimum(k, len(starts) - 1)], 0, None)
+    return cum[k] + np.where(k < len(starts), inside, 0)
+
+
+def annotate(
+    transcripts,
+    list_bed: list,
+    names: list = None,
+    mol_type: str = "exon",
+    feature_type: str = "Parent",
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Annotate the blocks of each transcript with the BED sets overlapping them.
+
+    Parameters
+    ----------
+    transcripts
+      A GFF, GTF or BED12 file name, "-" for stdin, a file-like object, an
+      iterable of lines (e.g. gff2bed.bed12_records) or TranscriptBlocks
+    list_bed : list
+      The BED sets (file names, streams, iterables of lines or IntervalSet), at most 64
+    names : list
+      The name of each set, default is set1, set2...
+    mol_type : str
+      The molecular type of the blocks in a GFF file, default is exon
+    feature_type : str
+      The feature type grouping the blocks in a GFF file, default is Parent (transcript_id for GTF files)
+    workers : int
+      Number of processes parsing a GFF file, default is 1 (serial)
+
+    Returns
+    -------
+    pd.DataFrame
+      One row per transcript with its Chromosome, Start, End, Name, Strand, the
+      bp of its blocks (BlockBp), the sets overlapping its blocks (Mask, bit k set
+      for the set k) and the bp covered by each set (one column per set name).
+    """
+    if len(list_bed) > MAX_SETS:
+        raise ValueError("at most " + str(MAX_SETS) + " BED sets can be annotated at once")
+    if names is None:
+        names = ["set" + str(k + 1) for k in range(len(list_bed))]
+    if len(names) != len(list_bed):
+        raise ValueError("names must have one name per BED set")
+    if not isinstance(transcripts, TranscriptBlocks):
+        transcripts = TranscriptBlocks.read(transcripts, mol_type, feature_type, workers)
+    df = pd.DataFrame(
+        {
+            "Chromosome": transcripts.chroms,
+            "Start": transcripts.starts,
+            "End": transcripts.ends,
+            "Name": transcripts.names,
+            "Strand": transcripts.strands,
+            "BlockBp": transcripts.sizes,
+        }
+    )
+    mask = np.zeros(len(transcripts), dtype=np.uint64)
+    coverage = {}
+    for k, (name, bed) in enumerate(zip(names, list_bed)):
+        intervals = bed if isinstance(bed, IntervalSet) else IntervalSet.from_bed(bed)
+        coverage[name] = transcripts.coverage(intervals)
+        mask |= (coverage[name] > 0).astype(np.uint64) << np.uint64(k)
+    df["Mask"] = mask
+    for name in names:
+        df[name] = coverage[name]
+    return df
+
+
+def mask_sets(mask: int, names: list) -> list:
+    """
+    Return the names of the sets of a membership mask, see annotate.
+    """
+    return [name for k, name in enumerate(names) if int(mask) >> k & 1]
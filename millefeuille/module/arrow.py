@@ -0,0 +1,303 @@
+import io
+
+from millefeuille.module.streams import ARROW_EXTENSIONS, is_path, open_lines
+
+BED_COLUMNS = "Chromosome Start End Name Score Strand ThickStart ThickEnd ItemRGB BlockCount BlockSizes BlockStarts".split()
+GFF_COLUMNS = "Chromosome Source Feature Start End Score Strand Frame Attributes".split()
+INT_COLUMNS = {"Start", "End", "ThickStart", "ThickEnd", "BlockCount"}
+LIST_COLUMNS = {"BlockSizes", "BlockStarts"}
+BATCH_LINES = 1 << 16
+
+
+def _pyarrow():
+    # pyarrow is an optional dependency, imported on first use
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Arrow and Parquet files need pyarrow, install it with: pip install millefeuille[arrow]"
+        ) from e
+    return pyarrow
+
+
+def is_arrow(source) -> bool:
+    """
+    Tell if a source or destination is an Arrow IPC or Parquet file name, from its extension.
+    """
+    return is_path(source) and str(source).lower().endswith(ARROW_EXTENSIONS)
+
+
+def _is_parquet(path) -> bool:
+    return str(path).lower().endswith((".parquet", ".pq"))
+
+
+def _columns(first_line: list) -> list:
+    # BED lines have an integer in column 2, GFF lines a source
+    if len(first_line) == 9 and not first_line[1].isdigit():
+        return GFF_COLUMNS
+    return BED_COLUMNS[: len(first_line)]
+
+
+def lines_table(lines, columns: list = None):
+    """
+    Convert BED or GFF lines into an Arrow table.
+
+    The coordinates are stored as int64, the blockSizes and blockStarts of BED12
+    lines as list<int64> columns and the other fields as strings. Columns are named
+    as in pyranges (Chromosome, Start, End...), GFF coordinates stay 1-based.
+
+    Parameters
+    ----------
+    lines
+      An iterable of lines, a file name or a file-like object
+    columns : list
+      The column names, default is guessed from the first line (BED or GFF)
+
+    Returns
+    -------
+    pa.Table
+      The table, None if there is no line.
+    """
+    pa = _pyarrow()
+    with open_lines(lines) as f:
+        text = "".join(l for l in f if l.strip() and not l.startswith(("#", "track", "browser")))
+    if not text:
+        return None
+    if columns is None:
+        columns = _columns(text[: text.index("\n") if "\n" in text else len(text)].split("\t"))
+    types = {c: pa.int64() if c in INT_COLUMNS and c in columns else pa.string() for c in columns}
+    table = pa.csv.read_csv(
+        io.BytesIO(text.encode()),
+        read_options=pa.csv.ReadOptions(column_names=columns),
+        parse_options=pa.csv.ParseOptions(delimiter="\t", quote_char=False),
+        convert_options=pa.csv.ConvertOptions(column_types=types, strings_can_be_null=False),
+    )
+    for name in LIST_COLUMNS & set(columns):
+        # UCSC lists may end with a comma
+        values = pa.compute.split_pattern(
+            pa.compute.utf8_rtrim(table[name], characters=","), pattern=","
+        )
+        table = table.set_column(
+            columns.index(name), name, pa.compute.cast(values, pa.list_(pa.int64()))
+        )
+    return table
+
+
+def table_lines(table) -> iter:
+    """
+    Format the rows of an Arrow table made by lines_table (or with the same columns) as BED or GFF lines.
+
+    Returns
+    -------
+    generator
+      The lines, ending with a newline.
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    for batch in table.to_batches(max_chunksize=BATCH_LINES):
+        fields = []
+        for name, column in zip(batch.schema.names, batch.columns):
+            if pa.types.is_list(column.type):
+                column = pc.binary_join(pc.cast(column, pa.list_(pa.string())), ",")
+            fields.append(pc.cast(column, pa.string()))
+        for line in pc.binary_join_element_wise(*fields, "\t").to_pylist():
+            yield line + "\n"
+
+
+def write_table(table, dest, sort: bool = True, row_group_size: int = BATCH_LINES) -> None:
+    """
+    Write an Arrow table to a Parquet file or an Arrow IPC file, depending on the extension of dest.
+
+    Parameters
+    ----------
+    table : pa.Table
+      The table, with Chromosome and Start columns
+    dest : str
+      The Parquet (.parquet, .pq) or Arrow IPC (.arrow, .feather, .ipc) file name
+    sort : bool
+      If True (default), the rows are sorted by chromosome and start so that each
+      row group covers a small region, which lets read_table skip most of them
+    row_group_size : int
+      Number of rows per row group (Parquet) or record batch (Arrow IPC)
+    """
+    pa = _pyarrow()
+    if sort:
+        table = table.sort_by([("Chromosome", "ascending"), ("Start", "ascending")])
+    if _is_parquet(dest):
+        pa.parquet.write_table(table, dest, row_group_size=row_group_size)
+    else:
+        with pa.OSFile(str(dest), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=row_group_size)
+
+
+def _filter_expression(chroms: list, start: int, end: int):
+    pa = _pyarrow()
+    field = pa.compute.field
+    conditions = []
+    if chroms is not None:
+        conditions.append(field("Chromosome").isin(list(chroms)))
+    # intervals overlapping [start, end)
+    if start is not None:
+        conditions.append(field("End") > start)
+    if end is not None:
+        conditions.append(field("Start") < end)
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+def read_table(path, chroms: list = None, start: int = None, end: int = None, columns: list = None):
+    """
+    Read a Parquet or Arrow IPC file, keeping the intervals of some chromosomes and region.
+
+    Arrow IPC files are memory-mapped without copy. Parquet files are
+    memory-mapped too, and the chromosome and range conditions are pushed down
+    to the reader, which skips the row groups whose statistics exclude them.
+
+    Parameters
+    ----------
+    path : str
+      The Parquet (.parquet, .pq) or Arrow IPC (.arrow, .feather, .ipc) file name
+    chroms : list
+      The chromosomes to keep, default is all
+    start : int
+      Keep the intervals ending after start, default is None
+    end : int
+      Keep the intervals starting before end, default is None
+    columns : list
+      The columns to read, default is all
+
+    Returns
+    -------
+    pa.Table
+      The selected rows.
+    """
+    pa = _pyarrow()
+    expression = _filter_expression(chroms, start, end)
+    if _is_parquet(path):
+        return pa.parquet.read_table(path, columns=columns, filters=expression, memory_map=True)
+    # the table references the mapped pages, which stay mapped as long as it is used
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table if expression is None else table.filter(expression)
+
+
+def read_bed_frame(path, chroms: list = None, start: int = None, end: int = None):
+    """
+    Read a Parquet or Arrow IPC BED table as a DataFrame with pyranges columns, see read_table.
+    """
+    return read_table(path, chroms, start, end).to_pandas()
+
+
+class TableWriter:
+    """
+    A text file-like object turning the BED or GFF lines written to it into a Parquet or Arrow IPC file.
+
+    The lines are converted by batches, each batch becoming a row group (Parquet)
+    or a record batch (Arrow IPC), so that memory stays bounded. Rows are written
+    in the order they are received, sort them beforehand (or use write_table) for
+    the best row group skipping.
+
+    Parameters
+    ----------
+    dest : str
+      The Parquet or Arrow IPC file name
+    batch_lines : int
+      Number of lines per batch
+    """
+
+    def __init__(self, dest, batch_lines: int = BATCH_LINES):
+        self.pa = _pyarrow()
+        self.dest = dest
+        self.batch_lines = batch_lines
+        self.name = str(dest)
+        self._lines = []
+        self._tail = ""
+        self._columns = None
+        self._writer = None
+        self._sink = None
+
+    def write(self, text: str) -> int:
+        lines = (self._tail + text).split("\n")
+        # the last part is an incomplete line, completed by the next write
+        self._tail = lines.pop()
+        self._lines.extend(l + "\n" for l in lines)
+        if len(self._lines) >= self.batch_lines:
+            self.flush()
+        return len(text)
+
+    def writelines(self, lines) -> None:
+        for l in lines:
+            self.write(l)
+
+    def tell(self) -> int:
+        # the size of the file is only known once closed, so no byte count is reported
+        raise io.UnsupportedOperation("the position of a table file is unknown until it is closed")
+
+    def flush(self) -> None:
+        if not self._lines:
+            return
+        table = lines_table(self._lines, self._columns)
+        self._lines = []
+        if table is None:
+            return
+        if self._writer is None:
+            self._columns = table.schema.names
+            if _is_parquet(self.dest):
+                self._writer = self.pa.parquet.ParquetWriter(str(self.dest), table.schema)
+            else:
+                self._sink = self.pa.OSFile(str(self.dest), "wb")
+                self._writer = self.pa.ipc.new_file(self._sink, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._tail:
+            self._lines.append(self._tail + "\n")
+            self._tail = ""
+        self.flush()
+        if self._writer is None:
+            # no line: still create an empty file, as text outputs do
+            open(self.dest, "wb").close()
+            return
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def convert(source, dest, sort: bool = True) -> int:
+    """
+    Convert a BED or GFF text file into a Parquet or Arrow IPC file.
+
+    Parameters
+    ----------
+    source
+      A BED or GFF file name, "-" for stdin, a file-like object or an iterable of lines
+    dest : str
+      The Parquet or Arrow IPC file name
+    sort : bool
+      If True (default), sort the rows by chromosome and start, see write_table
+
+    Returns
+    -------
+    int
+      The number of rows written.
+    """
+    table = lines_table(source)
+    if table is None:
+        raise ValueError("no line to convert in " + str(source))
+    write_table(table, dest, sort)
+    return table.num_rows
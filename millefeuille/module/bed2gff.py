@@ -2,26 +2,72 @@ import os
 import sys
 import argparse
 
+from millefeuille.module.parser import parse_file, splittable
+from millefeuille.module.profiling import Profiler, profile_stage, file_size
+from millefeuille.module.streams import open_lines, open_output, source_name, stream_position
 
-def get_Dictbed(file_bed: str) -> list:
+
+def iter_bed(file_bed) -> iter:
+    """
+    Read a BED file one element at a time, as dictionaries.
+
+    Parameters
+    ----------
+    file_bed
+      Name of the BED file, "-" for stdin, a file-like object or an iterable of lines
+
+    Returns
+    -------
+    generator
+      A dictionary with chr, start, end, features and strand keys for each element.
+    """
+    keys = ["chr", "start", "end", "features", "strand"]
+    with open_lines(file_bed) as f:
+        for l in f:
+            line = l.rstrip("\r\n").split("\t")
+            yield dict(zip(keys, [line[i] for i in [0, 1, 2, 3, 5]]))
+
+
+def iter_bed12(file_bed) -> iter:
+    """
+    Read a BED12 file one element at a time, as dictionaries.
+
+    Parameters
+    ----------
+    file_bed
+      Name of the BED12 file, "-" for stdin, a file-like object or an iterable of lines
+
+    Returns
+    -------
+    generator
+      A dictionary with chr, start, features, strand, block, size and starting_block keys for each element.
+    """
+    keys = ["chr", "start", "features", "strand", "block", "size", "starting_block"]
+    with open_lines(file_bed) as f:
+        for l in f:
+            line = l.rstrip("\r\n").split("\t")
+            yield dict(zip(keys, [line[i] for i in [0, 1, 3, 5, 9, 10, 11]]))
+
+
+def get_Dictbed(file_bed: str, workers: int = 1) -> list:
     """
     Converts a given BED file into a list of dictionaries with features from a given gff file.
       The name of each element should be the list of its features (cf argument id_as_features in gff_to_bed script)
     Parameters
     ----------
     file_bed : str
-      Name of the BED file to be converted
+      Name of the BED file to be converted, "-" for stdin, a file-like object or an iterable of lines
+    workers : int
+      Number of processes parsing a BED file name in parallel (see parser.parse_file), default is 1 (serial).
+      Small files and streams are always read serially
     """
-    # put bed info into lis of dictionaries
-    with open(file_bed, "r") as f:
-        ListDict = []
+    if workers != 1 and splittable(file_bed):
+        columns = parse_file(file_bed, "bed", workers)
         keys = ["chr", "start", "end", "features", "strand"]
-        for l in f:
-            values = [l.rstrip("\r\n").split("\t")[i] for i in [0, 1, 2, 3, 5]]
-            elementDict = dict(zip(keys, values))
-            ListDict.append(elementDict)
-    f.closed
-    return ListDict
+        fields = [columns[k].astype(str).tolist() for k in keys]
+        return [dict(zip(keys, values)) for values in zip(*fields)]
+    # put bed info into lis of dictionaries
+    return list(iter_bed(file_bed))
 
 
 def get_Dictbed12(file_bed: str) -> list:
@@ -32,21 +78,147 @@ def get_Dictbed12(file_bed: str) -> list:
     Parameters
     ----------
     file_bed : str
-      Name of the BED file to be converted
+      Name of the BED file to be converted, "-" for stdin, a file-like object or an iterable of lines
     """
     # put bed12 info into lis of dictionaries
-    with open(file_bed, "r") as f:
-        ListDict = []
-        keys = ["chr", "start", "features", "strand", "block", "size", "starting_block"]
-        for l in f:
-            values = [l.rstrip("\r\n").split("\t")[i] for i in [0, 1, 3, 5, 9, 10, 11]]
-            elementDict = dict(zip(keys, values))
-            ListDict.append(elementDict)
-    f.close()
-    return ListDict
+    return list(iter_bed12(file_bed))
+
+
+def gff_lines(Dictbed, source: str, mol_type: str, make_gff3: bool = True) -> iter:
+    """
+    Format BED elements as GFF lines.
+
+    Parameters
+    ----------
+    Dictbed
+      An iterable of dictionaries as returned by get_Dictbed
+    source : str
+      Name of the source
+    mol_type : str
+      Name of the molecular type of elements from BED
+    make_gff3 : bool
+      Specify if you want to make the output a proper gff3
+
+    Returns
+    -------
+    generator
+      One GFF line for each element.
+    """
+    for d in Dictbed:
+        if make_gff3 is True:
+            features = "feature_id=" + d["features"]
+        else:
+            features = d["features"]
+        yield "\t".join(
+            [
+                d["chr"],
+                source,
+                mol_type,
+                str(int(d["start"]) + 1),
+                d["end"],
+                ".",
+                d["strand"],
+                ".",
+                features + "\n",
+            ]
+        )
 
 
-def get_gff(file_bed: str, source: str, mol_type: str, make_gff3: bool = True) -> None:
+def gff_lines_from_bed12(
+    Dictbed, source: str, mol_type: str, make_gff3: bool = True
+) -> iter:
+    """
+    Format BED12 elements as GFF lines, one line per block.
+
+    Parameters
+    ----------
+    Dictbed
+      An iterable of dictionaries as returned by get_Dictbed12
+    source : str
+      Name of the source
+    mol_type : str
+      Name of the molecular type of elements from BED
+    make_gff3 : bool
+      Specify if you want to make the output a proper gff3
+
+    Returns
+    -------
+    generator
+      One GFF line for each block of each element.
+    """
+    for d in Dictbed:
+        sizes = list(map(int, d["size"].rstrip(",").split(",")))
+        starts = list(map(int, d["starting_block"].rstrip(",").split(",")))
+        if make_gff3 is True:
+            features = "feature_id=" + d["features"]
+        else:
+            features = d["features"]
+        for i in range(0, int(d["block"])):
+            yield "\t".join(
+                [
+                    d["chr"],
+                    source,
+                    mol_type,
+                    str(starts[i] + 1 + int(d["start"])),
+                    str(starts[i] + 1 + int(d["start"]) + sizes[i]),
+                    ".",
+                    d["strand"],
+                    ".",
+                    features + "\n",
+                ]
+            )
+
+
+def gff_records(
+    file_bed, source: str, mol_type: str, is_bed12: bool = False, make_gff3: bool = True
+) -> iter:
+    """
+    Stream the conversion of a BED file into GFF lines, without writing any file.
+
+    Parameters
+    ----------
+    file_bed
+      Name of the BED file, "-" for stdin, a file-like object or an iterable of lines
+    source : str
+      Name of the source
+    mol_type : str
+      Name of the molecular type of elements from BED
+    is_bed12 : bool
+      Specify this argument if bed file is bed12 formated and contain blocks
+    make_gff3 : bool
+      Specify if you want to make the output a proper gff3
+
+    Returns
+    -------
+    generator
+      The GFF lines, ending with a newline.
+    """
+    if is_bed12:
+        return gff_lines_from_bed12(iter_bed12(file_bed), source, mol_type, make_gff3)
+    return gff_lines(iter_bed(file_bed), source, mol_type, make_gff3)
+
+
+def gff_output(file_bed, output=None):
+    """
+    Return the output of a conversion, by default the BED file name with a .gff extension.
+    """
+    if output is not None:
+        return output
+    name = source_name(file_bed)
+    if name is None:
+        raise ValueError("output must be given when file_bed is not a file name")
+    return os.path.splitext(name)[0] + ".gff"
+
+
+def get_gff(
+    file_bed: str,
+    source: str,
+    mol_type: str,
+    make_gff3: bool = True,
+    profiler: Profiler = None,
+    output=None,
+    workers: int = 1,
+) -> None:
     """
     Converts a given BED file into a GFF file with features from a given gff file.
       The name of each element should be the list of its features (cf argument id_as_features in gff_to_bed script)
@@ -54,56 +226,42 @@ def get_gff(file_bed: str, source: str, mol_type: str, make_gff3: bool = True) -
     ----------
 
     file_bed : str
-      Name of the BED file to be converted
+      Name of the BED file to be converted, "-" for stdin, a file-like object or an iterable of lines
     source : str
       Name of the source
     mol_type : str
       Name of the molecular type of elements from BED
     make_gff3 : bool
       Specify if you want to make the output a proper gff3
+    profiler : Profiler
+      A Profiler measuring the parse and write stages, default is None (no profiling)
+    output
+      Name of the GFF file ("-" for stdout) or writable file-like object, default is file_bed with a .gff extension
+    workers : int
+      Number of processes parsing the BED file, default is 1 (serial), see get_Dictbed
     """
+    output = gff_output(file_bed, output)
     # put bed info into lis of dictionaries
-    Dictbed = get_Dictbed(file_bed)
+    with profile_stage(profiler, "bed2gff.parse") as stats:
+        Dictbed = get_Dictbed(file_bed, workers)
+        if profiler:
+            stats["bytes"] = file_size(file_bed)
+            stats["records"] = len(Dictbed)
     # write info from dictionary into new gff file
-    with open(os.path.splitext(file_bed)[0] + ".gff", "w") as f:
-        for d in Dictbed:
-            if make_gff3 is True:
-                f.write(
-                    "\t".join(
-                        [
-                            d["chr"],
-                            source,
-                            mol_type,
-                            str(int(d["start"]) + 1),
-                            d["end"],
-                            ".",
-                            d["strand"],
-                            ".",
-                            "feature_id=" + d["features"] + "\n",
-                        ]
-                    )
-                )
-        else:
-            f.write(
-                "\t".join(
-                    [
-                        d["chr"],
-                        source,
-                        mol_type,
-                        str(int(d["start"]) + 1),
-                        d["end"],
-                        ".",
-                        d["strand"],
-                        ".",
-                        d["features"] + "\n",
-                    ]
-                )
-            )
-    f.closed
+    with profile_stage(profiler, "bed2gff.write") as stats, open_output(output) as f:
+        f.writelines(gff_lines(Dictbed, source, mol_type, make_gff3))
+        if profiler:
+            stats["records"] = len(Dictbed)
+            stats["bytes"] = stream_position(f)
 
 
 def get_gff_from_bed12(
-    file_bed: str, source: str, mol_type: str, make_gff3: bool = True
+    file_bed: str,
+    source: str,
+    mol_type: str,
+    make_gff3: bool = True,
+    profiler: Profiler = None,
+    output=None,
 ) -> None:
     """
     Converts a given BED file into a GFF file with features from a given gff file.
@@ -112,58 +270,41 @@ def get_gff_from_bed12(
     Parameters
     ----------
     file_bed : str
-      Name of the BED file to be converted
+      Name of the BED file to be converted, "-" for stdin, a file-like object or an iterable of lines
     source : str
       Name of the source
     mol_type : str
       Name of the molecular type of elements from BED
     make_gff3 : bool
       Specify if you want to make the output a proper gff3
+    profiler : Profiler
+      A Profiler measuring the parse and write stages, default is None (no profiling)
+    output
+      Name of the GFF file ("-" for stdout) or writable file-like object, default is file_bed with a .gff extension
     """
-    Dictbed = get_Dictbed12(file_bed)
+    output = gff_output(file_bed, output)
+    with profile_stage(profiler, "bed2gff.parse") as stats:
+        Dictbed = get_Dictbed12(file_bed)
+        if profiler:
+            stats["bytes"] = file_size(file_bed)
+            stats["records"] = len(Dictbed)
     # write info from dictionary into new gff file
-    with open(os.path.splitext(file_bed)[0] + ".gff", "w") as f:
-        for d in Dictbed:
-            sizes = map(int, list(d["size"].rstrip(",").split(",")))
-            starts = map(int, list(d["starting_block"].rstrip(",").split(",")))
-            for i in range(0, int(d["block"])):
-                if make_gff3 is True:
-                    f.write(
-                        "\t".join(
-                            [
-                                d["chr"],
-                                source,
-                                mol_type,
-                                str(starts[i] + 1 + int(d["start"])),
-                                str(starts[i] + 1 + int(d["start"]) + sizes[i]),
-                                ".",
-                                d["strand"],
-                                ".",
-                                "feature_id=" + d["features"] + "\n",
-                            ]
-                        )
-                    )
-                else:
-                    f.write(
-                        "\t".join(
-                            [
-                                d["chr"],
-                                source,
-                                mol_type,
-                                str(starts[i] + 1 + int(d["start"])),
-                                str(starts[i] + 1 + int(d["start"]) + sizes[i]),
-                                ".",
-                                d["strand"],
-                                ".",
-                                d["features"] + "\n",
-                            ]
-                        )
-                    )
-    f.closed
+    with profile_stage(profiler, "bed2gff.write") as stats, open_output(output) as f:
+        f.writelines(gff_lines_from_bed12(Dictbed, source, mol_type, make_gff3))
+        if profiler:
+            stats["records"] = sum(int(d["block"]) for d in Dictbed)
+            stats["bytes"] = stream_position(f)
 
 
 def bed2gff(
-    bed_file: str, source: str, mol_type: str, is_bed12: bool, make_gff3: bool
+    bed_file: str,
+    source: str,
+    mol_type: str,
+    is_bed12: bool,
+    make_gff3: bool,
+    profiler: Profiler = None,
+    output=None,
+    workers: int = 1,
 ) -> None:
     """
       Converts a given BED file into a GFF file with features from a given gff file.
@@ -173,7 +314,7 @@ def bed2gff(
     Parameters
       ----------
       bed_file : str
-        Name of the BED file to be converted
+        Name of the BED file to be converted, "-" for stdin, a file-like object or an iterable of lines
       source : str
         Name of the source
       mol_type : str
@@ -182,9 +323,16 @@ def bed2gff(
         Specify this argument if bed file is bed12 formated and contain blocks
       make_gff3 : bool
         Specify if you want to make the output a proper gff3
+      profiler : Profiler
+        A Profiler measuring the parse and write stages, default is None (no profiling)
+      output
+        Name of the GFF file ("-" for stdout) or writable file-like object, default is bed_file with a .gff extension
+      workers : int
+        Number of processes parsing a BED6 file, default is 1 (serial), see get_Dictbed
     """
     if is_bed12:
-        get_gff_from_bed12(bed_file, source, mol_type, make_gff3)
+        get_gff_from_bed12(bed_file, source, mol_type, make_gff3, profiler, output)
     else:
-        get_gff(bed_file, source, mol_type, make_gff3)
-    print("Created GFF file in working directory")
+        get_gff(bed_file, source, mol_type, make_gff3, profiler, output, workers)
+    if output is None:
+        print("Created GFF file in working directory")
@@ -0,0 +1,325 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+from millefeuille.module.streams import ARROW_EXTENSIONS, is_path, open_lines, open_output
+
+# changing the conversions must change this version, so that old entries are not reused
+CACHE_VERSION = 1
+MAX_BYTES = 1 << 30
+CHUNK_SIZE = 1 << 20
+ENTRY_SUFFIX = ".out"
+
+
+def default_directory() -> str:
+    """
+    Return the cache directory: $MILLEFEUILLE_CACHE, or ~/.cache/millefeuille.
+    """
+    return os.environ.get("MILLEFEUILLE_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "millefeuille"
+    )
+
+
+def _is_text_file(dest) -> bool:
+    return is_path(dest) and dest != "-" and not str(dest).lower().endswith(ARROW_EXTENSIONS)
+
+
+class ConversionCache:
+    """
+    A content-addressed cache of conversion outputs.
+
+    Each entry is the output of one conversion, stored under a key made of the
+    hash of the input bytes and of the conversion options. Entries are written
+    to a temporary file then renamed, so that concurrent processes never read a
+    partial entry, and the least recently used ones (by modification time,
+    updated on each hit) are removed when the cache grows over max_bytes.
+
+    Parameters
+    ----------
+    directory : str
+      The cache directory, created if needed, default is default_directory()
+    max_bytes : int
+      The maximum total size of the entries, default is 1 GiB
+    link : bool
+      If True, outputs are hard links to the entries (when possible) instead of
+      copies. Editing such an output in place would alter the entry
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = MAX_BYTES, link: bool = False):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.link = link
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, data, options: dict) -> str:
+        """
+        Hash input bytes (or a binary file object, read by chunks) and conversion options.
+        """
+        h = hashlib.sha256()
+        h.update(json.dumps([CACHE_VERSION, options], sort_keys=True).encode())
+        if isinstance(data, bytes):
+            h.update(data)
+        else:
+            for chunk in iter(lambda: data.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key: str, output) -> bool:
+        """
+        Write the entry of a key to output, if there is one.
+
+        Parameters
+        ----------
+        key : str
+          The key of the entry
+        output
+          A file name ("-" for stdout) or a writable file-like object
+
+        Returns
+        -------
+        bool
+          True if the entry was found and written.
+        """
+        entry = self.path(key)
+        try:
+            # mark the entry as recently used
+            os.utime(entry)
+            if _is_text_file(output):
+                # replaced rather than overwritten, as it may be a link to another entry
+                tmp = str(output) + "." + str(os.getpid()) + ".tmp"
+                linked = False
+                if self.link:
+                    try:
+                        os.link(entry, tmp)
+                        linked = True
+                    except OSError:
+                        # other file system, or no hard link support
+                        pass
+                if not linked:
+                    shutil.copyfile(entry, tmp)
+                os.replace(tmp, output)
+            else:
+                with open(entry, "r") as f, open_output(output) as out:
+                    shutil.copyfileobj(f, out)
+        except FileNotFoundError:
+            # not cached, or evicted by another process
+            return False
+        return True
+
+    def put(self, key: str, write) -> str:
+        """
+        Store an entry, written by write(f) to a text file object, then evict the oldest entries if needed.
+
+        Returns
+        -------
+        str
+          The path of the entry.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                write(f)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+        return self.path(key)
+
+    def entries(self) -> list:
+        """
+        List the entries as (modification time, size, path), the least recently used first.
+        """
+        entries = []
+        for e in os.scandir(self.directory):
+            if e.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, e.path))
+        return sorted(entries)
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+
+        Returns
+        -------
+        int
+          The number of entries removed.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # already removed by another process
+                pass
+            total -= size
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def convert(self, source, options: dict, convert, output) -> bool:
+        """
+        Write the output of a conversion, from the cache or by running it and storing the result.
+
+        Parameters
+        ----------
+        source
+          The input: a file name, "-" for stdin, a file-like object or an iterable of lines
+        options : dict
+          The conversion and its options, part of the key
+        convert
+          A function convert(source, f) writing the output of the conversion to a text file object
+        output
+          A file name ("-" for stdout) or a writable file-like object
+
+        Returns
+        -------
+        bool
+          True if the output came from the cache.
+        """
+        if _is_text_file(source):
+            with open(source, "rb") as f:
+                key = self.key(f, options)
+        else:
+            # streams are read once, and their lines given to the conversion
+            with open_lines(source) as f:
+                source = list(f)
+            key = self.key("".join(source).encode(), options)
+        if self.get(key, output):
+            return True
+        self.put(key, lambda f: convert(source, f))
+        if not self.get(key, output):
+            # evicted right away (e.g. larger than max_bytes): convert again
+            convert(source, output)
+        return False
+
+
+def _cache(cache) -> ConversionCache:
+    if isinstance(cache, ConversionCache):
+        return cache
+    return ConversionCache(cache)
+
+
+def cached_gff2bed(
+    file_gff,
+    output,
+    bed12: bool = True,
+    mol_type: str = "exon",
+    feature_type: str = "Parent",
+    id_as_features: bool = True,
+    skip_exon_number: bool = True,
+    collapse: bool = False,
+    cache=None,
+) -> bool:
+    """
+    Convert a GFF file into a BED12 (or BED6) file, reusing the output of a previous identical conversion.
+
+    Parameters
+    ----------
+    file_gff
+      The GFF file to be converted, "-" for stdin, a file-like object or an iterable of lines
+    output
+      Name of the BED file ("-" for stdout) or writable file-like object
+    bed12 : bool
+      If True (default), write a BED12 file, otherwise a BED6 file
+    mol_type, feature_type, id_as_features, skip_exon_number, collapse
+      The options of gff2bed.bed12_generator and gff2bed.bed6_generator
+    cache
+      A ConversionCache or a cache directory, default is default_directory()
+
+    Returns
+    -------
+    bool
+      True if the output came from the cache.
+    """
+    from millefeuille.module import gff2bed as g2b
+
+    options = {
+        "conversion": "gff2bed",
+        "bed12": bed12,
+        "mol_type": mol_type,
+        "feature_type": feature_type,
+        "id_as_features": id_as_features,
+    }
+    if bed12:
+        options["collapse"] = collapse
+
+        def convert(source, f):
+            g2b.bed12_generator(
+                "", source, mol_type, feature_type,
+                id_as_features=id_as_features, output=f, collapse=collapse,
+            )
+
+    else:
+        options["skip_exon_number"] = skip_exon_number
+
+        def convert(source, f):
+            g2b.bed6_generator(
+                "", source, mol_type, feature_type,
+                id_as_features=id_as_features, skip_exon_number=skip_exon_number, output=f,
+            )
+
+    return _cache(cache).convert(file_gff, options, convert, output)
+
+
+def cached_bed2gff(
+    file_bed,
+    output,
+    source: str = "millefeuille",
+    mol_type: str = "region",
+    is_bed12: bool = False,
+    make_gff3: bool = True,
+    cache=None,
+) -> bool:
+    """
+    Convert a BED file into a GFF file, reusing the output of a previous identical conversion.
+
+    Parameters
+    ----------
+    file_bed
+      The BED file to be converted, "-" for stdin, a file-like object or an iterable of lines
+    output
+      Name of the GFF file ("-" for stdout) or writable file-like object
+    source, mol_type, is_bed12, make_gff3
+      The options of bed2gff.bed2gff
+    cache
+      A ConversionCache or a cache directory, default is default_directory()
+
+    Returns
+    -------
+    bool
+      True if the output came from the cache.
+    """
+    from millefeuille.module import bed2gff as b2g
+
+    options = {
+        "conversion": "bed2gff",
+        "source": source,
+        "mol_type": mol_type,
+        "is_bed12": is_bed12,
+        "make_gff3": make_gff3,
+    }
+
+    def convert(bed, f):
+        b2g.bed2gff(bed, source, mol_type, is_bed12, make_gff3, output=f)
+
+    return _cache(cache).convert(file_bed, options, convert, output)
@@ -0,0 +1,328 @@
+import os
+import sys
+import argparse
+import importlib
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+
+def read_manifest(manifest: str) -> list:
+    """
+    Read a manifest file listing one input per line.
+
+    Empty lines and lines starting with # are skipped. A line can hold several
+    tab or space separated paths (e.g. the three BED files of an overlap job).
+
+    Parameters
+    ----------
+    manifest : str
+      Name of the manifest file, or - for stdin
+
+    Returns
+    -------
+    list
+      A list with the list of fields of each line.
+    """
+    f = sys.stdin if manifest == "-" else open(manifest, "r")
+    try:
+        return [l.split() for l in f if l.strip() and not l.startswith("#")]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _init_worker(modules: list) -> None:
+    # import heavy dependencies once per worker rather than once per task
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _gff2bed_records(gff_file: str, options: dict) -> iter:
+    from millefeuille.module import gff2bed as g2b
+
+    if options["bed12"]:
+        return g2b.bed12_records(
+            gff_file,
+            mol_type=options["mol_type"],
+            feature_type=options["feature_type"],
+            id_as_features=options["id_as_features"],
+            collapse=options["collapse"],
+        )
+    return g2b.bed6_records(
+        gff_file,
+        mol_type=options["mol_type"],
+        feature_type=options["feature_type"],
+        id_as_features=options["id_as_features"],
+    )
+
+
+def _bed2gff_records(bed_file: str, options: dict) -> iter:
+    from millefeuille.module import bed2gff as b2g
+
+    return b2g.gff_records(bed_file, **options)
+
+
+def _run_gff2bed(gff_file: str, options: dict, outdir: str):
+    from millefeuille.module import gff2bed as g2b
+
+    # converter messages go to stderr so that stdout stays clean for pipelines
+    with redirect_stdout(sys.stderr):
+        if outdir is None:
+            return "".join(_gff2bed_records(gff_file, options))
+        name = os.path.basename(gff_file).replace(".gff", "").replace(".gtf", "")
+        g2b.gff2bed(gff_file, path=outdir, name=name, **options)
+    outputs = []
+    if not options["no_bed6"]:
+        outputs.append(os.path.join(outdir, name + ".bed6"))
+    if options["bed12"]:
+        outputs.append(os.path.join(outdir, name + ".bed12"))
+    return outputs
+
+
+def _run_bed2gff(bed_file: str, options: dict, outdir: str):
+    from millefeuille.module import bed2gff as b2g
+
+    with redirect_stdout(sys.stderr):
+        if outdir is None:
+            return "".join(_bed2gff_records(bed_file, options))
+        output = os.path.join(outdir, os.path.splitext(os.path.basename(bed_file))[0] + ".gff")
+        b2g.bed2gff(bed_file, output=output, **options)
+    return [output]
+
+
+def _run_overlaps(list_bed: list, options: dict, outdir: str) -> dict:
+    from millefeuille.module import overlaps as ov
+
+    with redirect_stdout(sys.stderr):
+        return ov.all_overlaps(list_bed, **options)
+
+
+def run_batch(task, inputs: list, options: dict, jobs: int, outdir: str, modules: list):
+    """
+    Run a conversion task over many inputs, in a shared pool of worker processes.
+
+    Parameters
+    ----------
+    task
+      The module level function processing one input
+    inputs : list
+      The inputs, processed in order
+    options : dict
+      Keyword arguments passed to each task
+    jobs : int
+      Number of worker processes, 1 runs everything in the current process
+    outdir : str
+      The directory where outputs are written
+    modules : list
+      Modules imported once by each worker before processing tasks
+
+    Returns
+    -------
+    generator
+      The results of the task, in the order of the inputs.
+    """
+    if jobs <= 1 or len(inputs) <= 1:
+        for i in inputs:
+            yield task(i, options, outdir)
+        return
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(inputs)),
+        initializer=_init_worker,
+        initargs=(modules,),
+    ) as pool:
+        futures = [pool.submit(task, i, options, outdir) for i in inputs]
+        for future in futures:
+            yield future.result()
+
+
+def stream_records(records, inputs: list, options: dict, jobs: int, task, modules: list) -> None:
+    """
+    Write the converted records of many inputs to stdout, in the order of the inputs.
+
+    With a single job the records are streamed as they are produced, otherwise
+    each worker returns the converted text of its input.
+    """
+    out = sys.stdout
+    if jobs <= 1 or len(inputs) <= 1:
+        for i in inputs:
+            # converter messages go to stderr so that stdout stays clean for pipelines
+            with redirect_stdout(sys.stderr):
+                out.writelines(records(i, options))
+            out.flush()
+        return
+    for text in run_batch(task, inputs, options, jobs, None, modules):
+        out.write(text)
+        out.flush()
+
+
+def collect_inputs(args, group: int = 1) -> list:
+    """
+    Gather the inputs given on the command line and in the manifest.
+
+    Parameters
+    ----------
+    args
+      The parsed arguments, with inputs and manifest attributes
+    group : int
+      Number of files per job, e.g. 3 for overlaps, default is 1
+
+    Returns
+    -------
+    list
+      A list of inputs, file names if group is 1 and lists of file names otherwise.
+    """
+    inputs = list(args.inputs)
+    if len(inputs) % group:
+        raise SystemExit("inputs must be given by groups of " + str(group))
+    inputs = [inputs[i : i + group] for i in range(0, len(inputs), group)]
+    if args.manifest:
+        for fields in read_manifest(args.manifest):
+            if len(fields) != group:
+                raise SystemExit(
+                    "each manifest line must hold " + str(group) + " file(s): " + " ".join(fields)
+                )
+            inputs.append(fields)
+    if not inputs:
+        raise SystemExit("no input given")
+    return [i[0] for i in inputs] if group == 1 else inputs
+
+
+def cmd_gff2bed(args) -> int:
+    if args.stdout and args.format == "both":
+        raise SystemExit("--stdout requires --format bed6 or --format bed12")
+    options = {
+        "bed12": args.format in ("bed12", "both"),
+        "no_bed6": args.format == "bed12",
+        "mol_type": args.mol_type,
+        "feature_type": args.feature_type,
+        "id_as_features": not args.no_features,
+        "collapse": args.collapse,
+    }
+    inputs = collect_inputs(args)
+    modules = ["millefeuille.module.gff2bed"]
+    if args.stdout:
+        stream_records(_gff2bed_records, inputs, options, args.jobs, _run_gff2bed, modules)
+    else:
+        os.makedirs(args.outdir, exist_ok=True)
+        for outputs in run_batch(_run_gff2bed, inputs, options, args.jobs, args.outdir, modules):
+            print("\n".join(outputs), file=sys.stderr)
+    return 0
+
+
+def cmd_bed2gff(args) -> int:
+    options = {
+        "source": args.source,
+        "mol_type": args.mol_type,
+        "is_bed12": args.bed12,
+        "make_gff3": not args.no_gff3,
+    }
+    inputs = collect_inputs(args)
+    modules = ["millefeuille.module.bed2gff"]
+    if args.stdout:
+        stream_records(_bed2gff_records, inputs, options, args.jobs, _run_bed2gff, modules)
+    else:
+        if args.outdir is not None:
+            os.makedirs(args.outdir, exist_ok=True)
+        for outputs in run_batch(
+            _run_bed2gff_next_to, inputs, options, args.jobs, args.outdir, modules
+        ):
+            print("\n".join(outputs), file=sys.stderr)
+    return 0
+
+
+def _run_bed2gff_next_to(bed_file: str, options: dict, outdir: str) -> list:
+    # without output directory the GFF is written next to its input
+    return _run_bed2gff(bed_file, options, outdir or os.path.dirname(bed_file) or ".")
+
+
+def cmd_overlaps(args) -> int:
+    names = args.names.split(",")
+    if len(names) != 3:
+        raise SystemExit("--names must hold three comma separated names")
+    options = {"names": names, "as_bp": args.bp}
+    inputs = collect_inputs(args, group=3)
+    modules = ["millefeuille.module.overlaps"]
+    keys = None
+    for list_bed, counts in zip(
+        inputs, run_batch(_run_overlaps, inputs, options, args.jobs, None, modules)
+    ):
+        if keys is None:
+            keys = list(counts.keys())
+            print("\t".join(["files"] + keys))
+        print("\t".join([",".join(list_bed)] + [str(counts[k]) for k in keys]), flush=True)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="millefeuille",
+        description="Process and explore genomic coordinates files (BED, GFF)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_batch_arguments(sub, metavar):
+        sub.add_argument("inputs", nargs="*", metavar=metavar, help="input files")
+        sub.add_argument(
+            "-m", "--manifest", default=None,
+            help="file listing one input per line (- for stdin)",
+        )
+        sub.add_argument(
+            "-j", "--jobs", type=int, default=1,
+            help="number of worker processes shared by all inputs, default is 1",
+        )
+
+    sub = subparsers.add_parser("gff2bed", help="convert GFF files into BED6 and/or BED12")
+    add_batch_arguments(sub, "GFF")
+    sub.add_argument("--format", choices=["bed6", "bed12", "both"], default="both")
+    sub.add_argument("--mol-type", default="exon", help="column 3 value to select, default is exon")
+    sub.add_argument(
+        "--feature-type", default="Parent",
+        help="column 9 key to group by, default is Parent (transcript_id for GTF files)",
+    )
+    sub.add_argument(
+        "--no-features", action="store_true",
+        help="use the feature ID as name instead of all its features",
+    )
+    sub.add_argument(
+        "--collapse", action="store_true",
+        help="write identical transcripts (same blocks) as one BED12 line with all their IDs",
+    )
+    sub.add_argument("-o", "--outdir", default="./", help="output directory, default is ./")
+    sub.add_argument("--stdout", action="store_true", help="write the BED records to stdout")
+    sub.set_defaults(func=cmd_gff2bed)
+
+    sub = subparsers.add_parser("bed2gff", help="convert BED6 or BED12 files into GFF")
+    add_batch_arguments(sub, "BED")
+    sub.add_argument("--source", default="millefeuille", help="column 2 of the GFF")
+    sub.add_argument("--mol-type", default="region", help="column 3 of the GFF")
+    sub.add_argument("--bed12", action="store_true", help="inputs are BED12 files")
+    sub.add_argument("--no-gff3", action="store_true", help="do not prefix names with feature_id=")
+    sub.add_argument(
+        "-o", "--outdir", default=None, help="output directory, default is next to each input"
+    )
+    sub.add_argument("--stdout", action="store_true", help="write the GFF records to stdout")
+    sub.set_defaults(func=cmd_bed2gff)
+
+    sub = subparsers.add_parser(
+        "overlaps", help="count overlaps between BED files, by groups of three"
+    )
+    add_batch_arguments(sub, "BED")
+    sub.add_argument("--names", default="a,b,c", help="names of the three sets, default is a,b,c")
+    sub.add_argument("--bp", action="store_true", help="count basepairs instead of regions")
+    sub.set_defaults(func=cmd_overlaps)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # downstream command of a pipeline closed early (e.g. head)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
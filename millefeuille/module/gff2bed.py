@@ -2,19 +2,36 @@ import os
 import sys
 import argparse
 import re
+import hashlib
+import tempfile
+import time
 
+from millefeuille.module.parser import parse_file, splittable
+from millefeuille.module.profiling import Profiler, profile_stage, file_size
+from millefeuille.module.streams import open_lines, open_output, stream_position
 
-def get_featureDict(featureInfo: str) -> dict:
+
+# one attribute of column 9: GFF3 key=value1,value2 or GTF key "value" (or key value)
+ATTRIBUTE = re.compile(r'\s*([^\s=;"]+)\s*(?:=([^;]*)|"([^"]*)"|([^;]*))')
+# distinct structures held in memory by collapse_bed12, and files the others spill to
+MAX_KEYS = 1 << 20
+SPILL_FILES = 16
+
+
+def get_featureDict(featureInfo: str, keys=None) -> dict:
     """
-    Create a dictionary from the feature field of a GFF file.
+    Create a dictionary from the feature field of a GFF or GTF file.
 
     The object "featureInfo" should be the last field of a tab-delimited GFF file.
-    And it really must be a GFF3 file, not a GTF or some such nonsense.
+    Both attribute syntaxes are read in a single pass: GFF3 (key=value, with
+    comma-separated values) and GTF (key "value";, a key may be repeated).
 
     Parameters
     ----------
     featureInfo
       feature field of a GFF file, which contains the information of the features
+    keys
+      If given, only these keys are extracted, e.g. ("transcript_id",)
 
     Returns
     -------
@@ -22,12 +39,19 @@ def get_featureDict(featureInfo: str) -> dict:
       A dictionary with the feature type as key and a list of values.
     """
     featureDict = {}
-    atoms = [k.lstrip(" ").rstrip(" ") for k in featureInfo.split(";")]
-    for k in atoms:
-        index, entry = k.split("=")
-        featureDict[index.rstrip(" ").lstrip(" ")] = [
-            j.rstrip(" ").lstrip(" ") for j in entry.split(",")
-        ]
+    if keys is not None and not any(k in featureInfo for k in keys):
+        return featureDict
+    for m in ATTRIBUTE.finditer(featureInfo):
+        index = m.group(1)
+        if keys is not None and index not in keys:
+            continue
+        if m.group(2) is not None:
+            values = [j.strip(" ") for j in m.group(2).split(",")]
+        elif m.group(3) is not None:
+            values = [m.group(3)]
+        else:
+            values = [m.group(4).strip(" ")]
+        featureDict.setdefault(index, []).extend(values)
     return featureDict
 
 
@@ -36,6 +60,7 @@ def get_Dictgff(
     mol_type: str = "exon",
     feature_type: str = "Parent",
     id_as_features: bool = True,
+    workers: int = 1,
 ) -> dict:
     """
     Create a dictionary from the GFF file which contains the infomations of all feature_type of a given mol_type (ie exon, CDS).
@@ -43,26 +68,34 @@ def get_Dictgff(
      Parameters
      ----------
      file_gff
-       The GFF file to be converted
+       The GFF or GTF file to be converted, "-" for stdin, a file-like object or an iterable of lines
      mol_type
        The molecular type (column 3 of the GFF file) selected for the BED files, default is exon
      feature_type
-       The feature type (column 9 of the GFF file) selected for the BED files, default is Parent
+       The feature type (column 9 of the GFF file) selected for the BED files, default is Parent (use transcript_id for GTF files)
      id_as_features
        If set to True, the ID of each element will be set as a string containing all its features
+     workers
+       Number of processes parsing a GFF file name in parallel (see parser.parse_file), default is 1 (serial).
+       Small files and streams are always read serially
 
      Returns
      -------
      dict
        A dictionary with the feature type as key and a dictionary for each mol_type in the feature with chr, start, stop and strand keys as value.
     """
-    with open(file_gff, "r") as f:
+    if workers != 1 and splittable(file_gff):
+        return _dict_from_columns(
+            parse_file(file_gff, "gff", workers, mol_type=mol_type, feature_type=feature_type),
+            id_as_features,
+        )
+    with open_lines(file_gff) as f:
         myDict = {}
         for l in f:
             line = l.rstrip("\r\n").split("\t")
             if len(line) > 3 and line[2] == mol_type:
                 # get feature type in key of featDict
-                featDict = get_featureDict(line[-1])
+                featDict = get_featureDict(line[-1], (feature_type,))
                 # get mol_type info
                 keys = ["chr", "start", "stop", "strand"]
                 values = [line[i] for i in [0, 3, 4, 6]]
@@ -72,14 +105,27 @@ def get_Dictgff(
                     values.append(line[-1])
                 exonDict = dict(zip(keys, values))
                 # create dict key=feattype value=moltypeDict1
-                for t in featDict[feature_type]:
+                for t in featDict.get(feature_type, []):
                     if t in myDict:
                         # add the exon
                         myDict[t].append(exonDict)
                     else:
                         # create key and add exon
                         myDict[t] = [exonDict]
-    f.closed
+    return myDict
+
+
+def _dict_from_columns(columns: dict, id_as_features: bool = True) -> dict:
+    # same dictionary as get_Dictgff, from the columns of parser.parse_file
+    myDict = {}
+    keys = ["chr", "start", "stop", "strand"] + (["name"] if id_as_features else [])
+    fields = [columns[k].astype(str).tolist() for k in ["chr", "start", "stop", "strand"]]
+    if id_as_features:
+        fields.append(columns["features"].tolist())
+    for values, ids in zip(zip(*fields), columns["values"]):
+        exonDict = dict(zip(keys, values))
+        for t in ids:
+            myDict.setdefault(t, []).append(exonDict)
     return myDict
 
 
@@ -191,6 +237,304 @@ def consistency_check(
     return True
 
 
+def bed6_lines(
+    myDict: dict, id_as_features: bool = True, skip_exon_number: bool = True
+) -> iter:
+    """
+    Format the elements of a GFF dictionary as BED6 lines, one line per element.
+
+    Parameters
+    ----------
+    myDict
+      The dictionary returned by get_Dictgff, after consistency check
+    id_as_features
+      Will set the ID of each element as a string containing all its features
+    skip_exon_number
+      If set, the program will skip adding _# for exon number.
+
+    Returns
+    -------
+    generator
+      The BED6 lines, ending with a newline.
+    """
+    for t in myDict:
+        exnum = 0
+        for exon in myDict[t]:
+            # add a number to exons
+            exnum += 1
+            if id_as_features:
+                name = exon["name"]
+            else:
+                if skip_exon_number is False:
+                    name = "_".join([t, str(exnum)])
+                else:
+                    name = t
+            yield "\t".join(
+                [
+                    exon["chr"],
+                    str(int(exon["start"]) - 1),
+                    exon["stop"],
+                    name,
+                    ".",
+                    exon["strand"] + "\n",
+                ]
+            )
+
+
+def bed12_line(t: str, exons: list, id_as_features: bool = True) -> str:
+    """
+    Format the sorted elements of one feature (ie the exons of a transcript) as a BED12 line.
+
+    Parameters
+    ----------
+    t
+      The feature ID (ie the Parent of the exons)
+    exons
+      The list of element dictionaries of the feature, sorted by start
+    id_as_features
+      Will set the ID of the feature as a string containing all its features
+
+    Returns
+    -------
+    str
+      The BED12 line ending with a newline, None if the feature only has size 0 elements.
+    """
+    blockSizes = [int(k["stop"]) - int(k["start"]) for k in exons]
+    blockStart = [int(k["start"]) - int(exons[0]["start"]) for k in exons]
+    # Handling size 0 exons appearing in gff file
+    blockStart = [blockStart[k] for k in range(len(blockSizes)) if blockSizes[k] > 0]
+    blockSizes = [blockSizes[k] for k in range(len(blockSizes)) if blockSizes[k] > 0]
+    blockCount = str(len(blockSizes))
+    # Handling single size 0 exon in a transcript
+    if not blockSizes:
+        return None
+    # Settinf int as string
+    blockStart = ",".join(str(e) for e in blockStart)
+    blockSizes = ",".join(str(e) for e in blockSizes)
+    # check if correct by :
+    # blockStart[-1]+exons[0]['start']+blockSizes[-1] == exons[-1]['stop']
+    chromStart = str(int(exons[0]["start"]) - 1)
+    chromEnd = exons[-1]["stop"]
+    if id_as_features:
+        # recreate the list of feature without the feat_type from argument
+        featD = get_featureDict(exons[0]["name"])
+        if "Name" in featD:
+            # GTF attributes have no Name
+            featD["Name"] = [re.sub(":[0-9]$", "", featD["Name"][0])]
+        name = ";".join(
+            [str(k) + "=" + ",".join(v) for (k, v) in featD.items() if k != "Parent"]
+            + ["Parent=" + str(t)]
+        )
+    else:
+        name = t
+    return "\t".join(
+        [
+            exons[0]["chr"],
+            chromStart,
+            chromEnd,
+            name,
+            "0",
+            exons[0]["strand"],
+            chromStart,
+            chromEnd,
+            "0",
+            blockCount,
+            blockSizes,
+            blockStart + "\n",
+        ]
+    )
+
+
+def bed12_lines(
+    myDict: dict, id_as_features: bool = True, collapse: bool = False, max_keys: int = MAX_KEYS
+) -> iter:
+    """
+    Format the features of a GFF dictionary as BED12 lines, one line per feature.
+
+    Parameters
+    ----------
+    myDict
+      The dictionary returned by get_Dictgff, after consistency check
+    id_as_features
+      Will set the ID of each element as a string containing all its features
+    collapse
+      If set to True, features with the same structure give a single line, see collapse_bed12
+    max_keys
+      Number of distinct structures kept in memory when collapsing, see collapse_bed12
+
+    Returns
+    -------
+    generator
+      The BED12 lines, ending with a newline.
+    """
+    records = ((t, bed12_line(t, myDict[t], id_as_features)) for t in myDict)
+    records = ((t, line) for t, line in records if line is not None)
+    if collapse:
+        yield from collapse_bed12(records, id_as_features, max_keys)
+    else:
+        for t, line in records:
+            yield line
+
+
+def structure_key(line: str, depth: int = 0) -> bytes:
+    """
+    Hash the structure of a BED12 line: chromosome, start, end, strand and blocks.
+    """
+    fields = line.rstrip("\n").split("\t")
+    key = "\t".join(fields[k] for k in [0, 1, 2, 5, 9, 10, 11])
+    # another hash at each depth, so that a spilled file is split differently
+    return hashlib.blake2b(key.encode(), digest_size=16, salt=bytes([depth])).digest()
+
+
+def _collapsed_line(ids: list, line: str, id_as_features: bool) -> str:
+    fields = line.split("\t")
+    if id_as_features:
+        # the features of the first feature, with the IDs of all of them as Parent
+        features, _, _ = fields[3].rpartition("Parent=")
+        fields[3] = features + "Parent=" + ",".join(ids)
+    else:
+        fields[3] = ",".join(ids)
+    return "\t".join(fields)
+
+
+def collapse_bed12(
+    records, id_as_features: bool = True, max_keys: int = MAX_KEYS, tmpdir: str = None, depth: int = 0
+) -> iter:
+    """
+    Collapse the BED12 lines of features with the same structure (chromosome, strand and blocks).
+
+    The structures are hashed while streaming. The first max_keys distinct
+    structures are kept in memory with the IDs of their features; the lines of
+    other structures are written to temporary files, split by hash, each file
+    being collapsed afterwards in the same way. The structures held in memory
+    come out first, in their order of appearance.
+
+    The collapse itself holds at most max_keys lines on top of its input. When
+    the records come from bed12_lines, as in gff2bed, the input is the GFF
+    dictionary of get_Dictgff, which already holds every feature: the memory is
+    then bounded by that dictionary, not by max_keys.
+
+    Parameters
+    ----------
+    records
+      An iterable of (feature ID, BED12 line), as made by bed12_lines
+    id_as_features
+      If set to True, the name of the lines holds the features, with the IDs in the Parent feature
+    max_keys
+      Number of distinct structures kept in memory
+    tmpdir
+      Directory of the temporary files, default is the system temporary directory
+
+    Returns
+    -------
+    generator
+      One BED12 line per distinct structure, named with the IDs of its features.
+    """
+    groups = {}
+    spill = None
+    for t, line in records:
+        key = structure_key(line, depth)
+        if key in groups:
+            groups[key][0].append(t)
+        elif len(groups) < max_keys or depth >= 8:
+            groups[key] = ([t], line)
+        else:
+            if spill is None:
+                spill_dir = tempfile.TemporaryDirectory(dir=tmpdir)
+                spill = [
+                    open(os.path.join(spill_dir.name, str(k)), "w+") for k in range(SPILL_FILES)
+                ]
+            spill[key[0] % SPILL_FILES].write(t + "\t" + line)
+    for ids, line in groups.values():
+        yield _collapsed_line(ids, line, id_as_features)
+    if spill is None:
+        return
+    groups = None
+    with spill_dir:
+        for f in spill:
+            with f:
+                f.seek(0)
+                spilled = (l.split("\t", 1) for l in f)
+                yield from collapse_bed12(spilled, id_as_features, max_keys, tmpdir, depth + 1)
+
+
+def bed6_records(
+    file_gff,
+    mol_type: str = "exon",
+    feature_type: str = "Parent",
+    id_as_features: bool = True,
+    skip_exon_number: bool = True,
+) -> iter:
+    """
+    Stream the conversion of a GFF file into BED6 lines, without writing any file.
+
+    Parameters
+    ----------
+    file_gff
+        The GFF file to be converted, "-" for stdin, a file-like object or an iterable of lines
+    mol_type
+        The molecular type (column 3 of the GFF file) selected for the BED files, default is exon
+    feature_type
+        The feature type (column 9 of the GFF file) selected for the BED files, default is Parent
+    id_as_features
+        Will set the ID of each element as a string containing all its features
+    skip_exon_number
+        If set, the program will skip adding _# for exon number.
+
+    Returns
+    -------
+    generator
+      The BED6 lines, ending with a newline.
+    """
+    myDict = get_Dictgff(file_gff, mol_type, feature_type)
+    if consistency_check(myDict, feature_type=feature_type, mol_type=mol_type):
+        yield from bed6_lines(myDict, id_as_features, skip_exon_number)
+
+
+def bed12_records(
+    file_gff,
+    mol_type: str = "exon",
+    feature_type: str = "Parent",
+    id_as_features: bool = True,
+    collapse: bool = False,
+) -> iter:
+    """
+    Stream the conversion of a GFF file into BED12 lines, without writing any file.
+
+    The lines can be given directly to another reader, e.g. overlaps.load_beds.
+
+    Parameters
+    ----------
+    file_gff
+        The GFF file to be converted, "-" for stdin, a file-like object or an iterable of lines
+    mol_type
+        The molecular type (column 3 of the GFF file) selected for the BED files, default is exon
+    feature_type
+        The feature type (column 9 of the GFF file) selected for the BED files, default is Parent
+    id_as_features
+        Will set the ID of each element as a string containing all its features
+    collapse
+        If set, features with the same structure give a single line, see collapse_bed12
+
+    Returns
+    -------
+    generator
+      The BED12 lines, ending with a newline.
+    """
+    myDict = get_Dictgff(file_gff, mol_type, feature_type)
+    if consistency_check(myDict, feature_type=feature_type, mol_type=mol_type):
+        yield from bed12_lines(myDict, id_as_features, collapse)
+
+
+def bed_output(path: str, bedname: str, extension: str, output=None):
+    """
+    Return the output of a conversion, by default the file bedname + extension in path.
+    """
+    if output is not None:
+        return output
+    return path.rstrip("/") + "/" + bedname + extension
+
+
 def bed6_generator(
     bedname: str,
     file_gff: str,
@@ -199,6 +543,9 @@ def bed6_generator(
     path: str = "./",
     id_as_features: bool = True,
     skip_exon_number: bool = True,
+    profiler: Profiler = None,
+    output=None,
+    workers: int = 1,
 ) -> None:
     """
     Create a simple BED file in the working directory.
@@ -206,7 +553,7 @@ def bed6_generator(
     Parameters
        ----------
        file_gff
-           The GFF file to be converted
+           The GFF file to be converted, "-" for stdin, a file-like object or an iterable of lines
        mol_type
            The molecular type (column 3 of the GFF file) selected for the BED files, default is exon
        feature_type
@@ -219,41 +566,36 @@ def bed6_generator(
            Will set the ID of each element as a string containing all its features
        skip_exon_number
            If set, the program will skip adding _# for exon number.
+       profiler
+           A Profiler measuring the parse, check and write stages, default is None (no profiling)
+       output
+           Name of the BED file ("-" for stdout) or writable file-like object, overrides path and bedname
+       workers
+           Number of processes parsing the GFF file, default is 1 (serial), see get_Dictgff
 
        Returns
        -------
        None, but creates a BED6 file in the specified path.
     """
     # uses os module
-    myDict = get_Dictgff(file_gff, mol_type, feature_type)
-    if consistency_check(myDict):
+    with profile_stage(profiler, "gff2bed.parse") as stats:
+        myDict = get_Dictgff(file_gff, mol_type, feature_type, workers=workers)
+        if profiler:
+            stats["bytes"] = file_size(file_gff)
+            stats["records"] = sum(len(v) for v in myDict.values())
+    with profile_stage(profiler, "gff2bed.check") as stats:
+        consistent = consistency_check(myDict)
+        if profiler:
+            stats["records"] = len(myDict)
+    if consistent:
         # only allow to pursue script if check script runs correctly
-        with open(path.rstrip("/") + "/" + bedname + ".bed6", "w") as f6:  # check
-            for t in myDict:
-                exnum = 0
-                for exon in myDict[t]:
-                    # add a number to exons
-                    exnum += 1
-                    if id_as_features:
-                        name = exon["name"]
-                    else:
-                        if skip_exon_number is False:
-                            name = "_".join([t, str(exnum)])
-                        else:
-                            name = t
-                    f6.write(
-                        "\t".join(
-                            [
-                                exon["chr"],
-                                str(int(exon["start"]) - 1),
-                                exon["stop"],
-                                name,
-                                ".",
-                                exon["strand"] + "\n",
-                            ]
-                        )
-                    )
-        f6.closed
+        with profile_stage(profiler, "gff2bed.write") as stats, open_output(
+            bed_output(path, bedname, ".bed6", output)
+        ) as f6:
+            f6.writelines(bed6_lines(myDict, id_as_features, skip_exon_number))
+            if profiler:
+                stats["records"] = sum(len(v) for v in myDict.values())
+                stats["bytes"] = stream_position(f6)
 
 
 def bed12_generator(
@@ -264,6 +606,10 @@ def bed12_generator(
     path: str = "./",
     check: bool = False,
     id_as_features: bool = True,
+    profiler: Profiler = None,
+    output=None,
+    workers: int = 1,
+    collapse: bool = False,
 ) -> None:
     """
     Create a BED12 file in the working directory.
@@ -271,7 +617,7 @@ def bed12_generator(
      Parameters
        ----------
        file_gff
-           The GFF file to be converted
+           The GFF file to be converted, "-" for stdin, a file-like object or an iterable of lines
        mol_type
            The molecular type (column 3 of the GFF file) selected for the BED files, default is exon
        feature_type
@@ -284,75 +630,63 @@ def bed12_generator(
            If set to True, the function will check the consistency of the data before creating the BED12 file.
        id_as_features
            Will set the ID of each element as a string containing all its features
+       profiler
+           A Profiler measuring the parse, check, blocks and write stages, default is None (no profiling)
+       output
+           Name of the BED file ("-" for stdout) or writable file-like object, overrides path and bedname
+       workers
+           Number of processes parsing the GFF file, default is 1 (serial), see get_Dictgff
+       collapse
+           If set, features with the same structure (ie identical transcripts) give a single line
+           named with all their IDs, see collapse_bed12
 
        Returns
        -------
        None, but creates a BED12 file in the specified path.
     """
     # uses os module
-    myDict = get_Dictgff(file_gff, mol_type, feature_type)
+    with profile_stage(profiler, "gff2bed.parse") as stats:
+        myDict = get_Dictgff(file_gff, mol_type, feature_type, workers=workers)
+        if profiler:
+            stats["bytes"] = file_size(file_gff)
+            stats["records"] = sum(len(v) for v in myDict.values())
     if not check:
-        if consistency_check(myDict):
-            check = True
+        with profile_stage(profiler, "gff2bed.check") as stats:
+            if consistency_check(myDict):
+                check = True
+            if profiler:
+                stats["records"] = len(myDict)
     if check:
         # only allow to pursue script if check script runs correctly
-        with open(path.rstrip("/") + "/" + bedname + ".bed12", "w") as f12:
-            for t in myDict:
-                blockSizes = [int(k["stop"]) - int(k["start"]) for k in myDict[t]]
-                blockStart = [
-                    int(k["start"]) - int(myDict[t][0]["start"]) for k in myDict[t]
-                ]
-                # Handling size 0 exons appearing in gff file
-                blockStart = [
-                    blockStart[k] for k in range(len(blockSizes)) if blockSizes[k] > 0
-                ]
-                blockSizes = [
-                    blockSizes[k] for k in range(len(blockSizes)) if blockSizes[k] > 0
-                ]
-                blockCount = str(len(blockSizes))
-                # Handling single size 0 exon in a transcript
-                if not blockSizes:
-                    continue
-                # Settinf int as string
-                blockStart = ",".join(str(e) for e in blockStart)
-                blockSizes = ",".join(str(e) for e in blockSizes)
-                # check if correct by :
-                # blockStart[-1]+myDict[t][0]['start']+blockSizes[-1] == myDict[t][-1]['stop']
-                chromStart = str(int(myDict[t][0]["start"]) - 1)
-                chromEnd = myDict[t][-1]["stop"]
-                if id_as_features:
-                    # recreate the list of feature without the feat_type from argument
-                    featD = get_featureDict(myDict[t][0]["name"])
-                    featD["Name"] = [re.sub(":[0-9]$", "", featD["Name"][0])]
-                    name = ";".join(
-                        [
-                            str(k) + "=" + ",".join(v)
-                            for (k, v) in featD.items()
-                            if k != "Parent"
-                        ]
-                        + ["Parent=" + str(t)]
-                    )
-                else:
-                    name = t
-                f12.write(
-                    "\t".join(
-                        [
-                            myDict[t][0]["chr"],
-                            chromStart,
-                            chromEnd,
-                            name,
-                            "0",
-                            myDict[t][0]["strand"],
-                            chromStart,
-                            chromEnd,
-                            "0",
-                            blockCount,
-                            blockSizes,
-                            blockStart + "\n",
-                        ]
-                    )
-                )
-        f12.closed
+        with open_output(bed_output(path, bedname, ".bed12", output)) as f12:
+            lines = bed12_lines(myDict, id_as_features, collapse)
+            if profiler:
+                _profiled_write(profiler, lines, f12)
+            else:
+                f12.writelines(lines)
+
+
+def _profiled_write(profiler: Profiler, lines, f) -> None:
+    # the lines are formatted (blocks, collapse) while they are written: the time
+    # spent getting each line is summed into the blocks stage, the rest is the write stage
+    blocks_wall = blocks_cpu = 0.0
+    n = 0
+    wall, cpu = time.perf_counter(), time.process_time()
+    lines = iter(lines)
+    while True:
+        line_wall, line_cpu = time.perf_counter(), time.process_time()
+        line = next(lines, None)
+        blocks_wall += time.perf_counter() - line_wall
+        blocks_cpu += time.process_time() - line_cpu
+        if line is None:
+            break
+        f.write(line)
+        n += 1
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    profiler.add_stage("gff2bed.blocks", blocks_wall, blocks_cpu, {"records": n})
+    profiler.add_stage(
+        "gff2bed.write", wall - blocks_wall, cpu - blocks_cpu, {"records": n, "bytes": stream_position(f)}
+    )
 
 
 def gff2bed(
@@ -367,6 +701,8 @@ def gff2bed(
     verbose: bool = True,
     discard: bool = True,
     skip_exon_number: bool = True,
+    profiler: Profiler = None,
+    collapse: bool = False,
 ) -> None:
     """
     Creates BED files from GFF file. In BED12, groups all the elements of a selected molecular type according to their feature type.
@@ -395,6 +731,10 @@ def gff2bed(
            Will discard the element raising a warning in strand consistency and overlapping check
        skip_exon_number
            If set, the program will skip adding _# for exon number.
+       profiler
+           A Profiler measuring each stage of the conversions, default is None (no profiling)
+       collapse
+           If set, identical transcripts give a single BED12 line named with all their IDs
 
        Returns
        -------
@@ -402,15 +742,21 @@ def gff2bed(
     """
 
     if name == "noinp":
-        bedname = os.path.basename(gff_file).replace(".gff", "")
+        bedname = os.path.basename(gff_file).replace(".gff", "").replace(".gtf", "")
     else:
         bedname = name
-    check = False
-    if no_bed6:
+    if not no_bed6:
         print("\nCreating BED6 with all " + mol_type + "s from the gff file")
-        bed6_generator(gff_file, mol_type, feature_type, path, bedname)
-        # Avoid redoing consistency check in bed12 if already done for bed6
-        check = True
+        bed6_generator(
+            bedname=bedname,
+            file_gff=gff_file,
+            mol_type=mol_type,
+            feature_type=feature_type,
+            path=path,
+            id_as_features=id_as_features,
+            skip_exon_number=skip_exon_number,
+            profiler=profiler,
+        )
     if bed12:
         print(
             "\nCreating BED12 with all "
@@ -418,4 +764,14 @@ def gff2bed(
             + "s from gff file, grouped according to their "
             + feature_type
         )
-        bed12_generator(gff_file, mol_type, feature_type, path, bedname, check)
+        # the GFF is parsed again, so the consistency check (which sorts exons) must run again
+        bed12_generator(
+            bedname=bedname,
+            file_gff=gff_file,
+            mol_type=mol_type,
+            feature_type=feature_type,
+            path=path,
+            id_as_features=id_as_features,
+            profiler=profiler,
+            collapse=collapse,
+        )
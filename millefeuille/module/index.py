@@ -0,0 +1,335 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+
+from millefeuille.module.gff2bed import get_featureDict, bed6_lines, bed12_line
+from millefeuille.module.streams import write_lines
+
+INDEX_VERSION = 1
+INDEX_ARRAYS = ["keys", "ptr", "chrom", "start", "stop", "strand", "offset"]
+
+
+def index_path(file_gff: str) -> str:
+    """
+    Return the default location of the index of a GFF file.
+    """
+    return file_gff + ".mfi"
+
+
+def build_index(
+    file_gff: str,
+    path: str = None,
+    mol_type: str = "exon",
+    feature_type: str = "Parent",
+) -> "TranscriptIndex":
+    """
+    Build an on-disk index of the features of a GFF file, for random access by ID.
+
+    The index is a directory of numpy arrays: the sorted feature IDs, pointers to
+    the exon coordinates of each ID (sorted by start) and the byte offset of each
+    exon line in the GFF file. It is built once and then memory-mapped.
+
+    Unlike gff2bed, the index does not run gff2bed.consistency_check: features
+    with exons on several chromosomes or strands, or with overlapping exons,
+    are indexed as they are, where gff2bed would discard them.
+
+    Parameters
+    ----------
+    file_gff : str
+      The GFF file to be indexed
+    path : str
+      The index directory, default is the GFF file name with a .mfi extension
+    mol_type : str
+      The molecular type (column 3 of the GFF file) indexed, default is exon
+    feature_type : str
+      The feature type (column 9 of the GFF file) used as ID, default is Parent
+
+    Returns
+    -------
+    TranscriptIndex
+      The memory-mapped index.
+    """
+    path = path if path is not None else index_path(file_gff)
+    chroms = {}
+    ids, chrom, start, stop, strand, offset = [], [], [], [], [], []
+    mol = mol_type.encode()
+    with open(file_gff, "rb") as f:
+        position = 0
+        for l in f:
+            line = l.rstrip(b"\r\n").split(b"\t")
+            if len(line) > 8 and line[2] == mol:
+                code = chroms.setdefault(line[0].decode(), len(chroms))
+                for t in get_featureDict(line[8].decode(), (feature_type,)).get(feature_type, []):
+                    ids.append(t.encode())
+                    chrom.append(code)
+                    start.append(int(line[3]))
+                    stop.append(int(line[4]))
+                    strand.append(line[6])
+                    offset.append(position)
+            position += len(l)
+    ids = np.array(ids, dtype=bytes)
+    start = np.array(start, dtype=np.int64)
+    # order exons by ID then start, and point to the first exon of each ID
+    order = np.lexsort((start, ids))
+    ids = ids[order]
+    keys, first = np.unique(ids, return_index=True)
+    arrays = {
+        "keys": keys,
+        "ptr": np.append(first, len(ids)).astype(np.int64),
+        "chrom": np.array(chrom, dtype=np.int32)[order],
+        "start": start[order],
+        "stop": np.array(stop, dtype=np.int64)[order],
+        "strand": np.array(strand, dtype="S1")[order],
+        "offset": np.array(offset, dtype=np.int64)[order],
+    }
+    # the index is built in a temporary directory then renamed into place: the
+    # arrays of an old index may still be memory-mapped by other processes, and
+    # must be unlinked rather than overwritten, with their metadata
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(tmp, name + ".npy"), arrays[name])
+        stat = os.stat(file_gff)
+        meta = {
+            "version": INDEX_VERSION,
+            "gff": os.path.abspath(file_gff),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "mol_type": mol_type,
+            "feature_type": feature_type,
+            "chroms": list(chroms),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        _replace_directory(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return TranscriptIndex(path)
+
+
+def _replace_directory(tmp: str, path: str) -> None:
+    # a directory cannot replace a non-empty one: move the old one aside first
+    old = None
+    if os.path.exists(path):
+        old = tempfile.mkdtemp(dir=os.path.dirname(tmp), prefix=os.path.basename(tmp) + ".", suffix=".old")
+        os.replace(path, os.path.join(old, "index"))
+    os.replace(tmp, path)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class TranscriptIndex:
+    """
+    Random access to the features of a GFF file through an index built by build_index.
+
+    The GFF file is opened on the first lookup of its lines and kept open until
+    close, which the context manager does.
+
+    Parameters
+    ----------
+    path : str
+      The index directory
+    mmap : bool
+      If True (default), the arrays are memory-mapped instead of loaded in memory
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != INDEX_VERSION:
+            raise ValueError("Unsupported index version " + str(self.meta["version"]))
+        self.path = path
+        self.chroms = self.meta["chroms"]
+        mode = "r" if mmap else None
+        for name in INDEX_ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, name + ".npy"), mmap_mode=mode))
+        self._gff = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, feature_id: str) -> bool:
+        return self.lookup([feature_id])[0] >= 0
+
+    def close(self) -> None:
+        if self._gff is not None:
+            self._gff.close()
+            self._gff = None
+
+    def __enter__(self) -> "TranscriptIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def is_stale(self) -> bool:
+        """
+        Tell if the GFF file changed since the index was built.
+        """
+        try:
+            stat = os.stat(self.meta["gff"])
+        except OSError:
+            return True
+        return stat.st_size != self.meta["size"] or stat.st_mtime != self.meta["mtime"]
+
+    def lookup(self, ids: list) -> np.ndarray:
+        """
+        Find the positions of IDs in the index.
+
+        Parameters
+        ----------
+        ids : list
+          The feature IDs to look up
+
+        Returns
+        -------
+        np.ndarray
+          The position of each ID in the index, -1 for missing IDs.
+        """
+        if len(self.keys) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        query = np.array([t.encode() for t in ids], dtype=bytes)
+        pos = np.searchsorted(self.keys, query)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == query[found]
+        return np.where(found, pos, -1)
+
+    def _line(self, offset: int) -> str:
+        if self._gff is None:
+            self._gff = open(self.meta["gff"], "rb")
+        self._gff.seek(offset)
+        return self._gff.readline().decode().rstrip("\r\n")
+
+    def exons(self, feature_id: str, with_name: bool = True) -> list:
+        """
+        Return the elements of a feature, sorted by start, as gff2bed.get_Dictgff would.
+
+        Parameters
+        ----------
+        feature_id : str
+          The feature ID (ie the Parent of the exons)
+        with_name : bool
+          If True, the "name" key holds the feature field read back from the GFF file
+
+        Returns
+        -------
+        list
+          A list of dictionaries with chr, start, stop, strand (and name) keys, empty if the ID is missing.
+        """
+        pos = self.lookup([feature_id])[0]
+        if pos < 0:
+            return []
+        exons = []
+        for i in range(self.ptr[pos], self.ptr[pos + 1]):
+            exon = {
+                "chr": self.chroms[self.chrom[i]],
+                "start": str(self.start[i]),
+                "stop": str(self.stop[i]),
+                "strand": self.strand[i].decode(),
+            }
+            if with_name:
+                exon["name"] = self._line(self.offset[i]).split("\t")[8]
+            exons.append(exon)
+        return exons
+
+    def bed12(self, ids: list, id_as_features: bool = True) -> list:
+        """
+        Extract the BED12 lines of a list of features.
+
+        Parameters
+        ----------
+        ids : list
+          The feature IDs to extract, missing IDs are skipped
+        id_as_features : bool
+          Will set the ID of each element as a string containing all its features
+
+        Returns
+        -------
+        list
+          The BED12 lines, ending with a newline.
+        """
+        lines = []
+        for t in ids:
+            exons = self.exons(t, with_name=id_as_features)
+            line = bed12_line(t, exons, id_as_features) if exons else None
+            if line is not None:
+                lines.append(line)
+        return lines
+
+    def bed6(self, ids: list, id_as_features: bool = True, skip_exon_number: bool = True) -> list:
+        """
+        Extract the BED6 lines of a list of features.
+
+        Parameters
+        ----------
+        ids : list
+          The feature IDs to extract, missing IDs are skipped
+        id_as_features : bool
+          Will set the ID of each element as a string containing all its features
+        skip_exon_number : bool
+          If set, the program will skip adding _# for exon number.
+
+        Returns
+        -------
+        list
+          The BED6 lines, ending with a newline.
+        """
+        myDict = {t: self.exons(t, with_name=id_as_features) for t in ids}
+        return list(bed6_lines(myDict, id_as_features, skip_exon_number))
+
+
+def extract_bed(
+    file_gff: str,
+    ids: list,
+    output,
+    bed12: bool = True,
+    id_as_features: bool = True,
+    mol_type: str = "exon",
+    feature_type: str = "Parent",
+) -> int:
+    """
+    Write the BED12 (or BED6) lines of a list of features, building the index of the GFF file if needed.
+
+    Parameters
+    ----------
+    file_gff : str
+      The indexed GFF file
+    ids : list
+      The feature IDs to extract
+    output
+      Name of the BED file ("-" for stdout) or writable file-like object
+    bed12 : bool
+      Write BED12 lines if True (default), BED6 lines otherwise
+    id_as_features : bool
+      Will set the ID of each element as a string containing all its features
+    mol_type : str
+      The molecular type (column 3 of the GFF file) indexed, default is exon
+    feature_type : str
+      The feature type (column 9 of the GFF file) used as ID, default is Parent
+
+    Returns
+    -------
+    int
+      The number of lines written.
+    """
+    path = index_path(file_gff)
+    index = None
+    if os.path.exists(os.path.join(path, "meta.json")):
+        index = TranscriptIndex(path)
+        if (
+            index.is_stale()
+            or index.meta["mol_type"] != mol_type
+            or index.meta["feature_type"] != feature_type
+        ):
+            index = None
+    if index is None:
+        index = build_index(file_gff, path, mol_type, feature_type)
+    with index:
+        if bed12:
+            return write_lines(index.bed12(ids, id_as_features), output)
+        return write_lines(index.bed6(ids, id_as_features), output)
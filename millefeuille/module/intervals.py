@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+import pyranges as pr
+
+from millefeuille.module.gff2bed import get_featureDict
+from millefeuille.module.streams import open_lines
+
+HEADER_PREFIXES = ("#", "track", "browser")
+
+
+def cluster_starts(starts: np.ndarray, ends: np.ndarray, distance: int = 0) -> np.ndarray:
+    """
+    Find the first row of each cluster of overlapping intervals of one chromosome.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+      The starts of the intervals, sorted
+    ends : np.ndarray
+      The ends of the intervals
+    distance : int
+      Intervals closer than this distance are in the same cluster, default is 0
+      (book-ended intervals are merged)
+
+    Returns
+    -------
+    np.ndarray
+      The row of the first interval of each cluster.
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64)
+    max_ends = np.maximum.accumulate(ends)
+    breaks = np.flatnonzero(starts[1:] > max_ends[:-1] + distance) + 1
+    return np.concatenate([[0], breaks])
+
+
+def merge_sorted(starts: np.ndarray, ends: np.ndarray, distance: int = 0) -> tuple:
+    """
+    Merge the overlapping intervals of one chromosome.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+      The starts of the intervals, sorted
+    ends : np.ndarray
+      The ends of the intervals
+    distance : int
+      Intervals closer than this distance are merged, default is 0
+
+    Returns
+    -------
+    tuple
+      The starts and ends of the merged, disjoint intervals.
+    """
+    first = cluster_starts(starts, ends, distance)
+    if len(first) == 0:
+        return starts[:0], ends[:0]
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+class IntervalSet:
+    """
+    Genomic intervals stored as numpy arrays, sorted by chromosome then start.
+
+    The intervals of chromosome chroms[k] are the rows offsets[k] to offsets[k + 1]
+    of the starts, ends, names and strands arrays. Coordinates are 0-based,
+    half-open, as in BED files.
+
+    Parameters
+    ----------
+    chroms : list
+      The chromosome names, sorted
+    offsets : np.ndarray
+      The first row of each chromosome, followed by the number of intervals
+    starts : np.ndarray
+      The start of each interval
+    ends : np.ndarray
+      The end of each interval
+    names : np.ndarray
+      The name of each interval, default is None
+    strands : np.ndarray
+      The strand of each interval, default is None
+    """
+
+    def __init__(self, chroms: list, offsets, starts, ends, names=None, strands=None):
+        self.chroms = list(chroms)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.names = names
+        self.strands = strands
+
+    @classmethod
+    def from_arrays(cls, chroms, starts, ends, names=None, strands=None) -> "IntervalSet":
+        """
+        Create an IntervalSet from unsorted columns.
+
+        Parameters
+        ----------
+        chroms
+          The chromosome of each interval
+        starts
+          The start of each interval
+        ends
+          The end of each interval
+        names
+          The name of each interval, default is None
+        strands
+          The strand of each interval, default is None
+
+        Returns
+        -------
+        IntervalSet
+          The sorted intervals.
+        """
+        chrom_names, codes = np.unique(np.asarray(chroms, dtype=str), return_inverse=True)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.lexsort((ends, starts, codes))
+        offsets = np.searchsorted(codes[order], np.arange(len(chrom_names) + 1))
+        if names is not None:
+            names = np.asarray(names, dtype=object)[order]
+        if strands is not None:
+            strands = np.asarray(strands, dtype="U1")[order]
+        return cls(list(chrom_names), offsets, starts[order], ends[order], names, strands)
+
+    @classmethod
+    def from_bed(cls, file_bed) -> "IntervalSet":
+        """
+        Read the intervals of a BED file.
+
+        Parameters
+        ----------
+        file_bed
+          Name of the BED file, "-" for stdin, a file-like object or an iterable of lines
+
+        Returns
+        -------
+        IntervalSet
+          The sorted intervals, with names and strands when the file has them.
+        """
+        chroms, starts, ends, names, strands = [], [], [], [], []
+        with open_lines(file_bed) as f:
+            for l in f:
+                if not l.strip() or l.startswith(HEADER_PREFIXES):
+                    continue
+                line = l.rstrip("\r\n").split("\t")
+                chroms.append(line[0])
+                starts.append(int(line[1]))
+                ends.append(int(line[2]))
+                names.append(line[3] if len(line) > 3 else "")
+                strands.append(line[5] if len(line) > 5 else ".")
+        return cls.from_arrays(chroms, starts, ends, names, strands)
+
+    @classmethod
+    def from_gff(
+        cls, file_gff, mol_type: str = None, feature_type: str = None
+    ) -> "IntervalSet":
+        """
+        Read the intervals of a GFF file, converted to 0-based half-open coordinates.
+
+        Parameters
+        ----------
+        file_gff
+          Name of the GFF file, "-" for stdin, a file-like object or an iterable of lines
+        mol_type : str
+          The molecular type (column 3 of the GFF file) selected, default is all lines
+        feature_type : str
+          The feature type (column 9 of the GFF file) used as name, default is the whole feature field
+
+        Returns
+        -------
+        IntervalSet
+          The sorted intervals.
+        """
+        chroms, starts, ends, names, strands = [], [], [], [], []
+        with open_lines(file_gff) as f:
+            for l in f:
+                if not l.strip() or l.startswith("#"):
+                    continue
+                line = l.rstrip("\r\n").split("\t")
+                if len(line) < 9 or (mol_type is not None and line[2] != mol_type):
+                    continue
+                chroms.append(line[0])
+                starts.append(int(line[3]) - 1)
+                ends.append(int(line[4]))
+                if feature_type is None:
+                    names.append(line[8])
+                else:
+                    names.append(",".join(get_featureDict(line[8], (feature_type,)).get(feature_type, [])))
+                strands.append(line[6])
+        return cls.from_arrays(chroms, starts, ends, names, strands)
+
+    @classmethod
+    def from_pyranges(cls, gr: pr.PyRanges) -> "IntervalSet":
+        """
+        Create an IntervalSet from a pyranges object.
+        """
+        df = gr.df
+        return cls.from_arrays(
+            df["Chromosome"].astype(str),
+            df["Start"],
+            df["End"],
+            df["Name"] if "Name" in df else None,
+            df["Strand"].astype(str) if "Strand" in df else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def chrom_slice(self, chrom: str) -> slice:
+        """
+        Return the rows of a chromosome, an empty slice if it has no interval.
+        """
+        try:
+            k = self.chroms.index(chrom)
+        except ValueError:
+            return slice(0, 0)
+        return slice(self.offsets[k], self.offsets[k + 1])
+
+    def iter_chroms(self):
+        """
+        Iterate over the chromosomes.
+
+        Returns
+        -------
+        generator
+          A tuple with the chromosome name, its starts and its ends for each chromosome.
+        """
+        for k, chrom in enumerate(self.chroms):
+            rows = slice(self.offsets[k], self.offsets[k + 1])
+            yield chrom, self.starts[rows], self.ends[rows]
+
+    def chrom_column(self) -> np.ndarray:
+        """
+        Return the chromosome name of each interval.
+        """
+        return np.repeat(np.array(self.chroms, dtype=object), np.diff(self.offsets))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Return the intervals as a BED-like DataFrame (Chromosome, Start, End, Name, Strand).
+        """
+        df = pd.DataFrame(
+            {"Chromosome": self.chrom_column(), "Start": self.starts, "End": self.ends}
+        )
+        if self.names is not None:
+            df["Name"] = self.names
+        if self.strands is not None:
+            df["Strand"] = self.strands
+        return df
+
+    def to_pyranges(self) -> pr.PyRanges:
+        """
+        Return the intervals as a pyranges object.
+        """
+        return pr.PyRanges(self.to_dataframe())
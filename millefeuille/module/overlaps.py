@@ -1,5 +1,8 @@
 import os
 import sys
+import io
+import json
+import hashlib
 import argparse
 import pyranges as pr, pandas as pd
 from itertools import combinations
@@ -7,6 +10,45 @@ import matplotlib.pyplot as plt
 import upsetplot as upset
 from matplotlib_venn import venn3
 
+from millefeuille.module.profiling import Profiler, profile_stage, file_size
+from millefeuille.module.streams import is_path, open_lines
+from millefeuille.module import arrow
+from millefeuille.module.arrow import is_arrow
+
+BED_COLUMNS = "Chromosome Start End Name Score Strand ThickStart ThickEnd ItemRGB BlockCount BlockSizes BlockStarts".split()
+
+
+def read_bed(bed) -> pr.PyRanges:
+    """
+    Create a pyranges interval from a bed file, a file-like object or an iterable of lines.
+
+    Parameters
+    ----------
+    bed
+      A bed file name (Parquet and Arrow IPC files included), a file-like object or
+      an iterable of bed lines (e.g. the generator returned by gff2bed.bed12_records).
+
+    Returns
+    -------
+    pr.PyRanges
+      The pyranges intervals.
+    """
+    if is_arrow(bed):
+        # columnar files are read as tables, without formatting text lines
+        return pr.PyRanges(arrow.read_bed_frame(bed))
+    if is_path(bed):
+        return pr.readers.read_bed(bed)
+    with open_lines(bed) as f:
+        text = "".join(l for l in f if not l.startswith(("#", "track", "browser")))
+    df = pd.read_csv(
+        io.StringIO(text),
+        dtype={"Chromosome": "category", "Strand": "category"},
+        header=None,
+        sep="\t",
+    )
+    df.columns = BED_COLUMNS[: df.shape[1]]
+    return pr.PyRanges(df)
+
 
 def load_beds(list_bed: list, names: list = ["a", "b", "c"]) -> dict:
     """
@@ -15,7 +57,7 @@ def load_beds(list_bed: list, names: list = ["a", "b", "c"]) -> dict:
     Parameters
     ----------
     list_bed : list
-      A list of bed files. Must be of length 3.
+      A list of bed files, file-like objects or iterables of bed lines. Must be of length 3.
 
     Returns
     -------
@@ -24,10 +66,10 @@ def load_beds(list_bed: list, names: list = ["a", "b", "c"]) -> dict:
     """
     if len(list_bed) != 3:
         raise ValueError("list_bed must be of length 3")
-    if not all(os.path.isfile(bed) for bed in list_bed):
+    if not all(os.path.isfile(bed) for bed in list_bed if is_path(bed)):
         raise ValueError("All elements of list_bed must be valid file paths")
 
-    pr_dict = dict(zip(names, [pr.readers.read_bed(bed) for bed in list_bed]))
+    pr_dict = dict(zip(names, [read_bed(bed) for bed in list_bed]))
 
     return pr_dict
 
@@ -93,8 +135,158 @@ def single_overlap(pr_dict: dict) -> dict:
     return bedsingle_output
 
 
+def chrom_hashes(gr: pr.PyRanges) -> dict:
+    """
+    Hash the content of each chromosome of a pyranges interval.
+
+    Parameters
+    ----------
+    gr : pr.PyRanges
+      The pyranges intervals.
+
+    Returns
+    -------
+    dict
+      The hexadecimal hash of the intervals of each chromosome.
+    """
+    if len(gr) == 0:
+        return {}
+    df = gr.df
+    df = df.assign(Chromosome=df["Chromosome"].astype(str)).sort_values(
+        list(df.columns), kind="stable"
+    )
+    hashes = {}
+    for chrom, chrom_df in df.groupby("Chromosome", sort=True):
+        values = pd.util.hash_pandas_object(chrom_df.astype(str), index=False).values
+        hashes[chrom] = hashlib.sha1(values.tobytes()).hexdigest()
+    return hashes
+
+
+def select_chroms(gr: pr.PyRanges, chroms: list) -> pr.PyRanges:
+    """
+    Keep the intervals of a list of chromosomes.
+    """
+    if len(gr) == 0:
+        return gr
+    df = gr.df
+    return pr.PyRanges(df[df["Chromosome"].astype(str).isin(chroms)])
+
+
+def partitions(all_beds: dict) -> dict:
+    """
+    Calculate the seven partitions (single, double and triple overlaps) of three pyranges intervals.
+    """
+    return {**single_overlap(all_beds), **double_overlap(all_beds), **triple_overlap(all_beds)}
+
+
+def partition_size(gr: pr.PyRanges, as_bp: bool = False):
+    """
+    Count the intervals of a partition, or its length in base pairs if as_bp is True.
+    """
+    return gr.merge(strand=False).length if as_bp else len(gr)
+
+
+def chrom_partition_sizes(all_overlap: dict, as_bp: bool = False) -> dict:
+    """
+    Split the size of each partition by chromosome.
+
+    Parameters
+    ----------
+    all_overlap : dict
+      The pyranges intervals of each partition, as returned by partitions
+    as_bp : bool
+      If True, measure the partitions in base pairs instead of intervals. Default is False.
+
+    Returns
+    -------
+    dict
+      For each chromosome, a dict with the size of each partition.
+    """
+    sizes = {}
+    for key, gr in all_overlap.items():
+        if len(gr) == 0:
+            continue
+        df = (gr.merge(strand=False) if as_bp else gr).df
+        df = df.assign(Chromosome=df["Chromosome"].astype(str), Length=df["End"] - df["Start"])
+        grouped = df.groupby("Chromosome")["Length"]
+        for chrom, size in (grouped.sum() if as_bp else grouped.size()).items():
+            sizes.setdefault(chrom, {})[key] = int(size)
+    return sizes
+
+
+def _read_cache(cache: str) -> dict:
+    try:
+        with open(cache, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache: str, content: dict) -> None:
+    # write then rename, so that an interrupted run leaves the previous cache intact
+    tmp = cache + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(content, f)
+    os.replace(tmp, cache)
+
+
+def incremental_overlaps(
+    all_beds: dict, cache: str, as_bp: bool = False, profiler: Profiler = None
+) -> dict:
+    """
+    Calculate the size of the partitions of three pyranges intervals, reusing the
+    per-chromosome sizes of a previous run for the chromosomes whose content did not change.
+
+    Parameters
+    ----------
+    all_beds : dict
+      A dict of three pyranges intervals.
+    cache : str
+      The JSON file holding the per-chromosome hashes and sizes of the previous runs, updated in place.
+    as_bp : bool
+      If True, measure the partitions in base pairs instead of intervals. Default is False.
+    profiler : Profiler
+      A Profiler measuring the hash and overlap stages, default is None (no profiling)
+
+    Returns
+    -------
+    dict
+      The size of each partition, summed over all chromosomes.
+    """
+    mode = "bp" if as_bp else "regions"
+    with profile_stage(profiler, "overlaps.hash") as stats:
+        hashes = {name: chrom_hashes(gr) for name, gr in all_beds.items()}
+        chroms = sorted(set().union(*hashes.values()))
+        content = _read_cache(cache)
+        cached = content.get(mode, {})
+        if cached.get("names") != list(all_beds):
+            cached = {"names": list(all_beds), "chroms": {}}
+        signature = {c: [hashes[name].get(c, "") for name in all_beds] for c in chroms}
+        changed = [c for c in chroms if cached["chroms"].get(c, {}).get("hashes") != signature[c]]
+        if profiler:
+            stats["records"] = len(chroms)
+            stats["changed"] = len(changed)
+    with profile_stage(profiler, "overlaps.partitions"):
+        subset = {name: select_chroms(gr, changed) for name, gr in all_beds.items()}
+        all_overlap = partitions(subset)
+        sizes = chrom_partition_sizes(all_overlap, as_bp) if changed else {}
+    # chromosomes removed from all inputs are dropped from the cache
+    chrom_cache = {c: cached["chroms"][c] for c in chroms if c not in changed}
+    for c in changed:
+        chrom_cache[c] = {"hashes": signature[c], "sizes": sizes.get(c, {})}
+    content[mode] = {"names": list(all_beds), "chroms": chrom_cache}
+    _write_cache(cache, content)
+    return {
+        key: sum(chrom_cache[c]["sizes"].get(key, 0) for c in chroms) for key in all_overlap
+    }
+
+
 def all_overlaps(
-    list_bed: list, names: list = ["a", "b", "c"], as_bp: bool = False
+    list_bed: list,
+    names: list = ["a", "b", "c"],
+    as_bp: bool = False,
+    profiler: Profiler = None,
+    cache: str = None,
 ) -> dict:
     """
     Calculate the overlaps between the three pyranges intervals.
@@ -107,28 +299,37 @@ def all_overlaps(
       A list of names for the bed files. Must be of length 3.
     as_bp : bool
       If True, return the length of the intervals in base pairs instead of overlap count. Default is False.
+    profiler : Profiler
+      A Profiler measuring the load, overlap and count stages, default is None (no profiling)
+    cache : str
+      A JSON file keeping per-chromosome results between runs: only the chromosomes whose
+      content changed since the previous run are recomputed. Default is None (no cache).
 
     Returns
     -------
     list
       A dict of pyranges intervals.
     """
-    all_beds = load_beds(list_bed)
-    bed_1layer = single_overlap(all_beds)
-    bed_2layer = double_overlap(all_beds)
-    bed_3layer = triple_overlap(all_beds)
+    with profile_stage(profiler, "overlaps.load") as stats:
+        all_beds = load_beds(list_bed, names)
+        if profiler:
+            stats["bytes"] = sum(file_size(bed) for bed in list_bed)
+            stats["records"] = sum(len(bed) for bed in all_beds.values())
+    if cache is not None:
+        return incremental_overlaps(all_beds, cache, as_bp, profiler)
+    with profile_stage(profiler, "overlaps.single"):
+        bed_1layer = single_overlap(all_beds)
+    with profile_stage(profiler, "overlaps.double"):
+        bed_2layer = double_overlap(all_beds)
+    with profile_stage(profiler, "overlaps.triple"):
+        bed_3layer = triple_overlap(all_beds)
     all_overlap = {**bed_1layer, **bed_2layer, **bed_3layer}
-    if as_bp:
-        all_overlap = dict(
-            zip(
-                all_overlap.keys(),
-                [ov.merge(strand=False).length for ov in all_overlap.values()],
-            )
-        )
-    else:
+    with profile_stage(profiler, "overlaps.count") as stats:
         all_overlap = dict(
-            zip(all_overlap.keys(), [len(ov) for ov in all_overlap.values()])
+            zip(all_overlap.keys(), [partition_size(ov, as_bp) for ov in all_overlap.values()])
         )
+        if profiler:
+            stats["records"] = len(all_overlap)
     return all_overlap
 
 
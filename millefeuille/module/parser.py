@@ -0,0 +1,206 @@
+import io
+import os
+import mmap
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from millefeuille.module.streams import ARROW_EXTENSIONS, is_path
+
+GFF_FIELDS = ["chr", "source", "type", "start", "stop", "score", "strand", "phase", "features"]
+BED_FIELDS = ["chr", "start", "end", "features", "score", "strand"]
+INT_FIELDS = {"start", "stop", "end"}
+MIN_CHUNK = 4 << 20
+
+
+def splittable(source) -> bool:
+    """
+    Tell if a source is a text file that parse_file can memory-map, rather than stdin, a stream or a table.
+    """
+    return (
+        is_path(source)
+        and source != "-"
+        and not str(source).lower().endswith(ARROW_EXTENSIONS)
+        and os.path.isfile(source)
+    )
+
+
+def chunk_ranges(file_name: str, n_chunks: int, min_chunk: int = MIN_CHUNK) -> list:
+    """
+    Split a file into byte ranges ending at a newline.
+
+    Parameters
+    ----------
+    file_name : str
+      The file to split
+    n_chunks : int
+      The number of ranges wanted
+    min_chunk : int
+      The minimum size of a range in bytes, small files give a single range
+
+    Returns
+    -------
+    list
+      The (start, end) byte offsets of each range.
+    """
+    size = os.path.getsize(file_name)
+    if size == 0:
+        return []
+    n_chunks = max(1, min(n_chunks, size // max(min_chunk, 1)))
+    if n_chunks == 1:
+        return [(0, size)]
+    bounds = [0]
+    with open(file_name, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        for k in range(1, n_chunks):
+            # move each cut to the byte after the next newline
+            cut = m.find(b"\n", max(size * k // n_chunks, bounds[-1]))
+            if cut < 0:
+                break
+            if cut + 1 > bounds[-1]:
+                bounds.append(cut + 1)
+    if bounds[-1] != size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _data_lines(buf: bytes, file_format: str) -> bytes:
+    # drop comment and header lines, only split the chunk when it has some
+    prefixes = (b"#",) if file_format == "gff" else (b"#", b"track", b"browser")
+    if not any(buf.startswith(p) or b"\n" + p in buf for p in prefixes):
+        return buf
+    return b"\n".join(l for l in buf.split(b"\n") if l.strip() and not l.startswith(prefixes))
+
+
+def parse_range(
+    file_name: str,
+    start: int,
+    end: int,
+    file_format: str = "gff",
+    mol_type: str = None,
+    feature_type: str = None,
+) -> dict:
+    """
+    Parse a newline-aligned byte range of a BED or GFF file into typed columns.
+
+    Parameters
+    ----------
+    file_name : str
+      The BED or GFF file
+    start : int
+      The first byte of the range
+    end : int
+      The byte after the range
+    file_format : str
+      "gff" or "bed"
+    mol_type : str
+      For GFF files, keep only the lines of this molecular type (column 3), default is all lines
+    feature_type : str
+      For GFF and GTF files, add a "values" column with the list of values of this
+      feature (column 9) of each line, see gff2bed.get_featureDict
+
+    Returns
+    -------
+    dict
+      A numpy array for each field (start, stop and end as int64, other fields as strings).
+    """
+    # imported here, so that the converters importing this module start fast
+    import pandas as pd
+
+    fields = GFF_FIELDS if file_format == "gff" else BED_FIELDS
+    if end <= start:
+        # an empty file cannot be memory-mapped
+        buf = b""
+    else:
+        with open(file_name, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            buf = _data_lines(m[start:end], file_format)
+    if not buf.strip():
+        columns = {name: np.empty(0, dtype=object) for name in fields}
+    else:
+        # BED files have 3 to 12 columns, GFF lines may lack the trailing ones
+        n = max(buf[: buf.find(b"\n")].count(b"\t") + 1, len(fields) if file_format == "gff" else 0)
+        df = pd.read_csv(
+            io.BytesIO(buf),
+            sep="\t",
+            header=None,
+            names=range(n),
+            usecols=range(min(n, len(fields))),
+            dtype=str,
+            na_filter=False,
+            quoting=3,
+        )
+        columns = {name: df[i].to_numpy(dtype=object) for i, name in enumerate(fields) if i in df}
+    if file_format == "gff" and mol_type is not None:
+        keep = columns["type"] == mol_type
+        columns = {name: values[keep] for name, values in columns.items()}
+    for name in INT_FIELDS & set(columns):
+        columns[name] = columns[name].astype(np.int64)
+    if file_format == "gff" and feature_type is not None:
+        # gff2bed imports this module
+        from millefeuille.module.gff2bed import get_featureDict
+
+        keys = (feature_type,)
+        # an object array of lists, np.array would make a 2D array of lists with the same length
+        columns["values"] = np.empty(len(columns["features"]), dtype=object)
+        columns["values"][:] = [get_featureDict(f, keys).get(feature_type, []) for f in columns["features"]]
+    return columns
+
+
+def parse_file(
+    file_name: str,
+    file_format: str = "gff",
+    workers: int = None,
+    executor: str = "process",
+    min_chunk: int = MIN_CHUNK,
+    **options,
+) -> dict:
+    """
+    Parse a BED or GFF file into typed columns, in parallel.
+
+    The file is memory-mapped and split into newline-aligned byte ranges, each
+    parsed by a worker (see parse_range), and the columns of the ranges are
+    concatenated in order. Files smaller than min_chunk are parsed in the current thread.
+
+    Parameters
+    ----------
+    file_name : str
+      The BED or GFF file
+    file_format : str
+      "gff" or "bed"
+    workers : int
+      Number of workers, default is the number of CPUs
+    executor : str
+      "process" (default) or "thread", close to serial speed as parsing mostly holds the GIL
+    min_chunk : int
+      The minimum size of a range in bytes
+    options
+      mol_type and feature_type, see parse_range
+
+    Returns
+    -------
+    dict
+      A numpy array for each field, in the order of the file.
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError('executor must be "thread" or "process"')
+    workers = workers or os.cpu_count() or 1
+    ranges = chunk_ranges(file_name, workers, min_chunk)
+    if len(ranges) <= 1:
+        parts = [parse_range(file_name, *r, file_format, **options) for r in ranges]
+    else:
+        if executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=min(workers, len(ranges)))
+        else:
+            # the workers only get the file name and offsets, and map the file themselves
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            pool = ProcessPoolExecutor(
+                max_workers=min(workers, len(ranges)), mp_context=multiprocessing.get_context(method)
+            )
+        with pool as p:
+            futures = [
+                p.submit(parse_range, file_name, start, end, file_format, **options)
+                for start, end in ranges
+            ]
+            parts = [future.result() for future in futures]
+    if not parts:
+        parts = [parse_range(file_name, 0, 0, file_format, **options)]
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
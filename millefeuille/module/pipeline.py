@@ -0,0 +1,409 @@
+import numpy as np
+
+from millefeuille.module.gff2bed import get_featureDict
+from millefeuille.module.intervals import IntervalSet, HEADER_PREFIXES, merge_sorted
+from millefeuille.module.query import overlap_sorted
+from millefeuille.module.algebra import IntervalChain, _as_set
+from millefeuille.module.streams import open_lines, write_lines
+
+
+def _pairs(x: tuple, y: tuple) -> tuple:
+    order = np.lexsort((y[1], y[0]))
+    which, hits = overlap_sorted(x[0], x[1], y[0][order], y[1][order])
+    return which, order[hits]
+
+
+def _intersect(x: tuple, y: tuple) -> tuple:
+    which, hits = _pairs(x, y)
+    return np.maximum(x[0][which], y[0][hits]), np.minimum(x[1][which], y[1][hits])
+
+
+def _without(x: tuple, y: tuple) -> tuple:
+    which, hits = _pairs(x, y)
+    keep = np.ones(len(x[0]), dtype=bool)
+    keep[which] = False
+    return x[0][keep], x[1][keep]
+
+
+def _size(x: tuple, as_bp: bool) -> int:
+    if not as_bp:
+        return len(x[0])
+    order = np.lexsort((x[1], x[0]))
+    starts, ends = merge_sorted(x[0][order], x[1][order])
+    return int((ends - starts).sum())
+
+
+def chrom_partitions(parts: dict, as_bp: bool = False) -> dict:
+    """
+    Measure the seven partitions of three sets of intervals on one chromosome, as overlaps.all_overlaps.
+
+    Parameters
+    ----------
+    parts : dict
+      For each of the three set names, a tuple with the starts and the ends of its
+      intervals on the chromosome. As in all_overlaps, strands are ignored.
+    as_bp : bool
+      If True, measure the partitions in base pairs instead of intervals. Default is False.
+
+    Returns
+    -------
+    dict
+      The size of each partition, with the keys of overlaps.all_overlaps.
+    """
+    a, b, c = parts
+    sizes = {}
+    for x, y, z in [(a, b, c), (a, c, b), (b, c, a)]:
+        sizes[z] = _size(_without(_without(parts[z], parts[x]), parts[y]), as_bp)
+    for x, y, z in [(a, b, c), (a, c, b), (b, c, a)]:
+        sizes[x + "::" + y] = _size(_without(_intersect(parts[x], parts[y]), parts[z]), as_bp)
+    sizes["::".join(parts)] = _size(_intersect(_intersect(parts[a], parts[b]), parts[c]), as_bp)
+    return sizes
+
+
+def _chrom_part(intervals: IntervalSet, chrom: str) -> tuple:
+    rows = intervals.chrom_slice(chrom)
+    return intervals.starts[rows], intervals.ends[rows]
+
+
+class Pipeline:
+    """
+    A lazy pipeline of operations on the intervals of a GFF or BED file.
+
+    Operations are only recorded, and run when a terminal method (`collect`,
+    `write_bed`, `count`) is called. The plan is then executed in a single pass:
+
+    - filter and project stages are fused into the scan of the input, so that
+      unselected lines are dropped as soon as they are read;
+    - the interval operations (intersect, subtract, merge...) and the partition
+      counts run one chromosome at a time on numpy arrays, without creating
+      intermediate files or DataFrames.
+
+    With `grouped=True`, the input is expected to be grouped by chromosome (e.g.
+    sorted) and each chromosome is processed and released as soon as the next one
+    starts, so that memory holds a single chromosome at a time.
+
+    Parameters
+    ----------
+    source
+      Name of the input file, "-" for stdin, a file-like object or an iterable of lines
+    file_format : str
+      "gff" or "bed"
+    grouped : bool
+      If True, the input is grouped by chromosome and streamed. Default is False.
+    """
+
+    def __init__(self, source, file_format: str, grouped: bool = False):
+        if file_format not in ("gff", "bed"):
+            raise ValueError('file_format must be "gff" or "bed"')
+        self.source = source
+        self.file_format = file_format
+        self.grouped = grouped
+        self.mol_types = None
+        self.chroms = None
+        self.predicates = []
+        self.feature_type = None
+        self.group = False
+        self.chain = IntervalChain(None)
+
+    @classmethod
+    def read_gff(cls, file_gff, grouped: bool = False) -> "Pipeline":
+        """
+        Start a pipeline from a GFF file. Coordinates are converted to 0-based, half-open.
+        """
+        return cls(file_gff, "gff", grouped)
+
+    @classmethod
+    def read_bed(cls, file_bed, grouped: bool = False) -> "Pipeline":
+        """
+        Start a pipeline from a BED file.
+        """
+        return cls(file_bed, "bed", grouped)
+
+    def _copy(self) -> "Pipeline":
+        other = Pipeline(self.source, self.file_format, self.grouped)
+        other.__dict__.update(self.__dict__)
+        other.predicates = list(self.predicates)
+        return other
+
+    def _scan_stage(self, name: str) -> "Pipeline":
+        if self.group or self.chain.ops:
+            raise ValueError(name + " must come before transcripts and interval operations")
+        return self._copy()
+
+    def filter(self, mol_type=None, chroms=None, predicate=None) -> "Pipeline":
+        """
+        Keep the lines of the input matching all conditions.
+
+        Parameters
+        ----------
+        mol_type
+          A molecular type or list of molecular types (column 3 of a GFF file) to keep
+        chroms
+          A list of chromosomes to keep
+        predicate
+          A function taking the list of fields of a line, returning True to keep it
+        """
+        other = self._scan_stage("filter")
+        if mol_type is not None:
+            if other.file_format != "gff":
+                raise ValueError("mol_type can only filter GFF files")
+            mol_type = {mol_type} if isinstance(mol_type, str) else set(mol_type)
+            other.mol_types = mol_type if other.mol_types is None else other.mol_types & mol_type
+        if chroms is not None:
+            chroms = set(chroms)
+            other.chroms = chroms if other.chroms is None else other.chroms & chroms
+        if predicate is not None:
+            other.predicates.append(predicate)
+        return other
+
+    def project(self, feature_type: str = "Parent") -> "Pipeline":
+        """
+        Name the intervals of a GFF file after a feature of column 9 (e.g. their Parent
+        transcript), one interval per value as in gff2bed. By default the name is the
+        whole column 9.
+        """
+        if self.file_format != "gff":
+            raise ValueError("project can only select the features of GFF files")
+        other = self._scan_stage("project")
+        other.feature_type = feature_type
+        return other
+
+    def transcripts(self) -> "Pipeline":
+        """
+        Group the intervals by name into transcripts spanning their exons, as the lines of a BED12 file.
+        """
+        if self.chain.ops:
+            raise ValueError("transcripts must come before interval operations")
+        other = self._copy()
+        other.group = True
+        return other
+
+    def _then(self, method: str, *args) -> "Pipeline":
+        other = self._copy()
+        other.chain = getattr(self.chain, method)(*args)
+        return other
+
+    def intersect(self, other) -> "Pipeline":
+        """
+        Keep the overlapping parts with another set (IntervalSet or BED file), see algebra.intersect.
+        """
+        return self._then("intersect", other)
+
+    def subtract(self, other) -> "Pipeline":
+        """
+        Remove the parts covered by another set (IntervalSet or BED file), see algebra.subtract.
+        """
+        return self._then("subtract", other)
+
+    def window(self, other, left: int, right: int = None) -> "Pipeline":
+        """
+        Keep the intervals close to another set, see algebra.window.
+        """
+        return self._then("window", other, left, right)
+
+    def merge(self, distance: int = 0) -> "Pipeline":
+        """
+        Merge the overlapping intervals, see algebra.merge.
+        """
+        return self._then("merge", distance)
+
+    def slop(self, left: int, right: int = None, chrom_sizes=None, stranded: bool = False) -> "Pipeline":
+        """
+        Extend the intervals, see algebra.slop.
+        """
+        return self._then("slop", left, right, chrom_sizes, stranded)
+
+    def complement(self, chrom_sizes) -> "Pipeline":
+        """
+        Return the parts of the chromosomes not covered, see algebra.complement.
+        """
+        return self._then("complement", chrom_sizes)
+
+    def explain(self) -> str:
+        """
+        Describe the fused stages of the execution plan.
+        """
+        scan = []
+        if self.mol_types is not None:
+            scan.append("mol_type in " + ",".join(sorted(self.mol_types)))
+        if self.chroms is not None:
+            scan.append("chrom in " + ",".join(sorted(self.chroms)))
+        if self.predicates:
+            scan.append(str(len(self.predicates)) + " predicate(s)")
+        if self.feature_type is not None:
+            scan.append("project " + self.feature_type)
+        plan = ["scan " + self.file_format + (" [" + ", ".join(scan) + "]" if scan else "")]
+        per_chrom = (["transcripts"] if self.group else []) + [op[0] for op in self.chain.ops]
+        if per_chrom:
+            plan.append("per chromosome [" + " -> ".join(per_chrom) + "]")
+        return " -> ".join(plan)
+
+    def _lines(self) -> iter:
+        # the scan, with the filter and project stages fused in
+        gff = self.file_format == "gff"
+        with open_lines(self.source) as f:
+            for l in f:
+                if not l.strip() or l.startswith("#" if gff else HEADER_PREFIXES):
+                    continue
+                line = l.rstrip("\r\n").split("\t")
+                if gff and (len(line) < 9 or (self.mol_types is not None and line[2] not in self.mol_types)):
+                    continue
+                if self.chroms is not None and line[0] not in self.chroms:
+                    continue
+                if not all(predicate(line) for predicate in self.predicates):
+                    continue
+                if not gff:
+                    name = line[3] if len(line) > 3 else ""
+                    strand = line[5] if len(line) > 5 else "."
+                    yield line[0], int(line[1]), int(line[2]), name, strand
+                elif self.feature_type is None:
+                    yield line[0], int(line[3]) - 1, int(line[4]), line[8], line[6]
+                else:
+                    for name in get_featureDict(line[8], (self.feature_type,)).get(self.feature_type, []):
+                        yield line[0], int(line[3]) - 1, int(line[4]), name, line[6]
+
+    def _batches(self) -> iter:
+        # the scanned intervals, one IntervalSet per chromosome
+        batches, current, done = {}, None, set()
+        for record in self._lines():
+            chrom = record[0]
+            if self.grouped and chrom != current:
+                if current is not None:
+                    yield self._batch(current, batches.pop(current))
+                    done.add(current)
+                if chrom in done:
+                    raise ValueError("the input is not grouped by chromosome: " + chrom)
+                current = chrom
+            batches.setdefault(chrom, []).append(record)
+        for chrom in sorted(batches):
+            yield self._batch(chrom, batches[chrom])
+
+    def _batch(self, chrom: str, records: list) -> IntervalSet:
+        chroms, starts, ends, names, strands = zip(*records)
+        if self.group:
+            # one interval per name, from its first start to its last end
+            names, first, inverse = np.unique(
+                np.asarray(names, dtype=str), return_index=True, return_inverse=True
+            )
+            group_starts = np.full(len(names), np.iinfo(np.int64).max)
+            np.minimum.at(group_starts, inverse, np.asarray(starts, dtype=np.int64))
+            group_ends = np.zeros(len(names), dtype=np.int64)
+            np.maximum.at(group_ends, inverse, np.asarray(ends, dtype=np.int64))
+            starts, ends, strands = group_starts, group_ends, np.asarray(strands)[first]
+            chroms = [chrom] * len(names)
+        return IntervalSet.from_arrays(chroms, starts, ends, names, strands)
+
+    def _results(self) -> iter:
+        # run the interval operations on each chromosome, then on the chromosomes they add
+        seen = set()
+        for batch in self._batches():
+            chrom = batch.chroms[0]
+            seen.add(chrom)
+            starts, ends, rows = self.chain.run_chrom(
+                chrom, batch.starts, batch.ends, np.arange(len(batch), dtype=np.int64), batch
+            )
+            yield chrom, starts, ends, rows, batch
+        empty = np.empty(0, dtype=np.int64)
+        for chrom in sorted(set(self.chain.extra_chroms()) - seen):
+            batch = IntervalSet([chrom], [0, 0], empty, empty, np.empty(0, dtype=object), np.empty(0, dtype="U1"))
+            starts, ends, rows = self.chain.run_chrom(chrom, empty, empty, empty, batch)
+            yield chrom, starts, ends, rows, batch
+
+    def iter_chroms(self) -> iter:
+        """
+        Run the pipeline one chromosome at a time.
+
+        Returns
+        -------
+        generator
+          An IntervalSet for each chromosome with intervals, sorted by chromosome
+          unless the input is grouped.
+        """
+        for chrom, starts, ends, rows, batch in self._results():
+            if len(starts) == 0:
+                continue
+            names, strands = None, None
+            if self.chain.keeps_rows():
+                names, strands = batch.names[rows], batch.strands[rows]
+            yield IntervalSet([chrom], [0, len(starts)], starts, ends, names, strands)
+
+    def collect(self) -> IntervalSet:
+        """
+        Run the pipeline and gather the resulting intervals.
+        """
+        parts = list(self.iter_chroms())
+        if not parts:
+            return IntervalSet([], [0], [], [])
+        keep = parts[0].names is not None
+        return IntervalSet.from_arrays(
+            np.concatenate([p.chrom_column() for p in parts]),
+            np.concatenate([p.starts for p in parts]),
+            np.concatenate([p.ends for p in parts]),
+            np.concatenate([p.names for p in parts]) if keep else None,
+            np.concatenate([p.strands for p in parts]) if keep else None,
+        )
+
+    def write_bed(self, output) -> int:
+        """
+        Run the pipeline and write the resulting intervals as BED6 lines, one chromosome at a time.
+
+        Parameters
+        ----------
+        output
+          Name of the BED file ("-" for stdout) or writable file-like object
+
+        Returns
+        -------
+        int
+          The number of lines written.
+        """
+
+        def lines():
+            for part in self.iter_chroms():
+                names = part.names if part.names is not None else ["."] * len(part)
+                strands = part.strands if part.strands is not None else ["."] * len(part)
+                for s, e, name, strand in zip(part.starts, part.ends, names, strands):
+                    yield "\t".join([part.chroms[0], str(s), str(e), name, "0", strand]) + "\n"
+
+        return write_lines(lines(), output)
+
+    def count(self, others: list, names: list = ["a", "b", "c"], as_bp: bool = False) -> dict:
+        """
+        Run the pipeline and measure the partitions of its result with two other sets, as overlaps.all_overlaps.
+
+        The partitions are measured one chromosome at a time, as the result of the
+        pipeline is produced. As in all_overlaps, strands are ignored.
+
+        Parameters
+        ----------
+        others : list
+          The two other sets, as IntervalSet or BED files
+        names : list
+          A list of names for the result of the pipeline and the two other sets. Must be of length 3.
+        as_bp : bool
+          If True, return the length of the intervals in base pairs instead of overlap count. Default is False.
+
+        Returns
+        -------
+        dict
+          The size of each partition, summed over all chromosomes.
+        """
+        if len(others) != 2 or len(names) != 3:
+            raise ValueError("count needs two other sets and three names")
+        others = [_as_set(other) for other in others]
+        empty = np.empty(0, dtype=np.int64)
+        totals = chrom_partitions(dict(zip(names, [(empty, empty)] * 3)), as_bp)
+        seen = set()
+
+        def add(chrom, part):
+            parts = [part] + [_chrom_part(other, chrom) for other in others]
+            for key, size in chrom_partitions(dict(zip(names, parts)), as_bp).items():
+                totals[key] += size
+
+        for result in self.iter_chroms():
+            chrom = result.chroms[0]
+            seen.add(chrom)
+            add(chrom, (result.starts, result.ends))
+        for chrom in sorted(set().union(*(other.chroms for other in others)) - seen):
+            add(chrom, (empty, empty))
+        return totals
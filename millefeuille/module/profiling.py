@@ -0,0 +1,169 @@
+import os
+import time
+import logging
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def max_rss_mb() -> float:
+    """
+    Return the peak resident memory of the current process in MB, 0 if unknown.
+    """
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Profiler:
+    """
+    Collect per-stage wall time, CPU time, counters and peak memory of a conversion.
+
+    Each finished stage is stored as a dictionary in `stages`, and is passed to the
+    callback and to the logger if given. Functions of millefeuille accepting a
+    `profiler` argument do not measure anything when it is None.
+
+    Parameters
+    ----------
+    callback
+      A callable receiving the dictionary of each finished stage, default is None
+    logger : logging.Logger
+      A logger where each finished stage is reported at the INFO level, default is None
+    trace_memory : bool
+      If True, the peak memory of each stage is measured with tracemalloc (slower).
+      Otherwise the peak resident memory of the process is reported. Default is False.
+    """
+
+    def __init__(self, callback=None, logger: logging.Logger = None, trace_memory: bool = False):
+        self.callback = callback
+        self.logger = logger
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure a stage of processing.
+
+        The context manager yields a dictionary where counters (records, bytes...)
+        can be set by the measured code.
+
+        Parameters
+        ----------
+        name : str
+          Name of the stage, e.g. "gff2bed.parse"
+        """
+        counters = {}
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield counters
+        finally:
+            peak_mb = None
+            if self.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+                if started_tracing:
+                    tracemalloc.stop()
+            self.add_stage(name, time.perf_counter() - wall, time.process_time() - cpu, counters, peak_mb)
+
+    def add_stage(
+        self, name: str, wall_seconds: float, cpu_seconds: float, counters: dict = None, peak_mb: float = None
+    ) -> None:
+        """
+        Record a stage measured by the caller, e.g. summed over calls interleaved with another stage.
+
+        Parameters
+        ----------
+        name : str
+          Name of the stage
+        wall_seconds, cpu_seconds : float
+          The measured times
+        counters : dict
+          The counters of the stage (records, bytes...), default is None
+        peak_mb : float
+          The peak memory of the stage, default is the peak resident memory of the process
+        """
+        record = {
+            "stage": name,
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": cpu_seconds,
+            "peak_mb": max_rss_mb() if peak_mb is None else peak_mb,
+        }
+        # counters left to None are unknown (e.g. bytes written to a pipe), they are not reported
+        record.update({k: v for k, v in (counters or {}).items() if v is not None})
+        self.stages.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        if self.logger is not None:
+            self.logger.info(
+                " ".join(
+                    [name]
+                    + [
+                        k + "=" + (format(v, ".4g") if isinstance(v, float) else str(v))
+                        for k, v in record.items()
+                        if k != "stage"
+                    ]
+                )
+            )
+
+    def summary(self) -> dict:
+        """
+        Summarize the measured stages.
+
+        Returns
+        -------
+        dict
+          A dictionary with the list of "stages" and the "total" wall time, CPU time,
+          peak memory and summed counters.
+        """
+        total = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_mb": 0.0}
+        for record in self.stages:
+            for k, v in record.items():
+                if k == "stage":
+                    continue
+                if k == "peak_mb":
+                    total[k] = max(total[k], v)
+                else:
+                    total[k] = total.get(k, 0) + v
+        return {"stages": list(self.stages), "total": total}
+
+
+def profile_stage(profiler: Profiler, name: str):
+    """
+    Return the context manager measuring a stage, or a no-op one if profiler is None.
+
+    Parameters
+    ----------
+    profiler : Profiler
+      The profiler collecting the measures, or None to disable profiling
+    name : str
+      Name of the stage
+
+    Returns
+    -------
+    A context manager yielding a dictionary of counters.
+    """
+    if profiler is None:
+        return nullcontext({})
+    return profiler.stage(name)
+
+
+def file_size(file_name) -> int:
+    """
+    Return the size in bytes of a file, 0 if it is not a file on disk.
+    """
+    try:
+        return os.path.getsize(file_name)
+    except (OSError, TypeError):
+        return 0
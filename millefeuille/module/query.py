@@ -0,0 +1,311 @@
+import os
+import json
+import numpy as np
+
+from millefeuille.module.intervals import IntervalSet
+
+QUERY_ARRAYS = ["offsets", "starts", "ends", "max_ends", "end_order", "sorted_ends"]
+
+
+def group_by_chrom(chroms) -> iter:
+    """
+    Group query rows by chromosome.
+
+    Parameters
+    ----------
+    chroms
+      The chromosome of each query
+
+    Returns
+    -------
+    generator
+      A tuple with the chromosome name and the array of rows of the queries on it.
+    """
+    names, inverse = np.unique(np.asarray(chroms, dtype=str), return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(names) + 1))
+    for k, chrom in enumerate(names):
+        yield str(chrom), order[bounds[k] : bounds[k + 1]]
+
+
+def expand_ranges(lo: np.ndarray, hi: np.ndarray) -> tuple:
+    """
+    Expand row ranges [lo, hi) into flat arrays.
+
+    Returns
+    -------
+    tuple
+      The position of the range of each row and the rows themselves.
+    """
+    counts = np.maximum(hi - lo, 0)
+    which = np.repeat(np.arange(len(lo)), counts)
+    rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return which, rows + lo[which]
+
+
+def overlap_sorted(
+    starts: np.ndarray, ends: np.ndarray, other_starts, other_ends, max_ends=None
+) -> tuple:
+    """
+    Find the overlapping pairs between query ranges and intervals of the same chromosome.
+
+    Parameters
+    ----------
+    starts, ends : np.ndarray
+      The query ranges, in any order
+    other_starts, other_ends : np.ndarray
+      The intervals, sorted by start
+    max_ends : np.ndarray
+      The running maximum of other_ends, computed if not given
+
+    Returns
+    -------
+    tuple
+      The query position and the interval position of each overlapping pair.
+    """
+    if max_ends is None:
+        max_ends = np.maximum.accumulate(other_ends) if len(other_ends) else other_ends
+    # intervals with a start before the query end
+    hi = np.searchsorted(other_starts, ends, side="left")
+    # first interval whose running max end is after the query start
+    lo = np.searchsorted(max_ends, starts, side="right")
+    which, rows = expand_ranges(lo, hi)
+    keep = other_ends[rows] > starts[which]
+    return which[keep], rows[keep]
+
+
+class IntervalIndex:
+    """
+    Reusable index for batched point, range and nearest queries over a set of intervals.
+
+    The intervals are kept sorted by start per chromosome, together with the
+    running maximum of their ends (max-end augmentation) so that all intervals
+    overlapping a range lie in a contiguous block of rows found by two binary
+    searches. Hits are returned as rows of the IntervalSet (`intervals`).
+
+    The index is picklable, and can be saved to a directory of numpy arrays and
+    memory-mapped by other processes with `load`.
+
+    Parameters
+    ----------
+    intervals : IntervalSet
+      The intervals to index
+    """
+
+    def __init__(self, intervals: IntervalSet, arrays: dict = None):
+        self.intervals = intervals
+        self.chroms = intervals.chroms
+        if arrays is None:
+            arrays = self._build(intervals)
+        for name in QUERY_ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @staticmethod
+    def _build(intervals: IntervalSet) -> dict:
+        max_ends = np.empty_like(intervals.ends)
+        end_order = np.empty(len(intervals), dtype=np.int64)
+        for k in range(len(intervals.chroms)):
+            rows = slice(intervals.offsets[k], intervals.offsets[k + 1])
+            max_ends[rows] = np.maximum.accumulate(intervals.ends[rows])
+            end_order[rows] = intervals.offsets[k] + np.argsort(
+                intervals.ends[rows], kind="stable"
+            )
+        return {
+            "offsets": intervals.offsets,
+            "starts": intervals.starts,
+            "ends": intervals.ends,
+            "max_ends": max_ends,
+            "end_order": end_order,
+            "sorted_ends": intervals.ends[end_order],
+        }
+
+    @classmethod
+    def from_bed(cls, file_bed) -> "IntervalIndex":
+        """
+        Index the intervals of a BED file (name, file-like object or iterable of lines).
+        """
+        return cls(IntervalSet.from_bed(file_bed))
+
+    @classmethod
+    def from_gff(cls, file_gff, mol_type: str = None, feature_type: str = None) -> "IntervalIndex":
+        """
+        Index the intervals of a GFF file (name, file-like object or iterable of lines).
+        """
+        return cls(IntervalSet.from_gff(file_gff, mol_type, feature_type))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _rows(self, chrom: str) -> tuple:
+        try:
+            k = self.chroms.index(chrom)
+        except ValueError:
+            return 0, 0
+        return int(self.offsets[k]), int(self.offsets[k + 1])
+
+    def overlap(self, chroms, starts, ends) -> tuple:
+        """
+        Find the intervals overlapping each query range.
+
+        Parameters
+        ----------
+        chroms
+          The chromosome of each query
+        starts
+          The start of each query (0-based)
+        ends
+          The end of each query (excluded)
+
+        Returns
+        -------
+        tuple
+          Two arrays of the same length: the query number and the interval row of each hit,
+          sorted by query.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        queries, hits = [], []
+        for chrom, q in group_by_chrom(chroms):
+            which, rows = self.overlap_chrom(chrom, starts[q], ends[q])
+            queries.append(q[which])
+            hits.append(rows)
+        if not queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        queries = np.concatenate(queries)
+        hits = np.concatenate(hits)
+        order = np.lexsort((hits, queries))
+        return queries[order], hits[order]
+
+    def overlap_chrom(self, chrom: str, starts: np.ndarray, ends: np.ndarray) -> tuple:
+        """
+        Find the intervals overlapping query ranges that are all on the same chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+          The chromosome of the queries
+        starts : np.ndarray
+          The start of each query (0-based)
+        ends : np.ndarray
+          The end of each query (excluded)
+
+        Returns
+        -------
+        tuple
+          The query position and the interval row of each hit.
+        """
+        first, last = self._rows(chrom)
+        if first == last:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        which, rows = overlap_sorted(
+            starts,
+            ends,
+            self.starts[first:last],
+            self.ends[first:last],
+            self.max_ends[first:last],
+        )
+        return which, rows + first
+
+    def point(self, chroms, positions) -> tuple:
+        """
+        Find the intervals containing each query position (0-based).
+
+        Returns
+        -------
+        tuple
+          The query number and the interval row of each hit, sorted by query.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        return self.overlap(chroms, positions, positions + 1)
+
+    def count(self, chroms, starts, ends) -> np.ndarray:
+        """
+        Count the intervals overlapping each query range.
+        """
+        queries, hits = self.overlap(chroms, starts, ends)
+        return np.bincount(queries, minlength=len(np.asarray(starts)))
+
+    def nearest(self, chroms, starts, ends=None) -> tuple:
+        """
+        Find the nearest interval of each query range or position.
+
+        Overlapping intervals are at distance 0, otherwise the distance follows
+        bedtools closest -d (1 for book-ended intervals). Ties go to the upstream interval.
+
+        Parameters
+        ----------
+        chroms
+          The chromosome of each query
+        starts
+          The start of each query (0-based)
+        ends
+          The end of each query (excluded), default is starts + 1 (positions)
+
+        Returns
+        -------
+        tuple
+          The interval row and the distance for each query, -1 when the chromosome has no interval.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = starts + 1 if ends is None else np.asarray(ends, dtype=np.int64)
+        nearest = np.full(len(starts), -1, dtype=np.int64)
+        distance = np.full(len(starts), -1, dtype=np.int64)
+        for chrom, q in group_by_chrom(chroms):
+            first, last = self._rows(chrom)
+            if first == last:
+                continue
+            n = last - first
+            qs, qe = starts[q], ends[q]
+            inf = np.iinfo(np.int64).max
+            # upstream: interval with the largest end <= query start
+            up = np.searchsorted(self.sorted_ends[first:last], qs, side="right") - 1
+            up_row = self.end_order[first + np.maximum(up, 0)]
+            up_dist = np.where(up >= 0, qs - self.ends[up_row] + 1, inf)
+            # downstream: first interval starting at or after the query end
+            down = np.searchsorted(self.starts[first:last], qe, side="left")
+            down_row = first + np.minimum(down, n - 1)
+            down_dist = np.where(down < n, self.starts[down_row] - qe + 1, inf)
+            # overlapping: the first row whose running max end is after the query start
+            over = np.searchsorted(self.max_ends[first:last], qs, side="right")
+            over_row = first + np.minimum(over, n - 1)
+            overlaps = (over < n) & (self.starts[over_row] < qe)
+            nearest[q] = np.where(
+                overlaps, over_row, np.where(up_dist <= down_dist, up_row, down_row)
+            )
+            distance[q] = np.where(overlaps, 0, np.minimum(up_dist, down_dist))
+        return nearest, distance
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to a directory of numpy arrays that can be memory-mapped by load.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in QUERY_ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        if self.intervals.names is not None:
+            np.save(os.path.join(path, "names.npy"), self.intervals.names.astype(str))
+        if self.intervals.strands is not None:
+            np.save(os.path.join(path, "strands.npy"), self.intervals.strands)
+        with open(os.path.join(path, "chroms.json"), "w") as f:
+            json.dump(self.chroms, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IntervalIndex":
+        """
+        Load an index saved with save, memory-mapping its arrays by default.
+        """
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "chroms.json"), "r") as f:
+            chroms = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+            for name in QUERY_ARRAYS
+        }
+        extra = {}
+        for name in ["names", "strands"]:
+            file_name = os.path.join(path, name + ".npy")
+            extra[name] = np.load(file_name, mmap_mode=mode) if os.path.exists(file_name) else None
+        intervals = IntervalSet(
+            chroms, arrays["offsets"], arrays["starts"], arrays["ends"], extra["names"], extra["strands"]
+        )
+        return cls(intervals, arrays)
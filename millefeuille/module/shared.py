@@ -0,0 +1,280 @@
+import weakref
+import numpy as np
+from itertools import permutations
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from millefeuille.module.intervals import IntervalSet, merge_sorted
+from millefeuille.module.query import IntervalIndex, QUERY_ARRAYS
+
+SHARED_ARRAYS = QUERY_ARRAYS + ["codes", "strands"]
+
+# the shared sets attached by each worker of pairwise_overlaps
+_worker_shared = None
+
+
+def _set_arrays(index: IntervalIndex) -> dict:
+    intervals = index.intervals
+    arrays = {name: np.ascontiguousarray(getattr(index, name)) for name in QUERY_ARRAYS}
+    arrays["codes"] = np.repeat(
+        np.arange(len(intervals.chroms), dtype=np.int32), np.diff(intervals.offsets)
+    )
+    if intervals.strands is not None:
+        arrays["strands"] = np.ascontiguousarray(intervals.strands, dtype="U1")
+    return arrays
+
+
+class SharedIntervals:
+    """
+    Interval sets loaded once into a shared memory block and attached zero-copy by other processes.
+
+    For each set, the block holds the arrays of its IntervalIndex (starts, ends,
+    chromosome offsets, running max of the ends...), the chromosome code of each
+    interval and the strands. Only the `handle` (block name and array layout) is
+    sent to worker processes, which get numpy views on the block with `attach`:
+    the memory used stays the same whatever the number of workers.
+
+    The process calling `create` owns the block and must `unlink` it when done,
+    which the context manager does. The views returned by `index` and `codes`
+    stay valid after `close`: the block is only detached once the last of them
+    is released.
+
+    Parameters
+    ----------
+    shm : shared_memory.SharedMemory
+      The shared memory block
+    layout : dict
+      For each set, the chromosome names and the (offset, length, dtype) of each array
+    owner : bool
+      True if this process created the block
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict, owner: bool = False):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self._indexes = {}
+        # number of live views on the block, which must stay mapped until they are released
+        self._exports = 0
+        self._closing = False
+
+    @classmethod
+    def create(cls, sets: dict) -> "SharedIntervals":
+        """
+        Copy interval sets into a new shared memory block.
+
+        Parameters
+        ----------
+        sets : dict
+          The IntervalSet (or IntervalIndex) of each set name
+
+        Returns
+        -------
+        SharedIntervals
+          The shared sets, owned by the current process.
+        """
+        arrays, layout, size = {}, {}, 0
+        for name, intervals in sets.items():
+            index = intervals if isinstance(intervals, IntervalIndex) else IntervalIndex(intervals)
+            arrays[name] = _set_arrays(index)
+            layout[name] = {"chroms": list(index.chroms), "arrays": {}}
+            for key, array in arrays[name].items():
+                # keep every array aligned on 8 bytes
+                size += -size % 8
+                layout[name]["arrays"][key] = (size, len(array), array.dtype.str)
+                size += array.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(shm, layout, owner=True)
+        for name in sets:
+            for key, array in arrays[name].items():
+                shared._view(name, key)[:] = array
+        return shared
+
+    @property
+    def handle(self) -> tuple:
+        """
+        The picklable name and layout of the block, to attach it from another process.
+        """
+        return self.shm.name, self.layout
+
+    @classmethod
+    def attach(cls, handle: tuple) -> "SharedIntervals":
+        """
+        Attach the shared sets created by another process, without copying them.
+        """
+        name, layout = handle
+        # the creating process owns the block, do not let the resource tracker unlink it
+        return cls(shared_memory.SharedMemory(name=name, track=False), layout)
+
+    @property
+    def names(self) -> list:
+        return list(self.layout)
+
+    def _view(self, name: str, key: str) -> np.ndarray:
+        offset, length, dtype = self.layout[name]["arrays"][key]
+        view = np.ndarray((length,), dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+        # numpy does not keep the buffer exported: count the view, and keep self
+        # (and the block) alive through the finalizer until the view is released
+        self._exports += 1
+        weakref.finalize(view, self._release).atexit = False
+        return view
+
+    def _release(self) -> None:
+        self._exports -= 1
+        if self._closing and self._exports == 0:
+            self.shm.close()
+
+    def index(self, name: str) -> IntervalIndex:
+        """
+        Return the IntervalIndex of a set, made of views on the shared block.
+        """
+        if name not in self._indexes:
+            arrays = {key: self._view(name, key) for key in QUERY_ARRAYS}
+            strands = self._view(name, "strands") if "strands" in self.layout[name]["arrays"] else None
+            intervals = IntervalSet(
+                self.layout[name]["chroms"],
+                arrays["offsets"],
+                arrays["starts"],
+                arrays["ends"],
+                strands=strands,
+            )
+            self._indexes[name] = IntervalIndex(intervals, arrays)
+        return self._indexes[name]
+
+    def codes(self, name: str) -> np.ndarray:
+        """
+        Return the chromosome code of each interval of a set (its position in the chromosome names).
+        """
+        return self._view(name, "codes")
+
+    def close(self) -> None:
+        """
+        Release the cached views and detach from the block, once the views still in use are released.
+        """
+        if self._closing:
+            return
+        self._indexes = {}
+        self._closing = True
+        if self._exports == 0:
+            self.shm.close()
+
+    def unlink(self) -> None:
+        """
+        Free the block, once all processes are done with it.
+        """
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedIntervals":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        if self.owner:
+            self.unlink()
+
+
+def share_beds(list_bed: list, names: list = None) -> SharedIntervals:
+    """
+    Read BED files once into shared memory.
+
+    Parameters
+    ----------
+    list_bed : list
+      A list of bed files, file-like objects or iterables of bed lines
+    names : list
+      A name for each bed file, default is the position of the file as a string
+
+    Returns
+    -------
+    SharedIntervals
+      The shared sets, owned by the current process.
+    """
+    names = names if names is not None else [str(i) for i in range(len(list_bed))]
+    if len(names) != len(list_bed):
+        raise ValueError("names and list_bed must have the same length")
+    return SharedIntervals.create(
+        {name: IntervalSet.from_bed(bed) for name, bed in zip(names, list_bed)}
+    )
+
+
+def overlap_count(index_a: IntervalIndex, index_b: IntervalIndex) -> int:
+    """
+    Count the intervals of a set overlapping at least one interval of another set.
+    """
+    count = 0
+    for k, chrom in enumerate(index_a.chroms):
+        rows = slice(index_a.offsets[k], index_a.offsets[k + 1])
+        which, hits = index_b.overlap_chrom(chrom, index_a.starts[rows], index_a.ends[rows])
+        count += len(np.unique(which))
+    return count
+
+
+def overlap_bp(index_a: IntervalIndex, index_b: IntervalIndex) -> int:
+    """
+    Count the basepairs covered by both sets.
+    """
+    total = 0
+    for k, chrom in enumerate(index_a.chroms):
+        rows = slice(index_a.offsets[k], index_a.offsets[k + 1])
+        a_starts, a_ends = merge_sorted(index_a.starts[rows], index_a.ends[rows])
+        rows = index_b.intervals.chrom_slice(chrom)
+        b_starts, b_ends = merge_sorted(index_b.starts[rows], index_b.ends[rows])
+        if len(a_starts) == 0 or len(b_starts) == 0:
+            continue
+        # both sides are disjoint, so each overlapping pair is a piece of the intersection
+        merged = IntervalIndex(IntervalSet([chrom], [0, len(b_starts)], b_starts, b_ends))
+        which, hits = merged.overlap_chrom(chrom, a_starts, a_ends)
+        total += int(
+            (np.minimum(a_ends[which], b_ends[hits]) - np.maximum(a_starts[which], b_starts[hits])).sum()
+        )
+    return total
+
+
+def _init_worker(handle: tuple) -> None:
+    global _worker_shared
+    _worker_shared = SharedIntervals.attach(handle)
+
+
+def _pair_task(pair: tuple, as_bp: bool) -> int:
+    index_a = _worker_shared.index(pair[0])
+    index_b = _worker_shared.index(pair[1])
+    return overlap_bp(index_a, index_b) if as_bp else overlap_count(index_a, index_b)
+
+
+def pairwise_overlaps(
+    shared: SharedIntervals, pairs: list = None, as_bp: bool = False, processes: int = None
+) -> dict:
+    """
+    Compare many pairs of shared interval sets in a pool of worker processes.
+
+    Each worker attaches the shared block once, then only set names travel
+    between processes.
+
+    Parameters
+    ----------
+    shared : SharedIntervals
+      The shared interval sets
+    pairs : list
+      The (a, b) pairs of set names to compare, default is all ordered pairs
+    as_bp : bool
+      If True, count the basepairs covered by both sets instead of the intervals of a overlapping b. Default is False.
+    processes : int
+      Number of worker processes, default is the number of CPUs. 1 runs in the current process.
+
+    Returns
+    -------
+    dict
+      The count of each pair, with "a::b" keys.
+    """
+    pairs = list(pairs) if pairs is not None else list(permutations(shared.names, 2))
+    if processes == 1:
+        results = []
+        for a, b in pairs:
+            index_a, index_b = shared.index(a), shared.index(b)
+            results.append(overlap_bp(index_a, index_b) if as_bp else overlap_count(index_a, index_b))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker, initargs=(shared.handle,)
+        ) as pool:
+            results = list(pool.map(_pair_task, pairs, [as_bp] * len(pairs)))
+    return {"::".join(pair): count for pair, count in zip(pairs, results)}
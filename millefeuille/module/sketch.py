@@ -0,0 +1,309 @@
+import os
+import zipfile
+import hashlib
+import tempfile
+import numpy as np
+from collections import namedtuple
+
+from millefeuille.module.intervals import IntervalSet, merge_sorted
+from millefeuille.module.query import expand_ranges
+from millefeuille.module.streams import is_path
+
+K = 4096
+BIN_SIZE = 1000
+# two-sided 95% normal interval
+Z = 1.96
+
+Estimate = namedtuple("Estimate", ["value", "low", "high"])
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, uint64 arithmetic wraps around
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def bin_hashes(intervals: IntervalSet, bin_size: int = BIN_SIZE) -> np.ndarray:
+    """
+    Hash the genome bins covered by a set of intervals.
+
+    Parameters
+    ----------
+    intervals : IntervalSet
+      The intervals
+    bin_size : int
+      The size of the bins in bp, default is 1000
+
+    Returns
+    -------
+    np.ndarray
+      The sorted, distinct uint64 hashes of the bins overlapping at least one interval.
+    """
+    hashes = [np.empty(0, dtype=np.uint64)]
+    for chrom, starts, ends in intervals.iter_chroms():
+        starts, ends = merge_sorted(starts, ends)
+        keep = ends > starts
+        _, bins = expand_ranges(starts[keep] // bin_size, (ends[keep] - 1) // bin_size + 1)
+        # the same chromosome name gets the same seed in every file and run
+        seed = np.uint64(int.from_bytes(hashlib.sha1(chrom.encode()).digest()[:8], "little"))
+        hashes.append(_mix(_mix(bins.astype(np.uint64)) ^ seed))
+    return np.unique(np.concatenate(hashes))
+
+
+class Sketch:
+    """
+    A bottom-k sketch of the genome bins covered by a BED file.
+
+    The sketch keeps the k smallest hashes of the covered bins, and the exact
+    number of covered bins. When the file covers at most k bins, the sketch holds
+    all of them and the estimates made from it are exact.
+
+    Parameters
+    ----------
+    hashes : np.ndarray
+      The k smallest bin hashes, sorted
+    size : int
+      The number of bins covered
+    k : int
+      The maximum number of hashes kept
+    bin_size : int
+      The size of the bins in bp
+    """
+
+    def __init__(self, hashes, size: int, k: int = K, bin_size: int = BIN_SIZE):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.size = int(size)
+        self.k = int(k)
+        self.bin_size = int(bin_size)
+
+    @classmethod
+    def from_intervals(cls, intervals: IntervalSet, k: int = K, bin_size: int = BIN_SIZE) -> "Sketch":
+        """
+        Sketch a set of intervals.
+        """
+        hashes = bin_hashes(intervals, bin_size)
+        return cls(hashes[:k], len(hashes), k, bin_size)
+
+    @property
+    def complete(self) -> bool:
+        """
+        True if the sketch holds the hashes of all the covered bins.
+        """
+        return self.size <= self.k
+
+    def save(self, path: str) -> None:
+        # write to a unique temporary file then rename, so that readers and
+        # concurrent writers never see a partial sketch
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".", suffix=".tmp.npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, hashes=self.hashes, meta=np.array([self.size, self.k, self.bin_size]))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "Sketch":
+        with np.load(path) as data:
+            size, k, bin_size = data["meta"]
+            return cls(data["hashes"], size, k, bin_size)
+
+
+def sketch_path(bed: str, k: int = K, bin_size: int = BIN_SIZE) -> str:
+    """
+    Return the file caching the sketch of a BED file, next to it.
+    """
+    return str(bed) + ".k" + str(k) + ".b" + str(bin_size) + ".sketch.npz"
+
+
+def sketch(bed, k: int = K, bin_size: int = BIN_SIZE, cache: bool = True) -> Sketch:
+    """
+    Sketch a BED file, reusing the sketch cached next to it when the file did not change.
+
+    Parameters
+    ----------
+    bed
+      A BED file name, "-" for stdin, a file-like object, an iterable of lines or an IntervalSet
+    k : int
+      The number of hashes kept, the relative error of the estimates is about 1 / sqrt(k)
+    bin_size : int
+      The size of the bins in bp, default is 1000
+    cache : bool
+      If True (default), the sketch of a file name is saved next to it (see sketch_path),
+      and reused while the file is older than it. Nothing is cached if the directory is read-only
+
+    Returns
+    -------
+    Sketch
+      The sketch.
+    """
+    if isinstance(bed, IntervalSet):
+        return Sketch.from_intervals(bed, k, bin_size)
+    cached = cache and is_path(bed) and bed != "-" and os.path.isfile(bed)
+    if cached:
+        path = sketch_path(bed, k, bin_size)
+        try:
+            if os.path.getmtime(path) >= os.path.getmtime(bed):
+                return Sketch.load(path)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # missing, truncated or corrupt: sketch the file again
+            pass
+    result = Sketch.from_intervals(IntervalSet.from_bed(bed), k, bin_size)
+    if cached:
+        try:
+            result.save(path)
+        except OSError:
+            pass
+    return result
+
+
+def _wilson(count: int, n: int) -> Estimate:
+    # Wilson score interval of a binomial proportion, not empty when count is 0 or n
+    p = count / n
+    center = (p + Z**2 / (2 * n)) / (1 + Z**2 / n)
+    error = Z * np.sqrt(p * (1 - p) / n + Z**2 / (4 * n**2)) / (1 + Z**2 / n)
+    return Estimate(p, max(float(center - error), 0.0), min(float(center + error), 1.0))
+
+
+def _union_size(sketches: list, members: np.ndarray, last: int) -> Estimate:
+    n = members.shape[1]
+    # the k-th smallest of n uniform hashes is about k / n, with a relative error of 1 / sqrt(k - 2)
+    size = (n - 1) / ((float(last) + 1) / 2.0**64)
+    error = Z / np.sqrt(max(n - 2, 1))
+    estimates = [Estimate(size, size * max(1 - error, 0.0), size * (1 + error))]
+    # or from the exact size of a file and the fraction of the sampled bins it covers
+    for s, found in zip(sketches, members):
+        count = int(np.sum(found))
+        if count:
+            fraction = _wilson(count, n)
+            estimates.append(Estimate(s.size * n / count, s.size / fraction.high, s.size / fraction.low))
+    best = min(estimates, key=lambda e: (e.high - e.low) / e.value)
+    # the union covers at least the bins of each file
+    low = max([best.low] + [s.size for s in sketches])
+    return Estimate(float(max(best.value, low)), float(low), float(max(best.high, low)))
+
+
+def _sample(sketches: list) -> tuple:
+    # bottom-k of the union, with the membership of each sampled bin in each set
+    k = min(s.k for s in sketches)
+    union = np.unique(np.concatenate([s.hashes for s in sketches]))
+    exact = all(s.complete for s in sketches)
+    sample = union if exact else union[:k]
+    members = np.array([np.isin(sample, s.hashes) for s in sketches])
+    if exact:
+        size = Estimate(float(len(union)), float(len(union)), float(len(union)))
+    else:
+        size = _union_size(sketches, members, sample[-1])
+    return members, size, exact
+
+
+def _estimate(count: int, n: int, size: Estimate, exact: bool) -> Estimate:
+    # the bounds combine the binomial error of the proportion and the error of the union size
+    if n == 0:
+        return Estimate(0.0, 0.0, 0.0)
+    value = float(count / n * size.value)
+    if exact:
+        return Estimate(value, value, value)
+    p = _wilson(count, n)
+    return Estimate(value, min(p.low * size.low, value), max(p.high * size.high, value))
+
+
+def jaccard(first: Sketch, second: Sketch) -> Estimate:
+    """
+    Estimate the Jaccard index of the bins covered by two sketched files.
+
+    Returns
+    -------
+    Estimate
+      The estimate with the bounds of its 95% confidence interval, all equal when exact.
+    """
+    if first.bin_size != second.bin_size:
+        raise ValueError("the sketches must use the same bin size")
+    members, _, exact = _sample([first, second])
+    return _estimate(int(np.sum(members[0] & members[1])), members.shape[1], Estimate(1.0, 1.0, 1.0), exact)
+
+
+def approx_overlaps(
+    list_bed: list,
+    names: list = ["a", "b", "c"],
+    as_bp: bool = False,
+    k: int = K,
+    bin_size: int = BIN_SIZE,
+    exact: bool = False,
+    cache: bool = True,
+) -> dict:
+    """
+    Estimate the size of the seven partitions of three BED files from their sketches.
+
+    The partitions are measured in genome bins: a bin belongs to a file if one
+    of its intervals overlaps it. The sampled bins of the union of the three
+    files are sorted into the partitions, whose sizes are the fraction of the
+    sample they hold times the estimated size of the union. The bounds combine
+    the binomial error of the fraction and the error of the union size, which
+    is estimated from the exact size of a file when it covers most of the union.
+
+    Parameters
+    ----------
+    list_bed : list
+      A list of three BED files, streams, iterables of lines or IntervalSet
+    names : list
+      A list of names for the BED files, with the keys of overlaps.all_overlaps
+    as_bp : bool
+      If True, measure the partitions in bp (bins times bin_size) instead of bins. Default is False.
+    k : int
+      The number of hashes of each sketch
+    bin_size : int
+      The size of the bins in bp, default is 1000
+    exact : bool
+      If True, run overlaps.all_overlaps instead (intervals or bp, without sketch),
+      for the selected files that need an exact answer
+    cache : bool
+      If True (default), reuse and save the sketches next to the files, see sketch
+
+    Returns
+    -------
+    dict
+      The Estimate of the size of each partition.
+    """
+    if len(list_bed) != 3 or len(names) != 3:
+        raise ValueError("list_bed and names must be of length 3")
+    if exact:
+        from millefeuille.module.overlaps import all_overlaps
+
+        return {key: Estimate(value, value, value) for key, value in all_overlaps(list_bed, names, as_bp).items()}
+    members, size, is_exact = _sample([sketch(bed, k, bin_size, cache) for bed in list_bed])
+    scale = Estimate(*(x * (bin_size if as_bp else 1) for x in size))
+    a, b, c = range(3)
+    patterns = {}
+    for x, y, z in [(a, b, c), (a, c, b), (b, c, a)]:
+        patterns[names[z]] = members[z] & ~members[x] & ~members[y]
+    for x, y, z in [(a, b, c), (a, c, b), (b, c, a)]:
+        patterns[names[x] + "::" + names[y]] = members[x] & members[y] & ~members[z]
+    patterns["::".join(names)] = members[a] & members[b] & members[c]
+    return {
+        key: _estimate(int(np.sum(found)), members.shape[1], scale, is_exact)
+        for key, found in patterns.items()
+    }
+
+
+def jaccard_matrix(list_bed: list, names: list = None, k: int = K, bin_size: int = BIN_SIZE, cache: bool = True):
+    """
+    Estimate the Jaccard index of every pair of BED files, e.g. for the quality control of many samples.
+
+    Returns
+    -------
+    pd.DataFrame
+      The estimated Jaccard index of each pair of files, indexed by names.
+    """
+    import pandas as pd
+
+    if names is None:
+        names = [str(bed) for bed in list_bed]
+    sketches = [sketch(bed, k, bin_size, cache) for bed in list_bed]
+    values = np.eye(len(sketches))
+    for i in range(len(sketches)):
+        for j in range(i + 1, len(sketches)):
+            values[i, j] = values[j, i] = jaccard(sketches[i], sketches[j]).value
+    return pd.DataFrame(values, index=names, columns=names)
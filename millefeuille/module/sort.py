@@ -0,0 +1,216 @@
+import os
+import heapq
+import tempfile
+from functools import partial
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+from millefeuille.module.gff2bed import get_featureDict
+
+HEADER_PREFIXES = ("#", "track", "browser")
+GFF_EXTENSIONS = (".gff", ".gff3", ".gtf")
+
+
+def guess_format(file_name: str) -> str:
+    """
+    Guess the format of a coordinate file from its extension.
+
+    Parameters
+    ----------
+    file_name : str
+      Name of the BED or GFF file
+
+    Returns
+    -------
+    str
+      "gff" for .gff, .gff3 and .gtf files, "bed" otherwise.
+    """
+    if os.path.splitext(file_name)[1].lower() in GFF_EXTENSIONS:
+        return "gff"
+    return "bed"
+
+
+def sort_key(
+    line: str, file_format: str = "bed", by: str = "coord", feature_type: str = "Parent"
+) -> tuple:
+    """
+    Compute the sort key of a single BED or GFF line.
+
+    Parameters
+    ----------
+    line : str
+      A tab-delimited line of a BED or GFF file
+    file_format : str
+      Either "bed" or "gff"
+    by : str
+      Either "coord" to sort by (chrom, start, end) or "parent" to sort by parent ID first
+    feature_type : str
+      The feature type (column 9 of the GFF file) holding the parent ID, default is Parent.
+      Ignored for BED files where the name column (column 4) is used.
+
+    Returns
+    -------
+    tuple
+      The key used to order the line.
+    """
+    fields = line.rstrip("\r\n").split("\t")
+    if file_format == "gff":
+        coord = (fields[0], int(fields[3]), int(fields[4]))
+    else:
+        coord = (fields[0], int(fields[1]), int(fields[2]))
+    if by == "coord":
+        return coord
+    if file_format == "gff":
+        parent = ",".join(get_featureDict(fields[8], (feature_type,)).get(feature_type, [""]))
+    else:
+        parent = fields[3] if len(fields) > 3 else ""
+    return (parent,) + coord
+
+
+def _write_run(lines: list, key, tmpdir: str) -> str:
+    """
+    Sort a chunk of lines in memory and spill it to a temporary run file.
+
+    Parameters
+    ----------
+    lines : list
+      The lines of the chunk, each ending with a newline
+    key
+      The sort key function applied to each line
+    tmpdir : str
+      The directory where the run file is written
+
+    Returns
+    -------
+    str
+      The path of the sorted run file.
+    """
+    lines.sort(key=key)
+    fd, run = tempfile.mkstemp(suffix=".run", dir=tmpdir)
+    with os.fdopen(fd, "w") as f:
+        f.writelines(lines)
+    return run
+
+
+def _merge_runs(runs: list, key, out) -> None:
+    """
+    K-way merge of sorted run files into an open output file.
+
+    Parameters
+    ----------
+    runs : list
+      Paths of the sorted run files
+    key
+      The sort key function the runs were sorted with
+    out
+      The file object receiving the merged lines
+    """
+    handles = [open(run, "r") for run in runs]
+    try:
+        out.writelines(heapq.merge(*handles, key=key))
+    finally:
+        for h in handles:
+            h.close()
+
+
+def sort_file(
+    file_in: str,
+    file_out: str,
+    file_format: str = None,
+    by: str = "coord",
+    feature_type: str = "Parent",
+    max_lines: int = 1000000,
+    workers: int = 1,
+    fan_in: int = 64,
+    tmpdir: str = None,
+) -> None:
+    """
+    Sort a BED or GFF file with a bounded-memory external merge sort.
+
+    The input is read by chunks of max_lines lines. Each chunk is sorted and spilled
+    to a run file on local disk, then the runs are merged together with a k-way merge.
+    Header and comment lines are kept in their original order at the top of the output.
+
+    Parameters
+    ----------
+    file_in : str
+      Name of the BED or GFF file to be sorted
+    file_out : str
+      Name of the sorted output file, can be the same as file_in
+    file_format : str
+      Either "bed" or "gff", default is guessed from the extension of file_in
+    by : str
+      Either "coord" to sort by (chrom, start) or "parent" to sort by parent ID, default is coord
+    feature_type : str
+      The feature type (column 9 of the GFF file) holding the parent ID, default is Parent
+    max_lines : int
+      Number of lines held in memory per run, default is 1000000
+    workers : int
+      Number of processes sorting runs in parallel, default is 1
+    fan_in : int
+      Maximum number of runs merged at once, default is 64
+    tmpdir : str
+      The directory where runs are spilled, default is the system temporary directory
+
+    Returns
+    -------
+    None, but creates the sorted file.
+    """
+    if by not in ("coord", "parent"):
+        raise ValueError("by must be either 'coord' or 'parent'")
+    if file_format is None:
+        file_format = guess_format(file_in)
+    key = partial(sort_key, file_format=file_format, by=by, feature_type=feature_type)
+    with tempfile.TemporaryDirectory(dir=tmpdir) as rundir:
+        headers = []
+        runs = []
+
+        def chunks(f):
+            # yield chunks of data lines, setting header lines aside
+            while True:
+                chunk = []
+                read = False
+                for l in islice(f, max_lines):
+                    read = True
+                    if not l.strip():
+                        continue
+                    if not l.endswith("\n"):
+                        l += "\n"
+                    if l.startswith(HEADER_PREFIXES):
+                        headers.append(l)
+                    else:
+                        chunk.append(l)
+                if not read:
+                    return
+                # a slice of header or blank lines only gives no run
+                if chunk:
+                    yield chunk
+
+        with open(file_in, "r") as f:
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # keep at most workers chunks in flight to bound memory
+                    pending = []
+                    for chunk in chunks(f):
+                        pending.append(pool.submit(_write_run, chunk, key, rundir))
+                        if len(pending) >= workers:
+                            runs.append(pending.pop(0).result())
+                    runs.extend(p.result() for p in pending)
+            else:
+                for chunk in chunks(f):
+                    runs.append(_write_run(chunk, key, rundir))
+        # reduce the number of runs until they can be merged at once
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                fd, run = tempfile.mkstemp(suffix=".run", dir=rundir)
+                with os.fdopen(fd, "w") as out:
+                    _merge_runs(runs[i : i + fan_in], key, out)
+                merged.append(run)
+                # the merged runs are not needed anymore, free their disk space
+                for old in runs[i : i + fan_in]:
+                    os.remove(old)
+            runs = merged
+        with open(file_out, "w") as out:
+            out.writelines(headers)
+            _merge_runs(runs, key, out)
@@ -0,0 +1,127 @@
+import os
+import io
+import sys
+from contextlib import contextmanager
+
+# columnar file extensions, handled by the arrow module
+ARROW_EXTENSIONS = (".parquet", ".pq", ".arrow", ".feather", ".ipc")
+
+
+def is_path(source) -> bool:
+    """
+    Tell if a source or destination is a file name rather than a stream or iterable.
+
+    Parameters
+    ----------
+    source
+      A file name, "-", a file-like object or an iterable of lines
+    """
+    return isinstance(source, (str, os.PathLike))
+
+
+@contextmanager
+def open_lines(source):
+    """
+    Open any kind of input as an iterator of text lines.
+
+    Parameters
+    ----------
+    source
+      A file name ("-" for stdin), a text or binary file-like object, or an
+      iterable of lines (e.g. a list or the generator of another converter).
+      File-like objects are not closed. Parquet and Arrow IPC file names are
+      read as tables and their rows formatted as lines, see arrow.table_lines.
+
+    Returns
+    -------
+    A context manager yielding an iterator of lines.
+    """
+    if is_path(source):
+        if source == "-":
+            yield sys.stdin
+        elif str(source).lower().endswith(ARROW_EXTENSIONS):
+            from millefeuille.module import arrow
+
+            yield arrow.table_lines(arrow.read_table(source))
+        else:
+            with open(source, "r") as f:
+                yield f
+    elif isinstance(source, (io.RawIOBase, io.BufferedIOBase)):
+        yield (l.decode() for l in source)
+    else:
+        yield iter(source)
+
+
+@contextmanager
+def open_output(dest):
+    """
+    Open any kind of output as a writable text file object.
+
+    Parameters
+    ----------
+    dest
+      A file name ("-" for stdout) or a writable file-like object, which is not closed.
+      The lines written to a Parquet or Arrow IPC file name are stored as a table,
+      see arrow.TableWriter.
+
+    Returns
+    -------
+    A context manager yielding a file object.
+    """
+    if is_path(dest):
+        if dest == "-":
+            yield sys.stdout
+        elif str(dest).lower().endswith(ARROW_EXTENSIONS):
+            from millefeuille.module import arrow
+
+            with arrow.TableWriter(dest) as f:
+                yield f
+        else:
+            with open(dest, "w") as f:
+                yield f
+    else:
+        yield dest
+
+
+def write_lines(lines, dest) -> int:
+    """
+    Write an iterable of lines to an output.
+
+    Parameters
+    ----------
+    lines
+      An iterable of lines ending with a newline
+    dest
+      A file name ("-" for stdout) or a writable file-like object
+
+    Returns
+    -------
+    int
+      The number of lines written.
+    """
+    n = 0
+    with open_output(dest) as f:
+        for l in lines:
+            f.write(l)
+            n += 1
+    return n
+
+
+def source_name(source) -> str:
+    """
+    Return the file name of a source if it has one, None otherwise.
+    """
+    if is_path(source):
+        return None if source == "-" else str(source)
+    name = getattr(source, "name", None)
+    return name if isinstance(name, str) else None
+
+
+def stream_position(f) -> int:
+    """
+    Return the position of a file object (bytes written so far), None if it is unknown (not seekable).
+    """
+    try:
+        return f.tell()
+    except (OSError, AttributeError, io.UnsupportedOperation):
+        return None
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+from millefeuille.module import aio
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import bed2gff as b2g
+from millefeuille.module import overlaps as ov
+
+BEDS = ["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]
+
+
+def test_read_lines_by_chunks():
+    with open("./tests/sample.gff") as f:
+        expected = f.readlines()
+    assert asyncio.run(aio.read_lines("./tests/sample.gff", chunk_size=7)) == expected
+
+
+def test_read_lines_from_async_chunks():
+    async def body():
+        data = "chr1\t0\t10\tgène\nchr1\t5\t8\tx".encode()
+        for i in range(0, len(data), 3):
+            yield data[i : i + 3]
+
+    lines = asyncio.run(aio.read_lines(body()))
+    assert lines == ["chr1\t0\t10\tgène\n", "chr1\t5\t8\tx\n"]
+
+
+def test_service_conversions():
+    async def run():
+        async with aio.AsyncService(max_workers=2, executor="thread") as service:
+            return await asyncio.gather(
+                service.gff2bed("./tests/sample.gff"),
+                service.gff2bed("./tests/sample.gff", bed12=False),
+                service.bed2gff("./tests/sample1.bed"),
+            )
+
+    bed12, bed6, gff = asyncio.run(run())
+    assert bed12 == list(g2b.bed12_records("./tests/sample.gff"))
+    assert bed6 == list(g2b.bed6_records("./tests/sample.gff"))
+    assert gff == list(b2g.gff_records("./tests/sample1.bed", "millefeuille", "region"))
+
+
+def test_service_overlaps_in_processes():
+    async def run():
+        async with aio.AsyncService(max_workers=2) as service:
+            return await asyncio.gather(
+                service.all_overlaps(BEDS), service.all_overlaps(BEDS, as_bp=True)
+            )
+
+    counts, bp = asyncio.run(run())
+    assert counts == ov.all_overlaps(BEDS)
+    assert bp == ov.all_overlaps(BEDS, as_bp=True)
+
+
+def test_service_limits_concurrency():
+    running, peak = [0], [0]
+
+    async def body(i):
+        # counts the requests reading their input or waiting for its conversion
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        yield "chr1\t0\t10\tr" + str(i) + "\t0\t+\n"
+
+    def task(lines, options):
+        running[0] -= 1
+        return aio._bed2gff_task(lines, options)
+
+    async def run():
+        async with aio.AsyncService(max_workers=4, max_concurrency=2, executor="thread") as service:
+            service._run = lambda func, *args: aio.AsyncService._run(service, task, *args)
+            return await asyncio.gather(*(service.bed2gff(body(i)) for i in range(8)))
+
+    gffs = asyncio.run(run())
+    assert [gff[0].rstrip("\n").endswith("r" + str(i)) for i, gff in enumerate(gffs)] == [True] * 8
+    assert peak[0] == 2, "The inputs should be read within the concurrency limit"
+
+
+def test_service_checks_executor():
+    with pytest.raises(ValueError):
+        aio.AsyncService(executor="gpu")
@@ -0,0 +1,104 @@
+import random
+import pytest
+import numpy as np
+
+from millefeuille.module.intervals import IntervalSet
+from millefeuille.module import algebra as al
+
+
+def random_set(seed, n=200):
+    rng = random.Random(seed)
+    chroms = [rng.choice(["chr1", "chr2", "chr3"]) for i in range(n)]
+    starts = [rng.randrange(0, 5000) for i in range(n)]
+    ends = [s + rng.randint(1, 200) for s in starts]
+    strands = [rng.choice("+-") for i in range(n)]
+    return IntervalSet.from_arrays(chroms, starts, ends, [str(i) for i in range(n)], strands)
+
+
+def covered(iset):
+    # the set of (chrom, position) covered by a set of intervals
+    return {
+        (chrom, p)
+        for chrom, starts, ends in iset.iter_chroms()
+        for s, e in zip(starts, ends)
+        for p in range(s, e)
+    }
+
+
+def as_tuples(iset):
+    return [
+        (chrom, int(s), int(e)) for chrom, starts, ends in iset.iter_chroms() for s, e in zip(starts, ends)
+    ]
+
+
+def test_merge_matches_pyranges():
+    iset = random_set(1)
+    expected = iset.to_pyranges().merge(strand=False).df
+    merged = al.merge(iset)
+    assert as_tuples(merged) == list(
+        zip(expected["Chromosome"].astype(str), expected["Start"], expected["End"])
+    )
+    assert merged.names is None
+    assert len(al.merge(iset, distance=50)) < len(merged)
+
+
+def test_subtract_and_intersect():
+    a, b = random_set(2), random_set(3, n=50)
+    result = al.subtract(a, b)
+    assert covered(result) == covered(a) - covered(b)
+    # pieces keep the name of the interval they come from
+    assert set(result.names) <= set(a.names)
+    result = al.intersect(a, b)
+    assert covered(result) == covered(a) & covered(b)
+    expected = a.to_pyranges().intersect(b.to_pyranges(), strandedness=False)
+    assert len(result) == len(expected)
+
+
+def test_complement():
+    iset = IntervalSet.from_bed("./tests/sample2.bed")
+    result = al.complement(iset, {"chr1": 200, "chr2": 50})
+    assert as_tuples(result) == [
+        ("chr1", 0, 10),
+        ("chr1", 35, 70),
+        ("chr1", 90, 100),
+        ("chr1", 120, 150),
+        ("chr1", 160, 200),
+        ("chr2", 0, 50),
+    ]
+    assert al.read_chrom_sizes(["chr1\t200\n", "chr2\t50\n"]) == {"chr1": 200, "chr2": 50}
+
+
+def test_slop_and_window():
+    iset = IntervalSet.from_bed("./tests/sample1.bed")
+    result = al.slop(iset, 30, 10, chrom_sizes={"chr1": 185})
+    assert as_tuples(result) == [("chr1", 0, 50), ("chr1", 30, 120), ("chr1", 140, 185)]
+    assert list(result.names) == ["peak_1", "peak_2", "peak_3"]
+    minus = IntervalSet.from_arrays(["chr1"], [100], [110], ["x"], ["-"])
+    assert as_tuples(al.slop(minus, 30, 10, stranded=True)) == [("chr1", 90, 140)]
+    with pytest.raises(ValueError):
+        al.IntervalChain(iset).merge().slop(10, stranded=True)
+    other = IntervalSet.from_arrays(["chr1"], [130], [140])
+    assert list(al.window(iset, other, 21).names) == ["peak_2"]
+    assert list(al.window(iset, other, 40).names) == ["peak_2", "peak_3"]
+
+
+def test_cluster():
+    iset = random_set(4)
+    clusters = al.cluster(iset)
+    merged = al.merge(iset)
+    assert clusters.max() == len(merged)
+    chroms = iset.chrom_column()
+    for i in range(1, len(iset)):
+        same = chroms[i] == chroms[i - 1] and iset.starts[i] <= iset.ends[: i][chroms[: i] == chroms[i]].max()
+        assert (clusters[i] == clusters[i - 1]) == same
+
+
+def test_lazy_chain():
+    a, b = random_set(5), random_set(6, n=50)
+    sizes = {"chr1": 6000, "chr2": 6000, "chr3": 6000, "chr4": 100}
+    chain = al.IntervalChain(a).slop(20, chrom_sizes=sizes).subtract(b).merge().complement(sizes)
+    assert repr(chain) == "IntervalChain(source -> slop -> subtract -> merge -> complement)"
+    result = chain.collect()
+    step = al.complement(al.merge(al.subtract(al.slop(a, 20, chrom_sizes=sizes), b)), sizes)
+    assert as_tuples(result) == as_tuples(step)
+    assert result.chroms[-1] == "chr4"
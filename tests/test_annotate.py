@@ -0,0 +1,60 @@
+import random
+import pytest
+
+from millefeuille.module import annotate as an
+
+PEAKS = ["chr2L\t1100\t1150\tp1\t0\t+\n", "chr2L\t2250\t4900\tp2\t0\t+\n", "chr2L\t2000\t2010\tp3\t0\t+\n"]
+
+
+def test_annotate_gtf():
+    df = an.annotate("./tests/sample.gtf", [PEAKS, ["chr2L\t8300\t9100\n"]], ["peaks", "other"], feature_type="transcript_id")
+    assert list(df.columns) == ["Chromosome", "Start", "End", "Name", "Strand", "BlockBp", "Mask", "peaks", "other"]
+    assert list(df.Name) == ["T1.1", "T1.2", "T2.1"]
+    assert list(df.BlockBp) == [703, 402, 902]
+    assert list(df.peaks) == [211, 100, 0]
+    assert list(df.other) == [0, 0, 201]
+    assert [an.mask_sets(m, ["peaks", "other"]) for m in df.Mask] == [["peaks"], ["peaks"], ["other"]]
+    # GTF exons have no Parent, they are grouped by transcript_id by default
+    assert an.annotate("./tests/sample.gtf", [PEAKS, ["chr2L\t8300\t9100\n"]], ["peaks", "other"]).equals(df)
+
+
+def brute_force(transcripts, beds):
+    result = []
+    for chrom, blocks in transcripts:
+        covered = set().union(*[range(s, e) for s, e in blocks])
+        result.append([len(covered & set().union(*[range(s, e) for c, s, e in bed if c == chrom])) for bed in beds])
+    return result
+
+
+def test_bed12_matches_brute_force():
+    rng = random.Random(1)
+    transcripts, lines = [], []
+    for i in range(40):
+        chrom = rng.choice(["chr1", "chr2"])
+        # overlapping blocks are counted once
+        blocks = sorted((s, s + rng.randint(1, 80)) for s in rng.sample(range(0, 1500), rng.randint(1, 5)))
+        start, end = blocks[0][0], max(e for s, e in blocks)
+        transcripts.append((chrom, blocks))
+        lines.append("\t".join([
+            chrom, str(start), str(end), "t" + str(i), "0", "+", str(start), str(end), "0", str(len(blocks)),
+            ",".join(str(e - s) for s, e in blocks), ",".join(str(s - start) for s, e in blocks),
+        ]) + "\n")
+    beds = []
+    for k in range(3):
+        bed = []
+        for j in range(30):
+            start = rng.randrange(0, 1600)
+            bed.append((rng.choice(["chr1", "chr2", "chr3"]), start, start + rng.randint(1, 60)))
+        beds.append(bed)
+    df = an.annotate(lines, [[c + "\t" + str(s) + "\t" + str(e) + "\n" for c, s, e in bed] for bed in beds])
+    expected = brute_force(transcripts, beds)
+    assert df[["set1", "set2", "set3"]].values.tolist() == expected
+    assert list(df.Mask) == [sum(1 << k for k, bp in enumerate(row) if bp) for row in expected]
+    assert list(df.BlockBp) == [len(set().union(*[range(s, e) for s, e in blocks])) for c, blocks in transcripts]
+
+
+def test_annotate_errors():
+    with pytest.raises(ValueError):
+        an.annotate("./tests/sample.gtf", [PEAKS], ["a", "b"])
+    with pytest.raises(ValueError):
+        an.annotate("./tests/sample.gtf", [PEAKS] * 65)
@@ -0,0 +1,78 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from millefeuille.module import arrow
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import bed2gff as b2g
+from millefeuille.module import overlaps as ov
+from millefeuille.module import profiling as prof
+
+BEDS = ["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]
+
+
+def read(path):
+    with open(path) as f:
+        return f.readlines()
+
+
+def test_bed12_round_trip(tmp_path):
+    lines = ["chr1\t10\t100\ttx\t0\t+\t10\t100\t0\t2\t20,30,\t0,60,\n"]
+    table = arrow.lines_table(lines)
+    assert table.column("BlockSizes").type == pa.list_(pa.int64())
+    assert table.column("BlockStarts").to_pylist() == [[0, 60]]
+    assert table.column("Start").type == pa.int64()
+    for name in ["tx.parquet", "tx.arrow"]:
+        arrow.write_table(table, str(tmp_path / name))
+        assert list(arrow.table_lines(arrow.read_table(str(tmp_path / name)))) == [
+            "chr1\t10\t100\ttx\t0\t+\t10\t100\t0\t2\t20,30\t0,60\n"
+        ]
+
+
+def test_gff_table():
+    table = arrow.lines_table("./tests/sample.gff")
+    assert table.schema.names == arrow.GFF_COLUMNS
+    assert list(arrow.table_lines(table)) == read("./tests/sample.gff")
+
+
+def test_predicate_pushdown(tmp_path):
+    lines = [
+        chrom + "\t" + str(i * 100) + "\t" + str(i * 100 + 50) + "\tr" + str(i) + "\t0\t+\n"
+        for chrom in ["chr2", "chr1"]
+        for i in range(1000)
+    ]
+    path = str(tmp_path / "regions.parquet")
+    assert arrow.convert(lines, path) == 2000
+    arrow.write_table(arrow.lines_table(lines), path, row_group_size=100)
+    assert pa.parquet.ParquetFile(path).metadata.num_row_groups == 20
+    table = arrow.read_table(path, chroms=["chr2"], start=1020, end=1210)
+    assert table.column("Name").to_pylist() == ["r10", "r11", "r12"]
+    ipc = str(tmp_path / "regions.arrow")
+    arrow.convert(lines, ipc)
+    assert arrow.read_table(ipc, chroms=["chr2"], start=1020, end=1210).equals(table)
+
+
+def test_converters_and_overlaps(tmp_path):
+    # gff2bed writes a Parquet file, read back by bed2gff and load_beds
+    bed12 = str(tmp_path / "sample.bed12.parquet")
+    profiler = prof.Profiler()
+    g2b.bed12_generator("sample", "./tests/sample.gff", output=bed12, profiler=profiler)
+    # the size of a table file is unknown while it is written, no byte count is reported
+    assert profiler.stages[-1]["records"] == 5 and "bytes" not in profiler.stages[-1]
+    assert list(arrow.table_lines(arrow.read_table(bed12))) == list(
+        g2b.bed12_records("./tests/sample.gff")
+    )
+    gff = str(tmp_path / "sample1.gff.arrow")
+    b2g.bed2gff("./tests/sample1.bed", "millefeuille", "region", False, True, output=gff)
+    assert list(arrow.table_lines(arrow.read_table(gff))) == list(
+        b2g.gff_records("./tests/sample1.bed", "millefeuille", "region")
+    )
+    assert list(b2g.gff_records(bed12, "millefeuille", "exon", is_bed12=True)) == list(
+        b2g.gff_records(list(g2b.bed12_records("./tests/sample.gff")), "millefeuille", "exon", is_bed12=True)
+    )
+    beds = []
+    for bed in BEDS:
+        beds.append(str(tmp_path / (bed.split("/")[-1] + ".parquet")))
+        arrow.convert(bed, beds[-1])
+    assert ov.all_overlaps(beds) == ov.all_overlaps(BEDS)
+    assert ov.all_overlaps(beds, as_bp=True) == ov.all_overlaps(BEDS, as_bp=True)
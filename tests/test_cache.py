@@ -0,0 +1,56 @@
+import io
+import os
+import time
+
+from millefeuille.module import cache as ch
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import bed2gff as b2g
+
+
+def test_cached_conversions(tmp_path):
+    cache = ch.ConversionCache(str(tmp_path / "cache"))
+    expected = "".join(g2b.bed12_records("./tests/sample.gff"))
+    out = str(tmp_path / "out.bed12")
+    assert not ch.cached_gff2bed("./tests/sample.gff", out, cache=cache)
+    assert open(out).read() == expected
+    os.remove(out)
+    assert ch.cached_gff2bed("./tests/sample.gff", out, cache=cache)
+    assert open(out).read() == expected
+    # other options, other entry
+    assert not ch.cached_gff2bed("./tests/sample.gff", out, bed12=False, cache=cache)
+    assert open(out).read() == "".join(g2b.bed6_records("./tests/sample.gff"))
+    assert len(cache.entries()) == 2
+    # the key is the content, not the file name
+    with open("./tests/sample1.bed") as f:
+        lines = f.readlines()
+    copy = tmp_path / "copy.bed"
+    copy.write_text("".join(lines))
+    stream = io.StringIO()
+    assert not ch.cached_bed2gff("./tests/sample1.bed", stream, cache=cache)
+    assert stream.getvalue() == "".join(b2g.gff_records("./tests/sample1.bed", "millefeuille", "region"))
+    assert ch.cached_bed2gff(str(copy), str(tmp_path / "copy.gff"), cache=cache)
+    assert ch.cached_bed2gff(lines, str(tmp_path / "lines.gff"), cache=cache)
+    assert (tmp_path / "lines.gff").read_text() == stream.getvalue()
+
+
+def test_lru_eviction_and_links(tmp_path):
+    cache = ch.ConversionCache(str(tmp_path / "cache"), link=True)
+    out = str(tmp_path / "out.gff")
+    ch.cached_bed2gff("./tests/sample1.bed", out, cache=cache)
+    assert os.path.samefile(out, cache.entries()[0][2])
+    for mol_type in ["peak", "site"]:
+        # distinct modification times
+        time.sleep(0.01)
+        ch.cached_bed2gff("./tests/sample1.bed", out, mol_type=mol_type, cache=cache)
+    # the output linked to the first entry was replaced, not overwritten
+    assert open(cache.entries()[0][2]).read() == "".join(b2g.gff_records("./tests/sample1.bed", "millefeuille", "region"))
+    sizes = [size for _, size, _ in cache.entries()]
+    assert len(sizes) == 3
+    # the first entry was used least recently
+    oldest = cache.entries()[0][2]
+    cache.max_bytes = sum(sizes) - 1
+    assert cache.evict() == 1
+    assert oldest not in [path for _, _, path in cache.entries()]
+    assert not [name for name in os.listdir(cache.directory) if name.endswith(".tmp")]
+    cache.clear()
+    assert cache.entries() == []
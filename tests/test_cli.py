@@ -0,0 +1,65 @@
+import os
+import sys
+import pytest
+import shutil
+
+from millefeuille.module import cli
+
+
+def test_read_manifest(tmpdir):
+    manifest = tmpdir.join("manifest.txt")
+    manifest.write("# comment\na.bed\tb.bed\tc.bed\n\nd.bed e.bed f.bed\n")
+    result = cli.read_manifest(str(manifest))
+    assert result == [["a.bed", "b.bed", "c.bed"], ["d.bed", "e.bed", "f.bed"]]
+
+
+def test_gff2bed_batch(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    with tmpdir.as_cwd() as old_dir:
+        shutil.copy(file_gff, "first.gff")
+        shutil.copy(file_gff, "second.gff")
+        with open("manifest.txt", "w") as f:
+            f.write("second.gff\n")
+        assert cli.main(["gff2bed", "first.gff", "-m", "manifest.txt", "-j", "2", "-o", "out"]) == 0
+        for name in ["first", "second"]:
+            assert os.path.exists(os.path.join("out", name + ".bed6"))
+            assert os.path.exists(os.path.join("out", name + ".bed12"))
+
+
+def test_gff2bed_stdout(capsys):
+    assert cli.main(["gff2bed", "./tests/sample.gff", "--format", "bed12", "--stdout"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 5, "Expected the 5 BED12 records on stdout"
+    assert all(len(l.split("\t")) == 12 for l in lines)
+
+
+def test_bed2gff_stdout(capsys):
+    files = ["./tests/sample1.bed", "./tests/sample1.bed12"]
+    assert cli.main(["bed2gff"] + files + ["--stdout", "-j", "2"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split("\t")[8] == "feature_id=peak_1"
+    assert len(lines) == 6, "Expected the 3 GFF records of each input on stdout"
+    assert not os.path.exists("./tests/sample1.gff"), "No file should be written next to the inputs"
+
+
+def test_overlaps_batch(capsys):
+    files = ["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]
+    assert cli.main(["overlaps"] + files + files) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3, "Expected a header and one line per group of three files"
+    header = lines[0].split("\t")
+    counts = dict(zip(header, lines[1].split("\t")))
+    assert counts["a::b::c"] == "2"
+    assert lines[1] == lines[2]
+
+
+def test_overlaps_wrong_group():
+    with pytest.raises(SystemExit):
+        cli.main(["overlaps", "./tests/sample1.bed"])
+
+
+def test_bed2gff_outdir(tmpdir):
+    file_bed = os.path.abspath("./tests/sample1.bed")
+    with tmpdir.as_cwd() as old_dir:
+        assert cli.main(["bed2gff", file_bed, "-o", "out"]) == 0
+        assert os.path.exists(os.path.join("out", "sample1.gff"))
@@ -99,3 +99,46 @@ def test_bed12_generator(tmpdir) :
           assert columns[2].isdigit(), f"BED file {bed_file} does not have the correct format."
           assert columns[3].isascii(), f"BED file {bed_file} does not have the correct format."
           assert columns[5] in ['+', '-'], f"BED file {bed_file} does not have the correct format."
+
+def test_gff2bed(tmpdir) :
+  file_gff = os.path.abspath("./tests/sample.gff")
+  with tmpdir.as_cwd() as old_dir:
+      g2b.gff2bed(gff_file = file_gff, name = "sample")
+      assert os.path.exists("sample.bed6"), "BED6 file was not created."
+      assert os.path.exists("sample.bed12"), "BED12 file was not created."
+      g2b.gff2bed(gff_file = file_gff, name = "nobed6", no_bed6 = True)
+      assert not os.path.exists("nobed6.bed6"), "BED6 file should not be created with no_bed6."
+      assert os.path.exists("nobed6.bed12"), "BED12 file was not created."
+
+def test_get_featureDict_gtf():
+  gtf_entry = 'gene_id "G2"; transcript_id "T2.1"; gene_name "beta; antisense"; tag "basic"; tag "CCDS"; exon_number 2;'
+  expected_output = {'gene_id': ['G2'], 'transcript_id': ['T2.1'], 'gene_name': ['beta; antisense'], 'tag': ['basic', 'CCDS'], 'exon_number': ['2']}
+  assert g2b.get_featureDict(gtf_entry) == expected_output
+  assert g2b.get_featureDict(gtf_entry, ("transcript_id",)) == {'transcript_id': ['T2.1']}
+  assert g2b.get_featureDict("Name=x;Parent=a,b", ("transcript_id",)) == {}
+
+def test_bed12_from_gtf():
+  lines = list(g2b.bed12_records("./tests/sample.gtf", feature_type = "transcript_id", id_as_features = False))
+  assert lines == [
+    "chr2L\t999\t5000\tT1.1\t0\t+\t999\t5000\t0\t3\t200,300,200\t0,1000,3800\n",
+    "chr2L\t999\t2300\tT1.2\t0\t+\t999\t2300\t0\t2\t200,200\t0,1100\n",
+    "chr2L\t7999\t9500\tT2.1\t0\t-\t7999\t9500\t0\t2\t400,500\t0,1000\n",
+  ]
+  # without Name attribute, the features are kept as they are
+  named = list(g2b.bed12_records("./tests/sample.gtf", feature_type = "transcript_id"))
+  assert named[1].split("\t")[3] == "gene_id=G1;transcript_id=T1.2;exon_number=1;exon_id=E1;Parent=T1.2"
+  assert g2b.get_Dictgff("./tests/sample.gtf", feature_type = "transcript_id", workers = 2) == g2b.get_Dictgff("./tests/sample.gtf", feature_type = "transcript_id")
+
+def test_collapse_bed12():
+  lines = list(g2b.bed12_records("./tests/sample.gff", collapse = True, id_as_features = False))
+  assert lines == ["chr2L\t337015\t337198\tFBtr0078049,FBtr0078050,FBtr0078047,FBtr0078048,FBtr0330674\t0\t+\t337015\t337198\t0\t1\t182\t0\n"]
+  # structures beyond max_keys spill to disk, and are collapsed the same way
+  records = []
+  for i in range(200):
+    start = 1000 * (i % 37)
+    records.append(("t" + str(i), "chr1\t" + str(start) + "\t" + str(start + 500) + "\tx;Parent=t" + str(i) + "\t0\t+\t0\t0\t0\t2\t10,20\t0,480\n"))
+  expected = sorted(g2b.collapse_bed12(records))
+  assert len(expected) == 37
+  assert sorted(g2b.collapse_bed12(records, max_keys = 5)) == expected
+  assert sorted(g2b.collapse_bed12(records, max_keys = 1)) == expected
+  assert "x;Parent=t0,t37,t74,t111,t148,t185\t" in expected[0]
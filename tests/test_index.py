@@ -0,0 +1,67 @@
+import io
+import os
+import sys
+import pytest
+import shutil
+
+from millefeuille.module import index as idx
+from millefeuille.module import gff2bed as g2b
+
+
+def test_build_index(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    with idx.build_index(file_gff, str(tmpdir.join("sample.mfi"))) as index:
+        assert len(index) == 5, "Expected the 5 Parent IDs of exons"
+        assert "FBtr0078049" in index
+        assert "FBtr0306591" not in index, "CDS lines should not be indexed"
+        assert list(index.lookup(["FBtr0078050", "missing"]))[1] == -1
+        assert not index.is_stale()
+        index.exons("FBtr0078049")
+    assert index._gff is None, "The GFF file should be closed when leaving the context"
+
+
+def test_rebuild_index(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    path = str(tmpdir.join("sample.mfi"))
+    with idx.build_index(file_gff, path) as index:
+        keys = index.keys
+        # a rebuild replaces the files instead of rewriting them, the old mapping stays valid
+        with idx.build_index(file_gff, path, feature_type="gene_id") as rebuilt:
+            assert list(keys) == list(index.keys) and len(rebuilt) != len(index)
+        assert os.listdir(str(tmpdir)) == ["sample.mfi"], "No temporary directory should be left"
+        with idx.TranscriptIndex(path) as reopened:
+            assert reopened.meta["feature_type"] == "gene_id"
+
+
+def test_index_exons(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    expected = g2b.get_Dictgff(file_gff)
+    with idx.build_index(file_gff, str(tmpdir.join("sample.mfi"))) as index:
+        assert index.exons("FBtr0078049") == expected["FBtr0078049"]
+        assert index.exons("missing") == []
+
+
+def test_index_bed_extraction(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    ids = ["FBtr0330674", "FBtr0078047", "missing"]
+    myDict = g2b.get_Dictgff(file_gff)
+    expected = [g2b.bed12_line(t, myDict[t]) for t in ids[:2]]
+    with idx.build_index(file_gff, str(tmpdir.join("sample.mfi"))) as index:
+        assert index.bed12(ids) == expected
+        assert index.bed12(ids, id_as_features=False)[0].split("\t")[3] == "FBtr0330674"
+        assert len(index.bed6(ids[:2])) == 2
+
+
+def test_extract_bed(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    with tmpdir.as_cwd() as old_dir:
+        shutil.copy(file_gff, "sample.gff")
+        out = io.StringIO()
+        assert idx.extract_bed("sample.gff", ["FBtr0078048"], out) == 1
+        assert os.path.exists("sample.gff.mfi"), "The index should be built next to the GFF file"
+        # the GFF changes, the index is rebuilt
+        with open("sample.gff", "a") as f:
+            f.write("chr2L\tFlyBase\texon\t338000\t338100\t.\t+\t.\tgene_id=FBgn0004611;parent_type=mRNA;Name=Plc21C:10;Parent=FBtrNEW\n")
+        out = io.StringIO()
+        assert idx.extract_bed("sample.gff", ["FBtrNEW"], out, bed12=False) == 1
+        assert out.getvalue().startswith("chr2L\t337999\t338100\t")
@@ -144,3 +144,31 @@ def test_all_overlaps():
         "b::c": 1,
         "a::b::c": 2,
     }, "Expect correct detection of overlaps"
+
+
+def test_all_overlaps_incremental(tmp_path):
+    from millefeuille.module.profiling import Profiler
+
+    file_beds = []
+    for i, bed in enumerate(["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]):
+        with open(bed) as f:
+            lines = f.read()
+        file_beds.append(str(tmp_path / ("set" + str(i) + ".bed")))
+        with open(file_beds[-1], "w") as f:
+            f.write(lines + lines.replace("chr1", "chr2"))
+    cache = str(tmp_path / "overlaps.json")
+    for as_bp in [False, True]:
+        expected = ov.all_overlaps(file_beds, ["x", "y", "z"], as_bp=as_bp)
+        assert list(expected) == ["z", "y", "x", "x::y", "x::z", "y::z", "x::y::z"]
+        assert ov.all_overlaps(file_beds, ["x", "y", "z"], as_bp, cache=cache) == expected
+        profiler = Profiler()
+        assert ov.all_overlaps(file_beds, ["x", "y", "z"], as_bp, profiler, cache) == expected
+        assert profiler.stages[1]["changed"] == 0
+    # change chr2 of the third file only
+    with open(file_beds[2], "a") as f:
+        f.write("chr2\t100\t200\tpeak_3\n")
+    for as_bp in [False, True]:
+        profiler = Profiler()
+        result = ov.all_overlaps(file_beds, ["x", "y", "z"], as_bp, profiler, cache)
+        assert profiler.stages[1]["changed"] == 1
+        assert result == ov.all_overlaps(file_beds, ["x", "y", "z"], as_bp=as_bp)
@@ -0,0 +1,64 @@
+import pytest
+
+from millefeuille.module import parser
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import bed2gff as b2g
+
+
+def big_gff(path):
+    # the sample GFF repeated on several chromosomes with other transcripts, with comment lines inside
+    with open("./tests/sample.gff") as f:
+        lines = f.readlines()
+    with open(path, "w") as f:
+        for i in range(20):
+            f.write("# chromosome " + str(i) + "\n")
+            f.writelines(l.replace("chr2L", "chr" + str(i)).replace("FBtr", "t" + str(i) + "_") for l in lines)
+    return str(path)
+
+
+def test_chunk_ranges(tmp_path):
+    path = big_gff(tmp_path / "big.gff")
+    ranges = parser.chunk_ranges(path, 7, min_chunk=100)
+    assert len(ranges) == 7
+    assert ranges[0][0] == 0 and ranges[-1][1] == (tmp_path / "big.gff").stat().st_size
+    with open(path, "rb") as f:
+        data = f.read()
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start and data[end - 1 : end] == b"\n"
+    # small files are not split
+    assert parser.chunk_ranges(path, 7) == [(0, len(data))]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_readers_match_serial(tmp_path, executor):
+    path = big_gff(tmp_path / "big.gff")
+    columns = parser.parse_file(
+        path, "gff", 4, executor, min_chunk=1000, mol_type="exon", feature_type="Parent"
+    )
+    assert columns["start"].dtype == "int64" and len(columns["start"]) == 20
+    expected = g2b.get_Dictgff(path)
+    result = g2b._dict_from_columns(columns)
+    assert result == expected and list(result) == list(expected)
+    bed = str(tmp_path / "big.bed")
+    with open(bed, "w") as f:
+        f.writelines(g2b.bed6_records(path))
+    columns = parser.parse_file(bed, "bed", 4, executor, min_chunk=1000)
+    assert list(columns) == parser.BED_FIELDS
+    assert b2g.get_Dictbed(bed, workers=4) == b2g.get_Dictbed(bed)
+
+
+def test_serial_fallback():
+    assert not parser.splittable("-")
+    assert not parser.splittable(["chr1\t0\t10\n"])
+    assert g2b.get_Dictgff("./tests/sample.gff", workers=4) == g2b.get_Dictgff("./tests/sample.gff")
+    with open("./tests/sample1.bed") as f:
+        assert b2g.get_Dictbed(f, workers=4) == b2g.get_Dictbed("./tests/sample1.bed")
+
+
+def test_empty_files(tmp_path):
+    empty = tmp_path / "empty.gff"
+    empty.write_text("")
+    assert g2b.get_Dictgff(str(empty), workers=4) == g2b.get_Dictgff(str(empty)) == {}
+    assert b2g.get_Dictbed(str(empty), workers=4) == b2g.get_Dictbed(str(empty))
+    columns = parser.parse_file(str(empty), "bed", 4)
+    assert list(columns) == parser.BED_FIELDS and columns["start"].dtype == "int64"
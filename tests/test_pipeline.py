@@ -0,0 +1,85 @@
+import io
+import random
+import pytest
+
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import overlaps as ov
+from millefeuille.module.intervals import IntervalSet
+from millefeuille.module.pipeline import Pipeline
+
+
+def random_bed(path, seed, n=60, stranded=True):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        start = rng.randrange(0, 3000)
+        strand = rng.choice("+-") if stranded else "."
+        lines.append((rng.choice(["chr1", "chr2"]), start, start + rng.randint(1, 300), strand))
+    with open(path, "w") as f:
+        for i, (chrom, start, end, strand) in enumerate(sorted(lines)):
+            f.write("\t".join([chrom, str(start), str(end), "r" + str(i), "0", strand]) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("stranded", [[True, True, True], [True, False, True], [False, False, False]])
+def test_count_matches_all_overlaps(tmp_path, stranded):
+    beds = [random_bed(tmp_path / (str(i) + ".bed"), i, stranded=st) for i, st in enumerate(stranded)]
+    for as_bp in [False, True]:
+        expected = ov.all_overlaps(beds, ["x", "y", "z"], as_bp=as_bp)
+        result = Pipeline.read_bed(beds[0]).count(beds[1:], ["x", "y", "z"], as_bp=as_bp)
+        assert list(result) == list(expected)
+        assert result == expected
+
+
+def test_gff_pipeline():
+    pipeline = (
+        Pipeline.read_gff("./tests/sample.gff")
+        .filter(mol_type="exon")
+        .project("Parent")
+        .transcripts()
+        .intersect(IntervalSet.from_arrays(["chr2L"], [337100], [337500]))
+    )
+    assert pipeline.explain() == (
+        "scan gff [mol_type in exon, project Parent] -> per chromosome [transcripts -> intersect]"
+    )
+    result = pipeline.collect()
+    assert result.chroms == ["chr2L"]
+    assert (result.starts[0], result.ends[0]) == (337100, 337198)
+    assert set(result.names) == {"FBtr0078047", "FBtr0078048", "FBtr0078049", "FBtr0078050", "FBtr0330674"}
+    # same partitions as writing the BED12 file and reading it back
+    beds = [list(g2b.bed12_records("./tests/sample.gff")), "./tests/sample1.bed", "./tests/sample2.bed"]
+    transcripts = Pipeline.read_gff("./tests/sample.gff").filter(mol_type="exon").project().transcripts()
+    assert transcripts.count(beds[1:]) == ov.all_overlaps(beds)
+
+
+def test_other_sets_read_at_run_time():
+    other = io.StringIO("chr2L\t337100\t337500\n")
+    pipeline = Pipeline.read_gff("./tests/sample.gff").filter(mol_type="exon").project().transcripts()
+    pipeline = pipeline.intersect(other).subtract(["chr2L\t337150\t337160\n"]).window(["chr2L\t337000\t337100\n"], 10)
+    assert other.tell() == 0, "Building the plan should not read the other sets"
+    result = pipeline.collect()
+    assert other.tell() > 0
+    assert set(zip(result.starts, result.ends)) == {(337100, 337150)}
+    # the other sets are read once, and the plan can run again
+    assert list(pipeline.collect().starts) == list(result.starts)
+
+
+def test_grouped_input(tmp_path):
+    lines = ["chr1\t0\t10\ta\t0\t+\n", "chr2\t5\t20\tb\t0\t-\n", "chr1\t30\t40\tc\t0\t+\n"]
+    with pytest.raises(ValueError):
+        list(Pipeline.read_bed(lines, grouped=True).iter_chroms())
+    result = Pipeline.read_bed(lines).filter(chroms=["chr1"]).merge(distance=20).collect()
+    assert list(result.starts) == [0] and list(result.ends) == [40]
+    output = tmp_path / "out.bed"
+    n = Pipeline.read_bed(sorted(lines), grouped=True).filter(predicate=lambda l: l[5] == "+").write_bed(
+        str(output)
+    )
+    assert n == 2
+    assert output.read_text() == "chr1\t0\t10\ta\t0\t+\nchr1\t30\t40\tc\t0\t+\n"
+
+
+def test_stage_order():
+    with pytest.raises(ValueError):
+        Pipeline.read_gff("./tests/sample.gff").merge().filter(mol_type="exon")
+    with pytest.raises(ValueError):
+        Pipeline.read_bed("./tests/sample1.bed").project()
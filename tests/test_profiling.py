@@ -0,0 +1,78 @@
+import os
+import sys
+import pytest
+import shutil
+import logging
+
+from millefeuille.module import profiling as prof
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import bed2gff as b2g
+from millefeuille.module import overlaps as ov
+
+
+def test_profiler_stage():
+    records = []
+    profiler = prof.Profiler(callback=records.append, trace_memory=True)
+    with profiler.stage("build") as stats:
+        data = [i for i in range(10000)]
+        stats["records"] = len(data)
+    assert len(records) == 1, "Callback should be called once per stage"
+    assert records[0]["stage"] == "build"
+    assert records[0]["records"] == 10000
+    assert records[0]["wall_seconds"] >= 0
+    assert records[0]["cpu_seconds"] >= 0
+    assert records[0]["peak_mb"] > 0
+    summary = profiler.summary()
+    assert summary["total"]["records"] == 10000
+    assert summary["stages"] == records
+
+
+def test_profile_stage_disabled():
+    with prof.profile_stage(None, "noop") as stats:
+        stats["records"] = 1
+
+
+def test_profiler_logger(caplog):
+    profiler = prof.Profiler(logger=logging.getLogger("millefeuille"))
+    with caplog.at_level(logging.INFO, logger="millefeuille"):
+        with profiler.stage("log") as stats:
+            stats["bytes"] = 12
+    assert "log" in caplog.text and "bytes=12" in caplog.text
+
+
+def test_bed12_generator_profiled(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    profiler = prof.Profiler()
+    with tmpdir.as_cwd() as old_dir:
+        g2b.bed12_generator(file_gff = file_gff, bedname = "sample", profiler = profiler)
+    stages = [s["stage"] for s in profiler.stages]
+    assert stages == ["gff2bed.parse", "gff2bed.check", "gff2bed.blocks", "gff2bed.write"]
+    assert profiler.stages[0]["bytes"] == os.path.getsize(file_gff)
+    assert profiler.stages[0]["records"] == 5
+    assert profiler.stages[-1]["records"] == 5
+    assert profiler.stages[-1]["bytes"] == os.path.getsize(str(tmpdir.join("sample.bed12")))
+    assert all(s["wall_seconds"] >= 0 and s["cpu_seconds"] >= 0 for s in profiler.stages)
+
+
+def test_bed2gff_profiled(tmpdir):
+    file_bed = os.path.abspath("./tests/sample1.bed")
+    profiler = prof.Profiler()
+    with tmpdir.as_cwd() as old_dir:
+        shutil.copy(file_bed, os.path.join(os.getcwd(), "sample1.bed"))
+        b2g.bed2gff("sample1.bed", "test_source", "test_mol_type", False, True, profiler = profiler)
+    assert [s["stage"] for s in profiler.stages] == ["bed2gff.parse", "bed2gff.write"]
+    assert profiler.stages[1]["records"] == 3
+
+
+def test_all_overlaps_profiled():
+    file_beds = ["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]
+    profiler = prof.Profiler()
+    result = ov.all_overlaps(file_beds, profiler = profiler)
+    assert result["a::b::c"] == 2
+    assert [s["stage"] for s in profiler.stages] == [
+        "overlaps.load",
+        "overlaps.single",
+        "overlaps.double",
+        "overlaps.triple",
+        "overlaps.count",
+    ]
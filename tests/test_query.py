@@ -0,0 +1,92 @@
+import os
+import sys
+import pickle
+import random
+import pytest
+import numpy as np
+
+from millefeuille.module.intervals import IntervalSet
+from millefeuille.module import query as qr
+
+
+def random_set(seed, n=300):
+    rng = random.Random(seed)
+    chroms = [rng.choice(["chr1", "chr2"]) for i in range(n)]
+    starts = [rng.randrange(0, 10000) for i in range(n)]
+    ends = [s + rng.randint(1, 500) for s in starts]
+    return IntervalSet.from_arrays(chroms, starts, ends, names=[str(i) for i in range(n)])
+
+
+def brute_overlap(iset, chrom, start, end):
+    rows = iset.chrom_slice(chrom)
+    return [i for i in range(rows.start, rows.stop) if iset.starts[i] < end and iset.ends[i] > start]
+
+
+def test_interval_set_from_bed():
+    iset = IntervalSet.from_bed("./tests/sample2.bed")
+    assert len(iset) == 4
+    assert iset.chroms == ["chr1"]
+    assert list(iset.starts) == [10, 70, 100, 150]
+    assert list(iset.names) == ["peak_1", "peak_2", "peak_3", "peak_4"]
+
+
+def test_interval_set_from_gff():
+    iset = IntervalSet.from_gff("./tests/sample.gff", mol_type="exon", feature_type="Parent")
+    assert len(iset) == 1
+    assert (iset.starts[0], iset.ends[0]) == (337015, 337198)
+
+
+def test_overlap_matches_brute_force():
+    iset = random_set(1)
+    index = qr.IntervalIndex(iset)
+    rng = random.Random(2)
+    chroms = [rng.choice(["chr1", "chr2", "chr3"]) for i in range(200)]
+    starts = np.array([rng.randrange(0, 10500) for i in range(200)])
+    ends = starts + np.array([rng.randint(1, 300) for i in range(200)])
+    queries, hits = index.overlap(chroms, starts, ends)
+    for q in range(200):
+        assert sorted(hits[queries == q]) == brute_overlap(iset, chroms[q], starts[q], ends[q])
+    assert list(index.count(chroms, starts, ends)) == [
+        len(brute_overlap(iset, c, s, e)) for c, s, e in zip(chroms, starts, ends)
+    ]
+
+
+def test_point():
+    index = qr.IntervalIndex.from_bed("./tests/sample2.bed")
+    queries, hits = index.point(["chr1", "chr1", "chr2"], [10, 35, 10])
+    assert list(queries) == [0]
+    assert index.intervals.names[hits[0]] == "peak_1"
+
+
+def test_nearest():
+    iset = random_set(3)
+    index = qr.IntervalIndex(iset)
+    rng = random.Random(4)
+    positions = [rng.randrange(0, 11000) for i in range(200)]
+    chroms = [rng.choice(["chr1", "chr2"]) for i in range(200)]
+    nearest, distance = index.nearest(chroms, positions)
+    for c, p, n, d in zip(chroms, positions, nearest, distance):
+        rows = iset.chrom_slice(c)
+        dists = [
+            0 if iset.starts[i] <= p < iset.ends[i]
+            else (p - iset.ends[i] + 1 if iset.ends[i] <= p else iset.starts[i] - p)
+            for i in range(rows.start, rows.stop)
+        ]
+        assert d == min(dists)
+        assert dists[n - rows.start] == d
+    nearest, distance = index.nearest(["chrX"], [5])
+    assert nearest[0] == -1 and distance[0] == -1
+
+
+def test_persistence(tmpdir):
+    index = qr.IntervalIndex(random_set(5))
+    copy = pickle.loads(pickle.dumps(index))
+    index.save(str(tmpdir.join("index")))
+    loaded = qr.IntervalIndex.load(str(tmpdir.join("index")))
+    assert isinstance(loaded.starts, np.memmap)
+    args = (["chr1", "chr2"], [100, 2000], [600, 2600])
+    expected = index.overlap(*args)
+    for other in [copy, loaded]:
+        result = other.overlap(*args)
+        assert all(np.array_equal(a, b) for a, b in zip(result, expected))
+    assert list(loaded.intervals.names[:3]) == list(index.intervals.names[:3])
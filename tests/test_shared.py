@@ -0,0 +1,75 @@
+import pickle
+import pytest
+import numpy as np
+import pyranges as pr
+
+from millefeuille.module.intervals import IntervalSet
+from millefeuille.module import shared as sh
+
+BEDS = ["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]
+
+
+def expected_count(a, b):
+    gr_a, gr_b = pr.readers.read_bed(a), pr.readers.read_bed(b)
+    return len(gr_a.overlap(gr_b))
+
+
+def expected_bp(a, b):
+    gr_a, gr_b = pr.readers.read_bed(a), pr.readers.read_bed(b)
+    return gr_a.merge(strand=False).intersect(gr_b.merge(strand=False)).length
+
+
+def test_attach_is_zero_copy():
+    with sh.share_beds(BEDS, names=["a", "b", "c"]) as shared:
+        attached = sh.SharedIntervals.attach(pickle.loads(pickle.dumps(shared.handle)))
+        index = attached.index("b")
+        original = IntervalSet.from_bed(BEDS[1])
+        assert index.chroms == original.chroms
+        assert list(index.starts) == list(original.starts)
+        assert list(index.intervals.strands) == list(original.strands)
+        assert list(attached.codes("b")) == [0] * len(original)
+        # the arrays are views on the shared block
+        assert not index.starts.flags.owndata
+        shared.index("b").starts[0] = 11
+        assert index.starts[0] == 11
+        del index
+        attached.close()
+
+
+def test_index_after_close():
+    with sh.share_beds(BEDS, names=["a", "b", "c"]) as shared:
+        index = shared.index("b")
+        codes = shared.codes("b")
+    # the block stays mapped while its views are used
+    original = IntervalSet.from_bed(BEDS[1])
+    assert list(index.starts) == list(original.starts)
+    assert list(codes) == [0] * len(original)
+    assert shared.shm.buf is not None
+    del index, codes
+    assert shared.shm.buf is None, "The block should be detached once its views are released"
+
+
+def test_pairwise_overlaps_in_process():
+    with sh.share_beds(BEDS, names=["a", "b", "c"]) as shared:
+        counts = sh.pairwise_overlaps(shared, processes=1)
+        bp = sh.pairwise_overlaps(shared, processes=1, as_bp=True)
+    names = dict(zip(["a", "b", "c"], BEDS))
+    assert len(counts) == 6
+    for key in counts:
+        a, b = key.split("::")
+        assert counts[key] == expected_count(names[a], names[b])
+        assert bp[key] == expected_bp(names[a], names[b])
+
+
+def test_pairwise_overlaps_with_workers():
+    with sh.share_beds(BEDS) as shared:
+        pairs = [("0", "1"), ("1", "2"), ("2", "0")]
+        serial = sh.pairwise_overlaps(shared, pairs, processes=1)
+        parallel = sh.pairwise_overlaps(shared, pairs, processes=2)
+    assert parallel == serial
+    assert list(parallel) == ["0::1", "1::2", "2::0"]
+
+
+def test_share_beds_checks_names():
+    with pytest.raises(ValueError):
+        sh.share_beds(BEDS, names=["a", "b"])
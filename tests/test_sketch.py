@@ -0,0 +1,97 @@
+import os
+import random
+import pytest
+import numpy as np
+
+from millefeuille.module import sketch as sk
+from millefeuille.module.intervals import IntervalSet
+
+
+def random_bed(path, seed, n=3000):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(n):
+            chrom = rng.choice(["chr1", "chr2"])
+            start = rng.randrange(0, 2000000)
+            f.write(chrom + "\t" + str(start) + "\t" + str(start + rng.randint(1, 3000)) + "\tr" + str(i) + "\n")
+    return str(path)
+
+
+def exact_partitions(beds, names):
+    bins = [set(sk.bin_hashes(IntervalSet.from_bed(bed)).tolist()) for bed in beds]
+    a, b, c = bins
+    return {
+        names[2]: len(c - a - b), names[1]: len(b - a - c), names[0]: len(a - b - c),
+        names[0] + "::" + names[1]: len(a & b - c), names[0] + "::" + names[2]: len(a & c - b),
+        names[1] + "::" + names[2]: len(b & c - a), "::".join(names): len(a & b & c),
+    }
+
+
+def test_partition_estimates(tmp_path):
+    beds = [random_bed(tmp_path / (str(i) + ".bed"), i) for i in range(3)]
+    expected = exact_partitions(beds, ["a", "b", "c"])
+    # complete sketches give exact values
+    result = sk.approx_overlaps(beds, k=100000)
+    assert list(result) == list(expected)
+    assert {key: e.value for key, e in result.items()} == expected
+    assert all(e.low == e.high for e in result.values())
+    result = sk.approx_overlaps(beds, k=2048)
+    for key, e in result.items():
+        assert e.low < e.value < e.high
+        # 4 standard errors, the 95% interval spans 2 x 1.96
+        assert abs(e.value - expected[key]) < 2 * (e.high - e.low)
+    assert sk.approx_overlaps(beds, as_bp=True, k=2048)["a"].value == pytest.approx(result["a"].value * 1000)
+
+
+def test_identical_and_nested_files(tmp_path):
+    first = random_bed(tmp_path / "first.bed", 0, n=20000)
+    with open(first) as f:
+        lines = f.readlines()
+    nested = tmp_path / "nested.bed"
+    nested.write_text("".join(lines[: len(lines) // 4]))
+    for names, beds in [("abc", [first] * 3), ("xyz", [first, str(nested), first])]:
+        expected = exact_partitions(beds, list(names))
+        for k in [256, 1024]:
+            result = sk.approx_overlaps(beds, list(names), k=k, cache=False)
+            for key, e in result.items():
+                assert all(type(x) is float for x in e)
+                assert e.low <= expected[key] <= e.high, key
+                assert e.low < e.high, "An estimate from an incomplete sketch is not exact"
+
+
+def test_jaccard_and_cache(tmp_path):
+    beds = [random_bed(tmp_path / (str(i) + ".bed"), i % 2) for i in range(3)]
+    sketches = [sk.sketch(bed, k=512) for bed in beds]
+    assert all(os.path.exists(sk.sketch_path(bed, 512)) for bed in beds)
+    # identical sampled bins do not make the estimate exact
+    j = sk.jaccard(sketches[0], sketches[2])
+    assert j.value == j.high == 1.0 and j.low < 1.0
+    first = set(sk.bin_hashes(IntervalSet.from_bed(beds[0])).tolist())
+    second = set(sk.bin_hashes(IntervalSet.from_bed(beds[1])).tolist())
+    j = sk.jaccard(sketches[0], sketches[1])
+    assert abs(j.value - len(first & second) / len(first | second)) < 2 * (j.high - j.low)
+    # the cached sketch is reused, and rebuilt when the file changes
+    cached = sk.sketch(beds[0], k=512)
+    assert np.array_equal(cached.hashes, sketches[0].hashes) and cached.size == sketches[0].size
+    random_bed(beds[0], 7)
+    os.utime(beds[0], (os.path.getmtime(beds[0]) + 10,) * 2)
+    assert not np.array_equal(sk.sketch(beds[0], k=512).hashes, sketches[0].hashes)
+    # a truncated cache file is replaced
+    path = sk.sketch_path(beds[0], 512)
+    rebuilt = sk.sketch(beds[0], k=512)
+    with open(path, "r+b") as f:
+        f.truncate(100)
+    os.utime(path, (os.path.getmtime(beds[0]) + 10,) * 2)
+    assert np.array_equal(sk.sketch(beds[0], k=512).hashes, rebuilt.hashes)
+    assert np.array_equal(sk.Sketch.load(path).hashes, rebuilt.hashes)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp.npz")]
+    matrix = sk.jaccard_matrix(beds, ["x", "y", "z"], k=512)
+    assert matrix.loc["x", "x"] == 1.0 and matrix.loc["y", "z"] == matrix.loc["z", "y"]
+
+
+def test_exact_fallback():
+    beds = ["./tests/sample1.bed", "./tests/sample2.bed", "./tests/sample3.bed"]
+    from millefeuille.module import overlaps as ov
+
+    expected = ov.all_overlaps(beds)
+    assert {key: e.value for key, e in sk.approx_overlaps(beds, exact=True).items()} == expected
@@ -0,0 +1,83 @@
+import os
+import sys
+import pytest
+import random
+import shutil
+
+from millefeuille.module import sort as srt
+
+
+def test_sort_key():
+    bed_line = "chr1\t20\t40\tpeak_1\t1000\t+\n"
+    assert srt.sort_key(bed_line) == ("chr1", 20, 40)
+    assert srt.sort_key(bed_line, by="parent") == ("peak_1", "chr1", 20, 40)
+    gff_line = "chr2L\tFlyBase\texon\t337016\t337198\t.\t+\t.\tgene_id=FBgn0004611;Parent=FBtr0078049\n"
+    assert srt.sort_key(gff_line, file_format="gff") == ("chr2L", 337016, 337198)
+    assert srt.sort_key(gff_line, file_format="gff", by="parent") == (
+        "FBtr0078049",
+        "chr2L",
+        337016,
+        337198,
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sort_file_bed(tmpdir, workers):
+    rng = random.Random(42)
+    lines = [
+        "\t".join(["chr" + str(rng.randint(1, 3)), str(s), str(s + 10), "peak_" + str(i), "0", "+"]) + "\n"
+        for i, s in enumerate(rng.sample(range(100000), 500))
+    ]
+    with tmpdir.as_cwd() as old_dir:
+        with open("shuffled.bed", "w") as f:
+            f.write("track name=test\n")
+            f.writelines(lines)
+        srt.sort_file("shuffled.bed", "sorted.bed", max_lines=37, workers=workers, fan_in=4)
+        with open("sorted.bed", "r") as f:
+            result = f.readlines()
+    assert result[0] == "track name=test\n", "Header line should be kept on top"
+    assert result[1:] == sorted(lines, key=srt.sort_key), "Lines should be sorted by chrom and start"
+
+
+def test_sort_file_removes_merged_runs(tmpdir, monkeypatch):
+    merge_runs, on_disk = srt._merge_runs, []
+
+    def counting_merge(runs, key, out):
+        on_disk.append(len([name for name in os.listdir(os.path.dirname(runs[0])) if name.endswith(".run")]))
+        merge_runs(runs, key, out)
+
+    monkeypatch.setattr(srt, "_merge_runs", counting_merge)
+    with tmpdir.as_cwd() as old_dir:
+        with open("shuffled.bed", "w") as f:
+            f.writelines("chr1\t" + str(s) + "\t" + str(s + 10) + "\n" for s in random.Random(1).sample(range(10000), 100))
+        srt.sort_file("shuffled.bed", "sorted.bed", max_lines=10, fan_in=3)
+    # 10 runs are merged into 4, then 2, then the output: the merged runs are removed on the way
+    assert on_disk[-1] == 2, "Only the last runs should be left for the final merge"
+
+
+def test_sort_file_gff_by_parent(tmpdir):
+    file_gff = os.path.abspath("./tests/sample.gff")
+    with tmpdir.as_cwd() as old_dir:
+        srt.sort_file(file_gff, "sorted.gff", by="parent", max_lines=2)
+        with open("sorted.gff", "r") as f:
+            result = f.readlines()
+    with open(file_gff, "r") as f:
+        expected = f.readlines()
+    assert len(result) == len(expected), "Sorting should keep every line"
+    keys = [srt.sort_key(l, file_format="gff", by="parent") for l in result]
+    assert keys == sorted(keys), "Lines should be sorted by parent ID"
+
+
+def test_sort_file_header_chunk(tmpdir):
+    # the header lines fill the whole first chunk
+    with open("./tests/sample.gff", "r") as f:
+        lines = f.readlines()
+    with tmpdir.as_cwd() as old_dir:
+        with open("headers.gff", "w") as f:
+            f.write("##gff-version 3\n##sequence-region chr2L 1 23513712\n")
+            f.writelines(lines)
+        srt.sort_file("headers.gff", "sorted.gff", file_format="gff", max_lines=2)
+        with open("sorted.gff", "r") as f:
+            result = f.readlines()
+    assert result[:2] == ["##gff-version 3\n", "##sequence-region chr2L 1 23513712\n"]
+    assert result[2:] == sorted(lines, key=lambda l: srt.sort_key(l, file_format="gff"))
@@ -0,0 +1,63 @@
+import io
+import os
+import sys
+import pytest
+
+from millefeuille.module import streams as st
+from millefeuille.module import gff2bed as g2b
+from millefeuille.module import bed2gff as b2g
+from millefeuille.module import overlaps as ov
+
+
+def test_open_lines():
+    lines = ["chr1\t20\t40\n", "chr1\t60\t110\n"]
+    with st.open_lines(lines) as f:
+        assert list(f) == lines
+    with st.open_lines(io.StringIO("".join(lines))) as f:
+        assert list(f) == lines
+    with st.open_lines(io.BytesIO("".join(lines).encode())) as f:
+        assert list(f) == lines
+    with st.open_lines("./tests/sample1.bed") as f:
+        assert len(list(f)) == 3
+
+
+def test_write_lines():
+    out = io.StringIO()
+    assert st.write_lines(["a\n", "b\n"], out) == 2
+    assert out.getvalue() == "a\nb\n"
+
+
+def test_gff_records_from_lines():
+    with open("./tests/sample1.bed", "r") as f:
+        lines = f.readlines()
+    result = list(b2g.gff_records(lines, "test_source", "test_mol_type"))
+    assert len(result) == 3
+    assert result[0] == "chr1\ttest_source\ttest_mol_type\t21\t40\t.\t+\t.\tfeature_id=peak_1\n"
+    result = list(b2g.gff_records("./tests/sample1.bed12", "test_source", "test_mol_type", is_bed12=True))
+    assert result[0].split("\t")[3:5] == ["21", "203"]
+
+
+def test_get_gff_to_file_object():
+    out = io.StringIO()
+    with open("./tests/sample1.bed", "r") as f:
+        b2g.get_gff(f, "test_source", "test_mol_type", output=out)
+    assert len(out.getvalue().splitlines()) == 3
+    with pytest.raises(ValueError):
+        b2g.get_gff(["chr1\t20\t40\tpeak_1\t0\t+\n"], "test_source", "test_mol_type")
+
+
+def test_bed12_generator_to_file_object():
+    out = io.StringIO()
+    with open("./tests/sample.gff", "r") as f:
+        g2b.bed12_generator(bedname = "unused", file_gff = f, output = out)
+    assert len(out.getvalue().splitlines()) == 5
+
+
+def test_chained_conversions():
+    # GFF -> BED12 -> overlaps without intermediate files
+    bed12 = list(g2b.bed12_records("./tests/sample.gff"))
+    assert len(bed12) == 5
+    assert all(len(l.split("\t")) == 12 for l in bed12)
+    result = ov.all_overlaps([iter(bed12), bed12, "./tests/sample1.bed"])
+    assert result["a"] == 0 and result["b"] == 0, "The two copies of the BED12 records should fully overlap"
+    assert result["c"] == 3, "The BED file is on another chromosome"